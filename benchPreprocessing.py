@@ -0,0 +1,406 @@
+#
+# benchPreprocessing.py
+# Measure the throughput of sample preprocessing routines on real sample
+#  files (e.g., the raw or LegendsWords files from an sdBuild* run).
+#
+# For each benchmark, report the number of samples & bytes processed, the
+#  elapsed time and throughput to stdout.
+# With --compare, also run the original (legacy) implementation of the
+#  routine, verify it gives the same output, and report its throughput too.
+#
+# Benchmarks:
+#   featureTransform - featureTransform.transformText() on extractedText fields
+#   stem             - removeURLsCleanStem's cleaning & stemming (tokens/sec)
+#                       on title, abstract, extractedText fields
+#   chain            - the fused preprocessor chain for CHAIN_PREPROCESSORS
+#                       (legacy: calling each preprocessor method in turn)
+#   memory           - memory allocated to read the samples
+#                       (legacy: RefSample.compactFields = False, i.e., dicts)
+#   figureText       - figureText.MultiFigConverter for FIGTEXT_CONVERSIONS
+#                       on extractedText fields
+#                       (legacy: a Text2FigConverter for each conversion)
+#   figureBlurbs     - figureText.getFigureBlurbs() on each paragraph of
+#                       extractedText fields, numWords=BLURB_NUM_WORDS
+#                       (legacy: split & join each chunk between fig words)
+#   references       - bytes removed from extractedText fields by the
+#                       removeReferences preprocessor (and that the figure
+#                       legends are all kept), and the chain
+#                       (CHAIN_PREPROCESSORS) and vectorizing (sklearn
+#                       CountVectorizer) time w/ and w/o removeReferences 1st
+#
+import sys
+import time
+import argparse
+import tracemalloc
+import sampleDataLib
+import featureTransform
+import figureText
+
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+BENCHMARKS = ['featureTransform', 'stem', 'chain', 'memory', 'figureText',
+                                            'figureBlurbs', 'references']
+CHAIN_PREPROCESSORS = ['figureTextLegCloseWords50', 'removeURLsCleanStem']
+BLURB_NUM_WORDS = 50
+FIGTEXT_CONVERSIONS = ['legends', 'legParagraphs', 'legCloseWords25',
+                        'legCloseWords50', 'legCloseWords75', 'legCloseWords100']
+#-----------------------------------
+
+def parseCmdLine():
+    parser = argparse.ArgumentParser( \
+    description='Benchmark sample preprocessing routines. Write to stdout.')
+
+    parser.add_argument('inputFiles', nargs=argparse.REMAINDER,
+        help='files of samples, "-" for stdin')
+
+    parser.add_argument('-b', '--bench', dest='benchmarks', action='append',
+        choices=BENCHMARKS, default=[],
+        help="benchmark to run. Repeat for multiple. Default: all")
+
+    parser.add_argument('--compare', dest='compare', action='store_true',
+        required=False,
+        help="also run legacy implementations and verify identical output")
+
+    parser.add_argument('-w', '--workers', dest='workers', type=int,
+        default=1, help="number of worker processes, if the routine " +
+        "supports them. Default: 1")
+
+    parser.add_argument('-n', '--numsamples', dest='numSamples', type=int,
+        default=0, help="only use the 1st n samples. Default: all samples")
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="Sample class name to use if not specified in sample file. " +
+                                        "Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    args = parser.parse_args()
+    if not args.benchmarks: args.benchmarks = BENCHMARKS
+    return args
+#-----------------------------------
+
+args = parseCmdLine()
+
+def main():
+    samples = getSamples()
+    verbose("%d samples\n" % len(samples))
+
+    for b in args.benchmarks:
+        if b == 'featureTransform':
+            benchFeatureTransform(samples)
+        elif b == 'stem':
+            benchStem(samples)
+        elif b == 'chain':
+            benchChain(samples)
+        elif b == 'memory':
+            benchMemory()
+        elif b == 'figureText':
+            benchFigureText(samples)
+        elif b == 'figureBlurbs':
+            benchFigureBlurbs(samples)
+        elif b == 'references':
+            benchReferences(samples)
+#-----------------------------------
+
+def getSamples():
+    """ Return list of samples from the input files
+    """
+    sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
+    samples = []
+    for fn in args.inputFiles:
+        verbose("Reading %s\n" % str(fn))
+        reader = sampleDataLib.SampleFileReader(fn, sampleObjType=sampleObjType)
+        samples += list(reader.sampleIterator())
+        reader.close()
+        if args.numSamples and len(samples) >= args.numSamples:
+            return samples[:args.numSamples]
+    return samples
+#-----------------------------------
+
+def benchFeatureTransform(samples):
+    texts = [ s.getExtractedText() for s in samples ]
+
+    results, seconds = timeIt(featureTransform.transformText, texts)
+    report('featureTransform', texts, seconds)
+
+    if args.workers > 1:
+        startTime = time.time()
+        parResults = featureTransform.transformTexts(texts,
+                                                    workers=args.workers)
+        seconds = time.time() - startTime
+        report('featureTransform (%d workers)' % args.workers, texts, seconds)
+        checkSame('featureTransform (workers)', samples, parResults, results)
+
+    if args.compare:
+        legacyResults, seconds = timeIt(legacyTransformText, texts)
+        report('featureTransform (legacy)', texts, seconds)
+        checkSame('featureTransform', samples, results, legacyResults)
+#-----------------------------------
+
+def legacyTransformText(text):
+    """ The original featureTransform.transformText():
+        search the remaining text after each match & concat the result
+    """
+    toTransform = text
+    transformed = ''
+    while (True):
+        m = featureTransform.getBigRe().search(toTransform)
+        if not m: break
+        gd = m.groupdict()
+        for key in gd.keys():
+            if gd[key] != None: break
+        start, end = m.start(key), m.end(key)
+        transformed += toTransform[:start] + \
+                                    featureTransform.mappings[key].replacement
+        toTransform = toTransform[end:]
+    transformed += toTransform
+    return transformed
+#-----------------------------------
+
+def benchStem(samples):
+    texts = []
+    for s in samples:
+        texts += [s.getTitle(), s.getAbstract(), s.getExtractedText()]
+    numTokens = sum([ len(sampleDataLib.tokenizeText(t)) for t in texts ])
+
+    if args.compare:		# run legacy 1st so it doesn't use a warm cache
+        legacyResults, seconds = timeIt(legacyCleanStemText, texts)
+        reportTokens('stem (legacy)', numTokens, seconds)
+
+    results, seconds = timeIt(sampleDataLib.cleanStemText, texts)
+    reportTokens('stem', numTokens, seconds)
+    stemCache = sampleDataLib.getStemmer()
+    sys.stdout.write("%-30s %d tokens cached, %d hits, %d misses\n" % \
+                        ('stem cache', stemCache.getNumTokens(),
+                        stemCache.getHits(), stemCache.getMisses()))
+    if args.compare:
+        textSamples = [ s for s in samples for i in range(3) ]
+        checkSame('stem', textSamples, results, legacyResults)
+#-----------------------------------
+
+legacyStemmer = None
+
+def legacyCleanStemText(text):
+    """ The original removeURLsCleanStem text cleaning: no stem cache,
+        transform, lower case & tokenize in separate passes, concat output
+    """
+    global legacyStemmer
+    if not legacyStemmer:
+        import nltk.stem.snowball as nltk
+        legacyStemmer = nltk.EnglishStemmer()
+    output = ''
+    for s in sampleDataLib.urls_re.split(text):
+        s = featureTransform.transformText(s).lower()
+        for m in sampleDataLib.token_re.finditer(s):
+            output += " " + legacyStemmer.stem(m.group())
+    return output
+#-----------------------------------
+
+def benchChain(samples):
+    texts = [ s.getDocument() for s in samples ]
+    name = 'chain (%s)' % '+'.join(CHAIN_PREPROCESSORS)
+
+    chain = type(samples[0]).getPreprocessorChain(CHAIN_PREPROCESSORS)
+    results, seconds = timeIt(chain, copySamples(samples))
+    report(name, texts, seconds)
+
+    if args.compare:
+        legacyResults, seconds = timeIt(legacyPreprocess, copySamples(samples))
+        report('chain (legacy)', texts, seconds)
+        checkSame('chain', samples, [ s.getDocument() for s in results ],
+                                [ s.getDocument() for s in legacyResults ])
+#-----------------------------------
+
+def legacyPreprocess(sample):
+    """ Apply CHAIN_PREPROCESSORS by calling each preprocessor method in turn
+    """
+    for pp in CHAIN_PREPROCESSORS:
+        sample = getattr(sample, pp)()
+    return sample
+#-----------------------------------
+
+def copySamples(samples):
+    """ Return copies of samples (since preprocessors modify samples)
+    """
+    return [ type(s)().parseSampleRecordText(s.getSampleAsText()) \
+                                                            for s in samples ]
+#-----------------------------------
+
+def benchMemory():
+    """ Measure memory allocated while reading the samples (again) """
+    compactFields = sampleDataLib.RefSample.compactFields
+    settings = [True, False] if args.compare else [compactFields]
+    for compact in settings:
+        sampleDataLib.RefSample.compactFields = compact
+        tracemalloc.start()
+        startTime = time.time()
+        samples = getSamples()
+        seconds = time.time() - startTime
+        nBytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        name = 'memory' if compact else 'memory (legacy)'
+        sys.stdout.write("%-30s %7d samples %10.3f MB %9.1f bytes/sample" \
+                            " %9.3f sec\n" % (name, len(samples),
+                            nBytes/1000000.0, float(nBytes)/len(samples),
+                            seconds))
+        del samples
+    sampleDataLib.RefSample.compactFields = compactFields
+#-----------------------------------
+
+def benchFigureText(samples):
+    texts = [ s.getExtractedText() for s in samples ]
+    name = 'figureText (%d conversions)' % len(FIGTEXT_CONVERSIONS)
+
+    converter = figureText.MultiFigConverter(FIGTEXT_CONVERSIONS)
+    results, seconds = timeIt(converter.text2FigTexts, texts)
+    report(name, texts, seconds)
+
+    if args.compare:
+        legacyResults, seconds = timeIt(legacyFigTexts, texts)
+        report('figureText (legacy)', texts, seconds)
+        checkSame('figureText', samples, results, legacyResults)
+#-----------------------------------
+
+def legacyFigTexts(text):
+    """ Run a separate Text2FigConverter for each of FIGTEXT_CONVERSIONS
+    """
+    figTexts = {}
+    for name in FIGTEXT_CONVERSIONS:
+        conversionType, numWords = figureText.parseConversionName(name)
+        converter = figureText.Text2FigConverter(conversionType=conversionType,
+                                                numWords=numWords)
+        figTexts[name] = converter.text2FigText(text)
+    return figTexts
+#-----------------------------------
+
+def benchFigureBlurbs(samples):
+    texts = [ s.getExtractedText() for s in samples ]
+    numRefs = sum([ len(figureText.figureRe.findall(t)) for t in texts ])
+    name = 'figureBlurbs (%d fig refs)' % numRefs
+
+    blurbs = lambda text: [ figureText.getFigureBlurbs(p, BLURB_NUM_WORDS) \
+                                for p in figureText.paragraphIterator(text) ]
+    results, seconds = timeIt(blurbs, texts)
+    report(name, texts, seconds)
+
+    if args.compare:
+        legacyBlurbs = lambda text: [ legacyGetFigureBlurbs(p, BLURB_NUM_WORDS)
+                                for p in figureText.paragraphIterator(text) ]
+        legacyResults, seconds = timeIt(legacyBlurbs, texts)
+        report('figureBlurbs (legacy)', texts, seconds)
+        checkSame('figureBlurbs', samples, results, legacyResults)
+#-----------------------------------
+
+def legacyGetFigureBlurbs(text, numWords=50,):
+    """ The original figureText.getFigureBlurbs():
+        split each chunk of text between fig words & concat growing blurbs
+    """
+    matches = list(figureText.figureRe.finditer(text))
+    if len(matches) == 0: return []
+
+    blurbs = []
+    words = text[ : matches[0].start() ].split()
+    curBlurb = ' '.join(words[-numWords:])
+    for i in range(len(matches)-1):
+        words = text[ matches[i].start() : matches[i+1].start() ].split()
+        if numWords > (len(words)-1)/2:
+            curBlurb += ' ' + ' '.join(words)
+        else:
+            curBlurb += ' ' + ' '.join(words[:numWords+1])
+            blurbs.append(curBlurb)
+            curBlurb = ' '.join(words[-numWords:])
+
+    words = text[ matches[-1].start() : ].split()
+    curBlurb += ' ' + ' '.join(words[:numWords+1])
+    blurbs.append(curBlurb)
+    return blurbs
+#-----------------------------------
+
+def benchReferences(samples):
+    texts = [ s.getExtractedText() for s in samples ]
+    spans = [ figureText.findReferencesSpan(t) for t in texts ]
+    removed = sorted([ span[1] - span[0] if span else 0 for span in spans ])
+    numFound = len([ span for span in spans if span ])
+    sys.stdout.write("%-30s %7d of %d texts, %d bytes/text removed " \
+                "(median %d), %.1f%% of all bytes\n" % ('references found',
+                numFound, len(texts), sum(removed)/len(texts),
+                removed[len(removed)//2],
+                100.0 * sum(removed) / max(sum([ len(t) for t in texts ]), 1)))
+
+    sampleObjType = type(samples[0])
+    for name, preprocessors in [
+                ('chain', CHAIN_PREPROCESSORS),
+                ('chain (-references)', ['removeReferences'] +
+                                                        CHAIN_PREPROCESSORS), ]:
+        chain = sampleObjType.getPreprocessorChain(preprocessors)
+        results, seconds = timeIt(chain, copySamples(samples))
+        report(name, texts, seconds)
+        benchVectorize('vectorize' + name[len('chain'):],
+                                        [ s.getDocument() for s in results ])
+
+    # the figure legends should all be kept
+    results = [ figureText.text2FigText_Legend(figureText.removeReferences(t))
+                                                            for t in texts ]
+    checkSame('references legends', samples, results,
+                    [ figureText.text2FigText_Legend(t) for t in texts ])
+#-----------------------------------
+
+def benchVectorize(name, docs):
+    """ Time a CountVectorizer fit_transform of preprocessed docs
+    """
+    try:
+        from sklearn.feature_extraction.text import CountVectorizer
+    except ImportError:
+        verbose("%s: skipped, sklearn not installed\n" % name)
+        return
+    vectorizer = CountVectorizer(tokenizer=sampleDataLib.splitPreTokenized,
+                                token_pattern=None)
+    startTime = time.time()
+    matrix = vectorizer.fit_transform(docs)
+    seconds = time.time() - startTime
+    report('%s (%d features)' % (name, matrix.shape[1]), docs, seconds)
+#-----------------------------------
+
+def timeIt(func, texts):
+    """ Apply func to each text. Return the list of results & elapsed seconds
+    """
+    startTime = time.time()
+    results = [ func(t) for t in texts ]
+    return results, time.time() - startTime
+#-----------------------------------
+
+def report(name, texts, seconds):
+    nBytes = sum([ len(t) for t in texts ])
+    mb = nBytes/1000000.0
+    rate = mb/seconds if seconds else 0.0
+    sys.stdout.write("%-30s %7d texts %10.3f MB %9.3f sec %9.3f MB/s\n" % \
+                                        (name, len(texts), mb, seconds, rate))
+#-----------------------------------
+
+def reportTokens(name, numTokens, seconds):
+    rate = numTokens/seconds if seconds else 0.0
+    sys.stdout.write("%-30s %10d tokens %9.3f sec %12.1f tokens/s\n" % \
+                                            (name, numTokens, seconds, rate))
+#-----------------------------------
+
+def checkSame(name, samples, results, legacyResults):
+    """ Report how many results differ from the legacy (or reference) results
+    """
+    nDiffs = 0
+    for s, r, lr in zip(samples, results, legacyResults):
+        if r != lr:
+            nDiffs += 1
+            verbose("%s output differs for %s\n" % (name, s.getID()))
+    sys.stdout.write("%-30s %d outputs differ from legacy\n" % (name, nDiffs))
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -22,7 +22,54 @@ Do this with regex and only one pass through the text...
 """
 
 import sys
+import os.path
 import re
+import time
+import atexit
+import collections
+import bisect
+import multiprocessing
+
+##############################################
+def buildTrieRegex(words):
+    """
+    Return a regex (string) that matches any of the words.
+    The words are compiled into a prefix-trie, e.g.,
+        ['tumor', 'tumour', 'thymoma'] --> 't(?:umo(?:r|ur)|hymoma)'
+    so the regex engine looks at each char of the text once at a given
+    position instead of trying every word in turn.
+    Case insensitive (the regex is meant to be compiled w/ re.IGNORECASE).
+    A word that is a prefix of another word is tried first, as it would be in
+    a '|' alternation of a sorted list of the words.
+    '.' in a word matches any char (as it did when these words were simply
+    OR'ed together as regexes), all other chars are literal.
+    """
+    trie = {}
+    for w in words:
+        node = trie
+        for c in w.lower():
+            atom = c if c == '.' else re.escape(c)
+            node = node.setdefault(atom, {})
+        node[''] = {}			# end of word marker
+
+    return _trie2Regex(trie)
+#---------------------------------
+
+def _trie2Regex(node):
+    """
+    Return the regex for the subtree of the trie below node.
+    The returned regex can be concatenated w/o further grouping.
+    """
+    alts = [ atom + _trie2Regex(child) for atom, child in node.items() if atom ]
+
+    if not alts:			# end of a word, no longer words
+        return ''
+    if '' in node:			# end of a word, try it before longer ones
+        return '(?:' + '|'.join(alts) + ')??'
+    if len(alts) == 1:
+        return alts[0]
+    return '(?:' + '|'.join(alts) + ')'
+#---------------------------------
 
 ##############################################
 # Tumors and tumor types regex - map all to "tumor_type"
@@ -37,220 +84,78 @@ wholeWords = [
             'neoplasia',
             'neoplasm',
             ]
-# word endings
+# word endings (need at least one letter before the ending)
 endings = [
-            '[a-z]+inoma',
-            '[a-z]+gioma',
-            '[a-z]+ocytoma',
-            '[a-z]+thelioma',
+            'inoma',
+            'gioma',
+            'ocytoma',
+            'thelioma',
             ]
 # whole words or endings
 wordsOrEndings = [
-            '[a-z]*adenoma',
-            '[a-z]*sarcoma',
-            '[a-z]*lymphoma',
-            '[a-z]*papilloma',
-            '[a-z]*leukemia',
-            '[a-z]*leukaemia',
-            '[a-z]*blastoma',
-            '[a-z]*lipoma',
-            '[a-z]*myoma',
-            '[a-z]*acanthoma',
-            '[a-z]*fibroma',
-            '[a-z]*glioma',
+            'adenoma',
+            'sarcoma',
+            'lymphoma',
+            'papilloma',
+            'leukemia',
+            'leukaemia',
+            'blastoma',
+            'lipoma',
+            'myoma',
+            'acanthoma',
+            'fibroma',
+            'glioma',
             ]
-tumorRe = '|'.join( wholeWords + endings + wordsOrEndings )
+# Any match of these covers the whole word, so it doesn't matter which of
+#   these alternatives matches first.
+tumorRe = '|'.join([ buildTrieRegex(wholeWords),
+                    '[a-z]+' + buildTrieRegex(endings),
+                    '[a-z]*' + buildTrieRegex(wordsOrEndings),
+                    ])
 tumorRe = '(?:' + tumorRe + ')s?'	# optional 's'
 
 ##############################################
 # Cell line names regex, all map to "cell_line"
-cellLinePrefixes = [
-            'B-?16', 	# includes 'B16',
-            'DA',
-            #'F9',	# omit since it overlaps with F9 in figure panes
-            'Hepa1',
-            'K-?1735',
-            'L5178Y',
-            'MCA',
-            'MCF-7',
-            'MDA-MB',
-            'NFS',
-            'NIH-3T3',
-            'P1798',
-            'P19',
-            'P388',
-            'PC4',
-            'RAW117',
-            'RIF',
-            'RMA',
-            'SP2/0',
-            'WEHI',
-            ]
-cellLinePreRe = '|'.join([ p + r'\S*' for p in cellLinePrefixes ])
-cellLineNames = [ \
-            '1246',
-            '14-122',
-            '14-166',
-            '14-259',
-            '15-299',
-            '1C11',
-            '203 cells',
-            '2C3',
-            '320DM',
-            '32D',
-            '38C13',
-            '38C13',
-            '3LL',
-            '3SB',
-            '4T1',
-            '7-M12',
-            '7OZ/3',
-            '82-132',
-            'A20',
-            'A431',
-            'A549',
-            'AB1',
-            'AC29',
-            'ADJ-PC-5',
-            'AKR1',
-            'BAL17.7.1',
-            'BCL1',
-            'Bac-1.2F5',
-            'C10',
-            'C1300',
-            'C1300-NB',
-            'C1498',
-            'C26',
-            'C4',
-            'C6',
-            'C6',
-            'CB101',
-            'COLO',
-            'CT-2A',
-            'CT26',
-            'CT51',
-            'Caco-2',
-            'Comma D',
-            'D1-DMBA-3',
-            'D5',
-            'E3',
-            'E6496',
-            'EL-4',
-            'EL4',
-            'ELM-D',
-            'EMT6',
-            'EPEN',
-            'ESb',
-            'F3II',
-            'FSA',
-            'FSa-II',
-            'GL26',
-            'GL261',
-            'GL261',
-            'Gc-4',
-            'H1299',
-            'HCT-116',
-            'HCT-8',
-            'HL-60',
-            'HM7',
-            'HT-29',
-            'HT29',
-            'HTH-K',
-            'HeLa',
-            'HepG2',
-            'J558',
-            'J558L',
-            'JBS',
-            'Jurkat',
-            'K36',
-            'K562',
-            'L1',
-            'L1210',
-            'L929',
-            'LA-N-2',
-            'LK35.2',
-            'LLC',
-            'LM2',
-            'LM2',
-            'LM3',
-            'LMM3',
-            'LS 174T',
-            'LSA',
-            'LSTRA',
-            'Lewis lung',
-            'M1',
-            'MA13/C',
-            'MA16/C',
-            'MA44',
-            'MAC13',
-            'MAC16',
-            'MAC26',
-            'MC-38',
-            'MC12',
-            'MCa-29',
-            'MCa-4',
-            'MDA231',
-            'MEL cells',
-            'MH134',
-            'MIN6',
-            'MLE',
-            'MM3',
-            'MO5',
-            'MOD',
-            'MOPC315',
-            'N18',
-            'N18TG2',
-            'N1E-115',
-            'N2A',
-            'NBFL',
-            'NL17',
-            'NL22',
-            'NL4',
-            'NR-S1',
-            'Nb2',
-            'Neuro-2A',
-            'OTT6050',
-            'P02',
-            'P03',
-            'P511',
-            'P815',
-            'PC-3',
-            'PC12',
-            'PCC4',
-            'R1.1',
-            'RB13',
-            'RENCA',
-            'RI-4-11',
-            'RL-12',
-            'RM-1',
-            'RVC',
-            'RcsX',
-            'S49',
-            'SC-115',
-            'SC115',
-            'SCCVII',
-            'SK-CO-1',
-            'SL12',
-            'SMA-560',
-            'SW403',
-            'SW480',
-            'SW620',
-            'Saos-2',
-            'T-47D',
-            'T241',
-            'TA3/St',
-            'TBJ-NB',
-            'TEPC-2027',
-            'TK-1',
-            'TSA',
-            'UV2237M',
-            'WiDr',
-            'X63-Ag8.653',
-            'Y1',
-            'YAC-1',
-            'sarcoma 180',
-            ]
-cellLineRe = '|'.join([ p for p in cellLineNames ])
+# The cell line names come from data files that live w/ this module:
+#   cellLines.pre   - cell line prefixes, e.g., "B16*", the '*' denotes a
+#                       wildcard for the various endings of several sublines
+#   cellLines.nopre - cell line names that are not matched by the prefixes
+# Lines starting w/ '#' are comments.
+CELL_LINE_PREFIX_FILE = 'cellLines.pre'
+CELL_LINE_NAME_FILE   = 'cellLines.nopre'
+
+def readDataFile(fileName):
+    """
+    Return list of the (stripped) non-comment, non-blank lines in fileName.
+    fileName is relative to the directory this module lives in.
+    """
+    pathName = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    fileName)
+    with open(pathName, 'r') as fp:
+        lines = [ l.strip() for l in fp ]
+    return [ l for l in lines if l and not l.startswith('#') ]
+#---------------------------------
+
+def getCellLinePrefixes(fileName=CELL_LINE_PREFIX_FILE):
+    """
+    Return list of cell line prefixes from the file (w/o the '*').
+    Anything after the 1st blank on a line is a comment.
+    """
+    return [ l.split()[0].rstrip('*') for l in readDataFile(fileName) ]
+#---------------------------------
+
+def getCellLineNames(fileName=CELL_LINE_NAME_FILE):
+    """
+    Return list of cell line names from the file (names may contain blanks)
+    """
+    return readDataFile(fileName)
+#---------------------------------
+
+cellLinePrefixes = getCellLinePrefixes()
+cellLinePreRe = buildTrieRegex(cellLinePrefixes) + r'\S*'
+
+cellLineNames = getCellLineNames()
+cellLineRe = buildTrieRegex(cellLineNames)
 
 ##############################################
 class Mapping (object):
@@ -300,49 +205,362 @@ mappings = {
 #  Have not looked into why.)
 bigRegex = '|'.join([ r'\b' + m.regex + r'\b' for m in mappings.values() ])
 
-bigRe = re.compile(bigRegex, re.IGNORECASE)
+# Compiled the 1st time it is needed (see getBigRe()) so modules that import
+#   this module (e.g., via sampleDataLib) but never transform any text don't
+#   pay for compiling it.
+bigRe = None
+
+def getBigRe():
+    """
+    Return the compiled bigRegex
+    """
+    global bigRe
+    if bigRe is None:
+        bigRe = re.compile(bigRegex, re.IGNORECASE)
+    return bigRe
+#---------------------------------
+
+##############################################
+# The replacement text for each mapping, keyed by the mapping's group name.
+#   Each regex match has exactly one named group that matched (m.lastgroup),
+#   so we can find the replacement w/o scanning all the groups.
+replacements = { key: m.replacement for key, m in mappings.items() }
+
+wordCharRe = re.compile(r'\w')
 
 ##############################################
 def transformText(text):
     """
     Return the transformed text based on the transformations defined above.
     """
-    toTransform = text
-    transformed = ''
+    pieces = []			# pieces of transformed text to join at end
+    pos = 0			# position in text after the last match
 
-#    debug( "initial: '%s'\n" % toTransform)
+    for key, start, end in iterMatches(text):
+        pieces.append(text[pos:start])
+        pieces.append(replacements[key])
+        pos = end
 
-    while (True):		# loop for each regex match
-        m = bigRe.search(toTransform)
-        if not m: break		# no match found
+    pieces.append(text[pos:])
+    return ''.join(pieces)
+#---------------------------------
+
+def iterMatches(text):
+    """
+    Iterate through the mapping matches in text, in a single pass.
+    Yield the key (name) of the matching mapping & start & end coords of the
+    matching string.
 
-        key, start, end = findMatchingGroup(m)
+    The original implementation searched the remainder of the text after each
+    match (i.e., text[end:]). So a word boundary at the start of the remainder
+    only matched if the remainder started w/ a word char. We preserve that so
+    the transformed text is the same: a match that starts right where the
+    previous match ended (at a non-word char) is skipped, and we search again
+    one char later.
+    """
+    search = getBigRe().search
+    timed = stats is not None		# instrumentation is on
+    if timed:
+        stats.recordText(text)
+        startTime = time.perf_counter()
+    pos = 0
+    m = search(text, pos)
+    while m:
+        start = m.start()
+        if start == pos and pos != 0 and not wordCharRe.match(text, pos):
+            m = search(text, pos + 1)
+            continue
+        pos = m.end()
+        if timed:
+            stats.recordMatch(m.lastgroup, pos - start,
+                                            time.perf_counter() - startTime)
+        yield (m.lastgroup, start, pos)
+        if timed: startTime = time.perf_counter()
+        m = search(text, pos)
+    if timed:
+        stats.recordMatch(None, 0, time.perf_counter() - startTime)
+#---------------------------------
 
-#	debug( 'matching group: %s, %d, %d' % (key, start, end) + '\n')
-        # Would doing this w/o slicing toTransform be faster?
-        transformed += toTransform[:start] + mappings[key].replacement
-        toTransform = toTransform[end:]
-#	debug( "transformed '%s'" % transformed + '\n')
-#	debug( "toTransform '%s'" % toTransform + '\n')
-#	debug('\n')
+def transformTokens(text,
+                    tokenRe,	# compiled regex that matches a token
+    ):
+    """
+    Tokenize the transformed text in the same pass that transforms it.
+    Return list of (start, end, token) for each token that tokenRe finds in
+        transformText(text).lower()
+    start, end are coords in (the original) text. For a token that comes from
+    a mapping replacement, these are the coords of the replaced text.
 
-    transformed += toTransform
-#    debug("final string '%s'" % transformed + '\n')
+    Usually, the tokens of a replacement are the same as tokenizing the
+    replacement by itself, and the tokens of the text between matches are the
+    same as tokenizing that text in place.
+    That is not true if a replacement gets glued to the adjacent text in the
+    transformed text, i.e., word chars end up next to each other across the
+    edge of a replacement. (some mappings can match starting at a non-word
+    char, e.g., ", cell" in 'ee'). This is rare, so in that case we fall back
+    to tokenizing the transformed text.
+
+    Tokenizing in place and then lower casing each token gives the same
+    tokens as lower casing 1st for all chars but LOWER_CONTEXT_CHARS, so we
+    fall back for text that has them too.
+    """
+    for c in LOWER_CONTEXT_CHARS:
+        if c in text:
+            return transformTokensGlued(text, tokenRe)
+    tokens = []
+    pos = 0			# position in text after the last match
+    lastIsWord = False		# is the last char of the transformed text so
+                                #   far a word char?
+    for key, start, end in iterMatches(text):
+        if pos < start:		# have text between matches
+            if lastIsWord and wordCharRe.match(text, pos):
+                return transformTokensGlued(text, tokenRe)
+            for m in tokenRe.finditer(text, pos, start):
+                tokens.append( (m.start(), m.end(), m.group().lower()) )
+            lastIsWord = bool(wordCharRe.match(text, start-1))
+
+        replacement = replacements[key]
+        if replacement:
+            if lastIsWord and wordCharRe.match(replacement):
+                return transformTokensGlued(text, tokenRe)
+            for token in getReplacementTokens(key, tokenRe):
+                tokens.append( (start, end, token) )
+            lastIsWord = bool(wordCharRe.match(replacement[-1]))
+        pos = end
+
+    if pos < len(text):
+        if lastIsWord and wordCharRe.match(text, pos):
+            return transformTokensGlued(text, tokenRe)
+        for m in tokenRe.finditer(text, pos):
+            tokens.append( (m.start(), m.end(), m.group().lower()) )
+    return tokens
+#---------------------------------
+
+def transformTokensGlued(text, tokenRe):
+    """
+    Return the same list as transformTokens(), but by tokenizing the lower
+    cased transformed text and mapping token coords back to coords in text.
+    """
+    pieces = []			# pieces of the transformed text
+    pieceStarts = []		# start of each piece in the transformed text
+    origCoords = []		# (start, end, isReplacement) of each piece in text
+    tLen = 0			# length of the transformed text so far
+    pos = 0
+    for key, start, end in iterMatches(text):
+        for piece, coords in ((text[pos:start], (pos, start, False)),
+                              (replacements[key], (start, end, True))):
+            if piece:
+                pieces.append(piece)
+                pieceStarts.append(tLen)
+                origCoords.append(coords)
+                tLen += len(piece)
+        pos = end
+    pieces.append(text[pos:])
+    pieceStarts.append(tLen)
+    origCoords.append( (pos, len(text), False) )
+
+    transformed = ''.join(pieces)
+    lower = transformed.lower()
+    lowerCoords = None		# [coord in transformed] for each char in lower,
+    if len(lower) != tLen:	#  if lower casing changed the length
+        lowerCoords = [ i for i, c in enumerate(transformed) \
+                                            for j in range(len(c.lower())) ]
+    tokens = []
+    for m in tokenRe.finditer(lower):
+        tStart, tEnd = m.start(), m.end()	# coords in transformed
+        if lowerCoords:
+            tStart, tEnd = lowerCoords[tStart], lowerCoords[tEnd-1] + 1
+
+        i = bisect.bisect_right(pieceStarts, tStart) - 1
+        pStart, pEnd, isReplacement = origCoords[i]
+        start = pStart if isReplacement else pStart + tStart - pieceStarts[i]
+
+        i = bisect.bisect_right(pieceStarts, tEnd - 1) - 1
+        pStart, pEnd, isReplacement = origCoords[i]
+        end = pEnd if isReplacement else pStart + tEnd - pieceStarts[i]
+        tokens.append( (start, end, m.group()) )
+    return tokens
+#---------------------------------
+
+# chars that lower case differently in place than in a token by itself:
+#  'I' w/ dot above lowers to 'i' + a combining dot, which is not a word char,
+#   so it splits a word when lower casing before tokenizing.
+#  Capital sigma lowers to a final or non-final sigma depending on the chars
+#   around it.
+LOWER_CONTEXT_CHARS = ['\u0130', '\u03a3']
+#---------------------------------
+
+replacementTokens = {}		# {(mapping key, tokenRe): [tokens]}
+
+def getReplacementTokens(key, tokenRe):
+    """ Return the list of tokenRe tokens in the replacement for mapping key
+    """
+    tokens = replacementTokens.get((key, tokenRe))
+    if tokens is None:
+        tokens = [ m.group().lower() for m in \
+                                    tokenRe.finditer(replacements[key]) ]
+        replacementTokens[(key, tokenRe)] = tokens
+    return tokens
+#---------------------------------
+
+##############################################
+# Optional instrumentation.
+# For each mapping, count how many times it matched, how many bytes it
+#   replaced, and how much time was spent searching for those matches.
+# The time to search for a match is charged to the mapping that matched,
+#   the time spent searching past the last match in a text is charged to
+#   "(no match)".
+# Turn on by setting the environment variable FEATURETRANSFORM_STATS to a
+#   filename (or '-' for stderr) or by calling enableInstrumentation().
+#   The report is written when the process exits.
+##############################################
+class MappingStats (object):
+    """
+    IS:     counts & times for each named Mapping
+    DOES:   record matches, merge stats from other processes, report
+    """
+    NOMATCH = '(no match)'
+
+    def __init__(self):
+        self.numTexts   = 0		# number of texts transformed
+        self.numBytes   = 0		# total length of those texts
+        keys = list(mappings.keys()) + [self.NOMATCH]
+        self.matches    = { k: 0 for k in keys }   # {key: num matches}
+        self.bytes      = { k: 0 for k in keys }   # {key: num bytes replaced}
+        self.seconds    = { k: 0.0 for k in keys } # {key: search time}
+
+    def recordText(self, text):
+        self.numTexts += 1
+        self.numBytes += len(text)
+
+    def recordMatch(self, key, numBytes, seconds):
+        if key is None:
+            key = self.NOMATCH
+        else:
+            self.matches[key] += 1
+            self.bytes[key]   += numBytes
+        self.seconds[key] += seconds
+
+    def merge(self, other):
+        """ Add the counts/times from another MappingStats to this one """
+        self.numTexts += other.numTexts
+        self.numBytes += other.numBytes
+        for k in self.matches.keys():
+            self.matches[k] += other.matches[k]
+            self.bytes[k]   += other.bytes[k]
+            self.seconds[k] += other.seconds[k]
+        return self
+
+    def getReport(self):
+        totSeconds = sum(self.seconds.values())
+        report = "featureTransform mapping stats: " + \
+                    "%d texts, %d bytes, %8.3f seconds\n" % \
+                                (self.numTexts, self.numBytes, totSeconds)
+        report += "%-12s %10s %12s %10s %6s\n" % \
+                        ('mapping', 'matches', 'bytes', 'seconds', '%time')
+        # biggest time hogs first
+        for k in sorted(self.seconds.keys(), key=lambda k: -self.seconds[k]):
+            pctTime = 100.0 * self.seconds[k]/totSeconds if totSeconds else 0.0
+            report += "%-12s %10d %12d %10.3f %6.2f\n" % \
+                (k, self.matches[k], self.bytes[k], self.seconds[k], pctTime)
+        return report
+# end class MappingStats ---------------------------
+
+stats = None			# MappingStats when instrumentation is on
+statsReportFile = None		# where to write stats report, '-' = stderr
+
+def enableInstrumentation(reportFile='-',	# filename or '-' for stderr
+    ):
+    """ Start recording MappingStats, write the report at process exit """
+    global stats, statsReportFile
+    if stats is None:
+        stats = MappingStats()
+        atexit.register(writeStatsReport)
+    statsReportFile = reportFile
+#---------------------------------
+
+def writeStatsReport():
+    if stats is None: return
+    if statsReportFile == '-':
+        sys.stderr.write(stats.getReport())
+    else:
+        with open(statsReportFile, 'w') as fp:
+            fp.write(stats.getReport())
+#---------------------------------
+
+if os.environ.get('FEATURETRANSFORM_STATS'):
+    enableInstrumentation(os.environ['FEATURETRANSFORM_STATS'])
+
+##############################################
+def transformTexts(texts,	# iterable of text strings
+                    workers=1,	# number of worker processes
+                    chunksize=8,# number of texts to send to a worker at once
+    ):
+    """
+    Return the list of transformed texts (in the same order as texts).
+    If workers > 1, fan the texts out to a pool of worker processes.
+    """
+    return list(iterTransformTexts(texts, workers=workers, chunksize=chunksize))
+#---------------------------------
+
+def iterTransformTexts(texts,	# iterable of text strings
+                    workers=1,	# number of worker processes
+                    chunksize=8,# number of texts to send to a worker at once
+    ):
+    """
+    Generator version of transformTexts(): yield the transformed texts in
+    the same order as texts.
+    Only a few chunks per worker are in flight at a time, so texts can be a
+    (long) stream, e.g., reading from a sample file.
+    """
+    if workers <= 1:
+        for text in texts:
+            yield transformText(text)
+        return
+
+    maxPending = 2 * workers		# chunks sent to the pool, not yielded yet
+    pending = collections.deque()	# AsyncResults for those chunks, in order
+
+    with multiprocessing.Pool(workers) as pool:
+        for chunk in chunkIterator(texts, chunksize):
+            pending.append(pool.apply_async(_transformChunk, (chunk,)))
+            if len(pending) >= maxPending:
+                yield from _chunkResults(pending.popleft())
+        while pending:
+            yield from _chunkResults(pending.popleft())
+#---------------------------------
+
+def _transformChunk(texts):
+    """
+    Worker process: return list of transformed texts, plus the MappingStats
+    for them if instrumentation is on (workers don't write stats reports).
+    """
+    global stats
+    if stats is not None:
+        stats = MappingStats()
+    return [ transformText(t) for t in texts ], stats
+#---------------------------------
 
-    return transformed
+def _chunkResults(asyncResult):
+    """ Return the transformed texts from a worker, merging its stats """
+    results, workerStats = asyncResult.get()
+    if stats is not None and workerStats is not None:
+        stats.merge(workerStats)
+    return results
 #---------------------------------
 
-def findMatchingGroup(m):
+def chunkIterator(items, chunksize):
     """
-    Given an re.Match object, m,
-    Find the key (name) of its group that actually matched.
-    Return the key & start & end coords of the matching string
+    Iterate through items in lists (chunks) of chunksize items
     """
-    gd = m.groupdict()		# dict of groups in m
-    for k in list(gd.keys()):
-        if gd[k] != None:	# the one that matched something
-            return (k, m.start(k), m.end(k))
-    return (None, None, None) # shouldn't happen since some group should match
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunksize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 #---------------------------------
 
 def debug(text):
@@ -372,6 +590,10 @@ if __name__ == "__main__":	# ad hoc tests
             print(text)
             print(transformText(text))
             print()
+        # the multiprocess version should give the same results in same order
+        print('transformTexts(workers=3) same as transformText: %s\n' % \
+            (transformTexts(tests, workers=3, chunksize=2) == \
+                                        [ transformText(t) for t in tests ]))
     if False:
         tests = [	# tumor tests
                 'adenoma fooadenoma xxxinoma xxxinomas neoplasm neoplasias'
@@ -11,6 +11,18 @@ Example Usage:
     for b in converter.text2FigText(text):
         print b  # a chunk of text that contains figure related text
 
+    # several flavors from one pass through the text
+    converter = MultiFigConverter(['legends', 'legCloseWords25',
+                                                    'legCloseWords50'])
+    figTexts = converter.text2FigTexts(text)	# {conversion name: blurbs}
+
+    # (start, end) offsets of the figure text in text instead of new strings
+    spans = converter.text2FigSpans(text)	# {conversion name: spans}
+    figText = joinSpans(text, spans['legCloseWords50'])
+
+    # the text w/o its references section (figure legends after it are kept)
+    text = removeReferences(text)
+
 To run automated tests:   python test_figureText.py [-v]
 
 #######################################################################
@@ -25,6 +37,8 @@ class Text2FigConverter (object):
        of strings that are figure/table legends and/or (parts of) paragraphs
        that refer to figures/tables.
     DOES: text2FigText('some text')
+          text2FigSpans('some text') - (start, end) offsets in the text of
+            the figure text (see MultiFigConverter.text2FigSpans())
 
     3 flavors of conversion are supported:
         (1) just figure/table legends - paragraph starts with "figure"...
@@ -56,6 +70,118 @@ class Text2FigConverter (object):
             return text2FigText_Legend(text)
         elif self.conversionType == 'legParagraphs':
             return text2FigText_LegendAndParagraph(text)
+
+    def text2FigSpans(self, text,
+        ):
+        """
+        Return list of (start, end) offsets in text of the figure/table text
+        """
+        name = self.getConversionName()
+        return MultiFigConverter([name]).text2FigSpans(text)[name]
+
+    def getConversionName(self):
+        """ Return the conversion name for this converter's flavor
+            (see MultiFigConverter)
+        """
+        if self.conversionType == 'legCloseWords':
+            return 'legCloseWords%d' % self.numWords
+        return self.conversionType
+#---------------------------------
+
+class MultiFigConverter (object):
+    """
+    IS an object that knows how to convert text into several flavors of
+       figure text at once (see Text2FigConverter), e.g., for tuning
+       experiments.
+    DOES: text2FigTexts('some text') - {conversion name: list of blurbs}
+          text2FigSpans('some text') - {conversion name: list of spans}
+    Conversion names are 'legends', 'legParagraphs', 'legCloseWords<n>'
+        (n = numWords, e.g., 'legCloseWords50').
+    The paragraphs are found once, legendRe and figureRe are run once per
+        paragraph, and each paragraph is split into words once for all the
+        legCloseWords flavors. The blurbs for each flavor are the same as
+        Text2FigConverter gives.
+    """
+    def __init__(self,
+                conversionNames,	# list of conversion names
+                ):
+        self.conversionNames = list(conversionNames)
+        self.legendNames = []	# conversions that include legends (all)
+        self.paragraphNames = []	# conversions that include fig paragraphs
+        self.numWords = {}	# {legCloseWords conversion name: numWords}
+        for name in self.conversionNames:
+            conversionType, numWords = parseConversionName(name)
+            self.legendNames.append(name)
+            if conversionType == 'legParagraphs':
+                self.paragraphNames.append(name)
+            elif conversionType == 'legCloseWords':
+                self.numWords[name] = numWords
+
+    def text2FigTexts(self, text,
+        ):
+        """
+        Return {conversion name: list of figure/table text blurbs in text}
+        """
+        figTexts = { name: [] for name in self.conversionNames }
+        for p in paragraphIterator(text):
+            if legendRe.match(p):		# have figure/table legend
+                for name in self.legendNames:
+                    figTexts[name].append(p)
+                continue
+            matches = list(figureRe.finditer(p))
+            if not matches:
+                continue
+            for name in self.paragraphNames:
+                figTexts[name].append(p)
+            if self.numWords:
+                words, chunkStarts = getFigureWords(p, matches)
+                for name, numWords in self.numWords.items():
+                    figTexts[name] += getWordBlurbs(words, chunkStarts,
+                                                                    numWords)
+        return figTexts
+
+    def text2FigSpans(self, text,
+        ):
+        """
+        Return {conversion name: list of (start, end) offsets in text}
+            text[start:end] are the legends, fig paragraphs, and the text
+            from the 1st to the last word of each legCloseWords blurb.
+            Unlike the blurbs, the spans keep the text's own whitespace.
+            Overlapping spans are merged, the spans are in text order.
+        Use joinSpans() to get the text of the spans.
+        """
+        figSpans = { name: [] for name in self.conversionNames }
+        for start, end in paragraphSpanIterator(text):
+            if legendRe.match(text, start, end):	# figure/table legend
+                for name in self.legendNames:
+                    figSpans[name].append((start, end))
+                continue
+            matches = list(figureRe.finditer(text, start, end))
+            if not matches:
+                continue
+            for name in self.paragraphNames:
+                figSpans[name].append((start, end))
+            if self.numWords:
+                wordSpans, chunkStarts = getFigureWordSpans(text, matches,
+                                                                start, end)
+                for name, numWords in self.numWords.items():
+                    figSpans[name] += mergeSpans([ (wordSpans[first][0],
+                                                    wordSpans[last-1][1]) \
+                                    for first, last in \
+                                    getBlurbRanges(chunkStarts, numWords) ])
+        return figSpans
+#---------------------------------
+
+def parseConversionName(name,	# 'legends', 'legParagraphs', 'legCloseWords<n>'
+    ):
+    """ Return (conversionType, numWords) for a conversion name
+    """
+    m = re.match(r'(legCloseWords)(\d+)$', name)
+    if m:
+        return m.group(1), int(m.group(2))
+    if name not in ['legends', 'legParagraphs']:
+        raise AttributeError("invalid text2fig conversion name '%s'\n" % name)
+    return name, None
 #---------------------------------
 
 # Nomenclature:
@@ -69,6 +195,10 @@ PARAGRAPH_BOUNDARY_LEN = len(PARAGRAPH_BOUNDARY)
 #  i.e.,  "fig" or "figure" or "figures" or "table" or "tables"
 figureRe = re.compile(r'\b(?:fig(?:ure)?|table)s?\b', re.IGNORECASE)
 
+# match a word (as str.split() splits words)
+wordRe = re.compile(r'\S+')
+nonSpaceRe = re.compile(r'\S')
+
 # match the words that can begin a figure or table legend.
 #   i.e., "fig" or "figure" or "supp...figure" or "table"
 #   Note no plurals
@@ -88,6 +218,87 @@ legendRe = re.compile(\
         r')\b',
         re.IGNORECASE)
 
+# match a references/bibliography section heading: a line that is just
+#   "References", "Bibliography", "Literature Cited", ... maybe numbered
+#   and/or followed by ":"
+referencesRe = re.compile(\
+        r'^[ \t]*(?:(?:\d+|[ivx]+)\.?[ \t]*)?' +	# optional section number
+        r'(?:' +
+            spacedOutRegex('references') + r'(?:[ \t]+and[ \t]+notes)?' + r'|'+
+            spacedOutRegex('bibliography') + r'|' +
+            r'literature[ \t]+cited' + r'|' +
+            r'cited[ \t]+literature' + r'|' +
+            r'works[ \t]+cited' +
+        r')' +
+        r'[ \t]*:?[ \t]*$',
+        re.IGNORECASE | re.MULTILINE)
+
+REFERENCES_MIN_FRACTION = 0.3	# references section heading must be at least
+                                #  this far into the text (not, e.g., in a
+                                #  table of contents)
+REFERENCES_TAG = 'ref_section_start'	# paragraph inserted by tagReferences()
+
+#---------------------------------
+
+def findReferencesStart(text,
+                    minFraction=REFERENCES_MIN_FRACTION,
+    ):
+    """
+    Return the offset in text of the start of the references/bibliography
+        section (its heading), or -1 if there is none.
+    Uses the 1st heading at least minFraction of the way into the text.
+    """
+    m = referencesRe.search(text, int(len(text) * minFraction))
+    return m.start() if m else -1
+#---------------------------------
+
+def findReferencesSpan(text,
+                    minFraction=REFERENCES_MIN_FRACTION,
+    ):
+    """
+    Return (start, end) offsets in text of the references section, or None
+        if there is none.
+    The section runs from its heading up to the paragraph boundary before
+        the next figure/table legend paragraph (legends often come after the
+        references in extracted text) or to the end of text.
+    """
+    start = findReferencesStart(text, minFraction)
+    if start == -1:
+        return None
+    endPara = text.find(PARAGRAPH_BOUNDARY, start)
+    while endPara != -1:
+        m = nonSpaceRe.search(text, endPara + PARAGRAPH_BOUNDARY_LEN)
+        if not m:
+            break
+        if legendRe.match(text, m.start()):	# figure/table legend
+            return (start, endPara)
+        endPara = text.find(PARAGRAPH_BOUNDARY, m.start())
+    return (start, len(text))
+#---------------------------------
+
+def removeReferences(text,
+                    minFraction=REFERENCES_MIN_FRACTION,
+    ):
+    """ Return text w/o its references section, keeping any figure/table
+        legends (and the text after them) that follow it.
+    """
+    span = findReferencesSpan(text, minFraction)
+    if not span:
+        return text
+    return text[:span[0]] + text[span[1]:]
+#---------------------------------
+
+def tagReferences(text,
+                    minFraction=REFERENCES_MIN_FRACTION,
+    ):
+    """ Return text w/ a REFERENCES_TAG paragraph inserted before the
+        references section
+    """
+    start = findReferencesStart(text, minFraction)
+    if start == -1:
+        return text
+    return text[:start] + PARAGRAPH_BOUNDARY + REFERENCES_TAG + \
+                                        PARAGRAPH_BOUNDARY + text[start:]
 #---------------------------------
 
 def paragraphIterator(text,	# text (string) to search for paragraphs
@@ -103,6 +314,49 @@ def paragraphIterator(text,	# text (string) to search for paragraphs
     yield text[start: ].strip()
 #---------------------------------
 
+def paragraphSpanIterator(text,	# text (string) to search for paragraphs
+    ):
+    """iterate through (start, end) offsets in text of the paragraphs,
+        i.e., text[start:end] is what paragraphIterator() gives
+    """
+    start = 0
+    while True:
+        endPara = text.find(PARAGRAPH_BOUNDARY, start)
+        if endPara == -1:
+            endPara = len(text)
+        p = text[start : endPara]
+        pStart = start + len(p) - len(p.lstrip())
+        pEnd   = max(start + len(p.rstrip()), pStart)
+        yield (pStart, pEnd)
+        if endPara == len(text):
+            break
+        start = endPara + PARAGRAPH_BOUNDARY_LEN
+#---------------------------------
+
+def mergeSpans(spans,		# list of (start, end), sorted by start
+    ):
+    """ Return list of spans w/ overlapping (or touching) spans merged
+    """
+    merged = []
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+#---------------------------------
+
+def joinSpans(text, spans,
+                sep='\n\n',		# what RefSample figure text preprocessors
+                                #  join figure text with
+    ):
+    """
+    Return the text of the spans in text, separated by sep.
+    """
+    return sep.join([ text[start:end] for start, end in spans ])
+#---------------------------------
+
 def text2FigText_Legend(text,
     ):
     """
@@ -144,54 +398,123 @@ def text2FigText_LegendAndWords(text, numWords=50,):
     return figParagraphs
 #---------------------------------
 
-def getFigureBlurbs(text, numWords=50,):
+def getFigureBlurbs(text, numWords=50,
+                    matches=None,	# figureRe matches in text if already
+                                        #  found
+    ):
     """
     Search through text for references to figures/tables.
     Return a list of text blurbs consisting of numWords around those references
     """
-    matches = list(figureRe.finditer(text))	# all matches of fig/tbl words
+    if matches is None:
+        matches = list(figureRe.finditer(text))	# all matches of fig/tbl words
 
     if len(matches) == 0: return []
 
-    blurbs = []				# text blurbs to return
+    words, chunkStarts = getFigureWords(text, matches)
+    return getWordBlurbs(words, chunkStarts, numWords)
+#---------------------------------
 
-    # 1st match, leading chunk before first fig/tbl word
-    m = matches[0]
-    textChunk = text[ : m.start() ]	# text before the fig/tbl word
-    words = textChunk.split()		# the words
+def getFigureWords(text, matches,	# figureRe matches in text (not empty)
+    ):
+    """
+    Return (words, chunkStarts): the words of text, split at the start of each
+        fig/tbl word, and the index in words of the start of each chunk:
+        chunk 0:  words before the 1st fig word
+        chunk i:  words from fig word i up to (not incl) fig word i+1
+        last chunk:  words from the last fig word to the end of text
+        chunkStarts[-1] is len(words), so chunk i is
+            words[chunkStarts[i]:chunkStarts[i+1]]
+    """
+    starts = [ m.start() for m in matches ]
+    words = text[ : starts[0] ].split()
+    chunkStarts = [0]
+    for start, nextStart in zip(starts, starts[1:]):
+        chunkStarts.append(len(words))
+        words += text[ start : nextStart ].split()
+    chunkStarts.append(len(words))
+    words += text[ starts[-1] : ].split()
+    chunkStarts.append(len(words))
+    return words, chunkStarts
+#---------------------------------
+
+def getFigureWordSpans(text, matches,	# figureRe matches in text[start:end]
+                        start, end,	# the paragraph in text
+    ):
+    """
+    Return (wordSpans, chunkStarts) like getFigureWords(text[start:end]),
+        but w/ the (start, end) offsets in text of each word instead of
+        the word.
+    """
+    bounds = [start] + [ m.start() for m in matches ] + [end]
+    wordSpans = []
+    chunkStarts = []
+    for chunkStart, chunkEnd in zip(bounds, bounds[1:]):
+        chunkStarts.append(len(wordSpans))
+        wordSpans += [ m.span() for m in \
+                                wordRe.finditer(text, chunkStart, chunkEnd) ]
+    chunkStarts.append(len(wordSpans))
+    return wordSpans, chunkStarts
+#---------------------------------
+
+def getWordBlurbs(words, chunkStarts,	# from getFigureWords()
+                    numWords=50,
+    ):
+    """
+    Return a list of text blurbs consisting of numWords around the fig/tbl
+        words.
+    Each blurb is a run of consecutive words (see getBlurbRanges()), so it
+        is joined once.
+    """
+    blurbs = [ ' '.join(words[first:last]) for first, last in \
+                                        getBlurbRanges(chunkStarts, numWords) ]
+    if chunkStarts[1] == 0:	# no words before 1st fig word, blurb starts
+        blurbs[0] = ' ' + blurbs[0]	#  w/ blank (' '.join([]) + ' ' ...)
+    return blurbs
+#---------------------------------
 
-        # curBlurb is text so far of the numWords around the current
+def getBlurbRanges(chunkStarts,		# from getFigureWords()
+                    numWords=50,
+    ):
+    """
+    Return list of (first, last) word indexes of the blurbs of numWords
+        around the fig/tbl words: blurb is words[first:last].
+    Found by index arithmetic on chunkStarts, w/o looking at the words.
+    """
+    ranges = []
+
+    def tailStart(start, end):		# start of the last numWords of a chunk
+        if 0 < numWords < end - start:
+            return end - numWords
+        return start			# (words[-0:] is all the words)
+
+    # 1st match, leading chunk before first fig/tbl word
+        # blurbStart is the start of the numWords around the current
         #   match we are looking at
-    curBlurb = ' '.join(words[-numWords:])	# Start w/ words before 1st m
+    blurbStart = tailStart(0, chunkStarts[1])	# Start w/ words before 1st m
 
     # for each match before last one,
-    #   look at textChunks between fig word matches
-    for i in range(len(matches)-1):
-        textChunk = text[ matches[i].start() : matches[i+1].start() ]
-        words = textChunk.split() 	# words incl 1st fig word but not 2nd
+    #   look at chunks between fig word matches
+    for i in range(1, len(chunkStarts)-2):
+        start, end = chunkStarts[i], chunkStarts[i+1]
 
         # Have '...fig ... intervening text fig...',
-        #   words[] are the words in   fig ...intervening text
-        # Could have two blurbs:  words[:numWords] and words[-numWords:]
+        #   words[start:end] are the words in   fig ...intervening text
+        # Could have two blurbs:  the 1st numWords (+fig word) and the last
+        #   numWords.
         # But if these two blurbs overlap, really only one blurb:
         #   the whole intervening text
 
-        if numWords > (len(words)-1)/2:	# have overlap (-1: dont count fig word)
-            curBlurb += ' ' + ' '.join(words)	# no blurb boundary yet
+        if numWords > (end-start-1)/2:	# have overlap (-1: dont count fig word)
+            continue			# no blurb boundary yet
 
-        else:				# have 2 blurbs & blurb boundary
-            eoBlurbWords = ' '.join(words[:numWords+1]) # +1: incl 'fig' word
-            curBlurb += ' ' + eoBlurbWords
-            blurbs.append(curBlurb)			# save this blurb
-
-            curBlurb = ' '.join(words[-numWords:]) 	# start new blurb
+        # have 2 blurbs & blurb boundary
+        ranges.append((blurbStart, start + numWords + 1)) # +1: incl 'fig' word
+        blurbStart = tailStart(start, end)		# start new blurb
 
     # last match, trailing chunk after last fig/tbl word
-    m = matches[len(matches) -1]
-    textChunk = text[ m.start() : ]
-    words = textChunk.split()
-    curBlurb += ' ' + ' '.join(words[:numWords+1])	# +1: incl 'fig' word
-    blurbs.append(curBlurb)
+    start, end = chunkStarts[-2], chunkStarts[-1]
+    ranges.append((blurbStart, min(start + numWords + 1, end)))
 
-    return blurbs
+    return ranges
 #---------------------------------
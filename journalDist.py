@@ -8,8 +8,10 @@
 # Write to stdout:
 #  journalname all_count, discard_count, keep_count
 
-# ClassifiedRefSampleSet in sampleDataLib.py is responsible for reading the
-#   samples and sample details.
+# SampleFileReader in sampleDataLib.py is responsible for reading the
+#   samples (one at a time, so memory use is flat) and sample details.
+# For columnar sample files (see sdConvertSamples.py), only the journal and
+#   knownClassName columns are read.
 #
 import sys
 import argparse
@@ -67,9 +69,8 @@ def main():
 
     for fn in args.inputFiles:
 
-        if fn == '-': fn = sys.stdin
-        sampleSet = sampleDataLib.ClassifiedRefSampleSet( \
-                                        sampleObjType=sampleObjType).read(fn)
+        # sampleSet has meta/header info, no samples
+        sampleSet, journalsAndClasses = getJournalsAndClasses(fn, sampleObjType)
         if firstFile:
             sampleObjType = sampleSet.getSampleObjType()
             verbose("Sample type: %s\n" % sampleObjType.__name__)
@@ -82,9 +83,7 @@ def main():
                     sampleSet.getSampleObjType().__name__) )
                 exit(5)
 
-        for s in sampleSet.getSamples():
-            journal = s.getJournal()
-
+        for journal, isPositive in journalsAndClasses:
             if journal in counts:
                 jc = counts[journal]
             else:
@@ -92,7 +91,7 @@ def main():
                 counts[journal] = jc
 
             jc.totalCount += 1
-            if s.isPositive():
+            if isPositive:
                 jc.positiveCount += 1
                 nPos += 1
             else:
@@ -148,6 +147,36 @@ def main():
 
 # ---------------------
 
+def getJournalsAndClasses(fn, sampleObjType):
+    """
+    Return (sampleSet, iterator of (journal, isPositive) for the samples in fn)
+        sampleSet is an empty SampleSet of the file's sampleObjType.
+    For a columnar sample file, only the journal & knownClassName columns
+        are read.
+    """
+    if sampleDataLib.isColumnarSampleFile(fn):
+        colFile = sampleDataLib.ColumnarSampleFile(fn)
+        sampleSet = sampleDataLib.SampleSet( \
+                                    sampleObjType=colFile.getSampleObjType())
+        posClassName = \
+                sampleSet.getSampleClassNames()[sampleSet.getY_positive()]
+        journalsAndClasses = ( (journal, className == posClassName) \
+                for journal, className in zip( \
+                                    colFile.columnIterator('journal'),
+                                    colFile.columnIterator('knownClassName')) )
+    else:
+        reader = sampleDataLib.SampleFileReader(fn,sampleObjType=sampleObjType)
+        sampleSet = reader.getHeaderSampleSet()
+        journalsAndClasses = readJournalsAndClasses(reader)
+    return sampleSet, journalsAndClasses
+# ---------------------
+
+def readJournalsAndClasses(reader):
+    for s in reader.sampleIterator():
+        yield (s.getJournal(), s.isPositive())
+    reader.close()
+# ---------------------
+
 def verbose(text):
     if args.verbose: sys.stderr.write(text)
 
@@ -4,6 +4,7 @@
 from sklearn.pipeline import Pipeline
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.ensemble import GradientBoostingClassifier
+from sampleDataLib import splitPreTokenized
 
 pipeline = Pipeline( [
 ('vectorizer', CountVectorizer(
@@ -13,6 +14,10 @@ pipeline = Pipeline( [
                 stop_words='english',
                 binary=True,
                 #token_pattern=r'\b([a-z_]\w+)\b', Use default
+                # documents are already tokenized by removeURLsCleanStem,
+                #  just split them (same tokens as default token_pattern)
+                tokenizer=splitPreTokenized,
+                token_pattern=None,
                 ngram_range=(1,2),
                 min_df=0.02,
                 max_df=.75,
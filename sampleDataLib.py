@@ -7,9 +7,29 @@
 #   python test_sampleDataLib.py -v
 #
 import sys
+import os
 import os.path
 import string
 import re
+import time
+import heapq
+import functools
+import atexit
+import collections
+import collections.abc
+import hashlib
+import zlib
+import io
+import json
+import array
+import struct
+import shutil
+import tempfile
+import importlib
+import mmap
+import gzip
+import bz2
+import lzma
 from copy import copy
 from baseSampleDataLib import *
 import utilsLib
@@ -59,6 +79,7 @@ In baseSampleDataLib.py (MLTextTools)
         - a collection of Samples of the same type (BaseSample or descendent)
         - reads/writes Sample files incl. optional meta data
         - get parallel lists:    getSamples(), getSampleIDs(), getDocuments() 
+            (see also SampleSetView in sampleDataLib.py for lazy versions)
     ClassifiedSampleSet
         - a SampleSet of ClassifiedSamples
         - get parallel lists:    getKnownClassNames(), getKnownYvalues()
@@ -110,6 +131,13 @@ In sampleDataLib.py (autolittriage)
 FIELDSEP     = '|'      # field separator when reading/writing sample fields
 RECORDEND    = ';;'     # record ending str when reading/writing sample files
 
+def cleanDelimiters(text):
+    """ remove RECORDEND and FIELDSEPs from text (replace w/ ' ')
+        so it can be a sample field value.
+    """
+    return text.replace(RECORDEND,' ').replace(FIELDSEP,' ')
+#-----------------------------------
+
 figConverterLegends      = figureText.Text2FigConverter( \
                                             conversionType='legends')
 figConverterLegParagraphs   = figureText.Text2FigConverter( \
@@ -122,9 +150,486 @@ figConverterLegCloseWords50 = figureText.Text2FigConverter( \
 urls_re      = re.compile(r'\b(?:https?://|www[.]|doi)\S*',re.IGNORECASE)
 token_re     = re.compile(r'\b([a-z_]\w+)\b',re.IGNORECASE)
 
-stemmer = None		# see preprocessor below
+PREPROCESSOR_CHAIN_SEP = '+'	# separates preprocessor names in a chain name
+
+stemmer = None		# StemCache, see getStemmer() below
+
+STEMCACHE_ENV = 'STEMCACHE'	# env var: file to load/save the stem cache
+STEMCACHE_MAXSIZE = 500000	# max number of tokens in the stem cache
+#-----------------------------------
+
+class StemCache (object):
+    """
+    IS:     a bounded, least recently used (LRU) cache of {token: stem}
+                in front of a stemmer.
+    HAS:    the stemmer, the cache
+    DOES:   stem(token), save the cache to a file, load it from a file.
+    Most tokens in our documents are stemmed over and over, so this saves
+        most of the Snowball stemming work. Saving/loading the cache carries
+        that savings across runs.
+    File format:  token<tab>stem  lines, least recently used first.
+    """
+    def __init__(self, stemmer,			# has a stem(token) method
+                        maxSize=STEMCACHE_MAXSIZE,
+        ):
+        self.stemmer = stemmer
+        self.maxSize = maxSize
+        self.stems   = collections.OrderedDict()	# {token: stem}
+        self.hits    = 0
+        self.misses  = 0
+
+    def stem(self, token):
+        stem = self.stems.get(token)
+        if stem is not None:
+            self.hits += 1
+            self.stems.move_to_end(token)
+            return stem
+
+        self.misses += 1
+        stem = self.stemmer.stem(token)
+        self.stems[token] = stem
+        if len(self.stems) > self.maxSize:
+            self.stems.popitem(last=False)	# least recently used
+        return stem
+
+    def load(self, fileName):
+        """ Add the {token: stem} pairs in fileName to the cache """
+        with open(fileName, 'r') as fp:
+            for line in fp:
+                token, stem = line.rstrip('\n').split('\t')
+                self.stems[token] = stem
+        while len(self.stems) > self.maxSize:
+            self.stems.popitem(last=False)
+        return self
+
+    def save(self, fileName):
+        """ Write the cache to fileName (replacing it all at once) """
+        tmpFileName = "%s.%d.tmp" % (fileName, os.getpid())
+        with open(tmpFileName, 'w') as fp:
+            for token, stem in self.stems.items():
+                fp.write("%s\t%s\n" % (token, stem))
+        os.replace(tmpFileName, fileName)
+        return self
+
+    def getNumTokens(self):	return len(self.stems)
+    def getHits(self):		return self.hits
+    def getMisses(self):	return self.misses
+# end class StemCache ------------------------
+
+def getStemmer():
+    """
+    Return the (cached) stemmer used by preprocessors.
+    If the STEMCACHE environment variable is set, it is the file to load the
+        stem cache from (if it exists) and save it to at exit.
+        atexit functions do not run in multiprocessing Pool workers, so pool
+        initializers should register saveStemCache() w/
+        multiprocessing.util.Finalize (see sdPreprocess.py).
+    """
+    # removeURLsCleanStem is currently the only preprocessor that uses a
+    # stemmer.
+    # Would be clearer to import and instantiate one stemmer above,
+    # BUT that requires nltk (via anaconda) to be installed on each
+    # server we use. This is currently not installed on our linux servers
+    # By importing here, we can use RefSample in situations where we don't
+    # call this preprocessor, and it will work on our current server setup.
+    global stemmer
+    if not stemmer:
+        import nltk.stem.snowball as nltk
+        stemmer = StemCache(nltk.EnglishStemmer())
+
+        cacheFile = os.environ.get(STEMCACHE_ENV)
+        if cacheFile:
+            if os.path.isfile(cacheFile):
+                stemmer.load(cacheFile)
+            atexit.register(saveStemCache)
+    return stemmer
+#-----------------------------------
+
+def saveStemCache():
+    """
+    Save the stem cache to the STEMCACHE file, if it is set & the stemmer
+        has been used. Only the 1st call in a process saves.
+    """
+    global stemCacheSaved
+    cacheFile = os.environ.get(STEMCACHE_ENV)
+    if cacheFile and stemmer and not stemCacheSaved:
+        stemmer.save(cacheFile)
+        stemCacheSaved = True
+
+stemCacheSaved = False
+#-----------------------------------
+
+def cleanStemText(text):
+    """
+    Return text cleaned & stemmed for the removeURLsCleanStem preprocessor:
+        " token1 token2 ..." - each token stemmed & preceded by a blank.
+    """
+    stem = getStemmer().stem
+    return ''.join([ ' ' + stem(token) for start, end, token in \
+                                                        tokenizeText(text) ])
+#-----------------------------------
+
+def tokenizeText(text):
+    """
+    Return list of (start, end, token) for the tokens in text as the
+        removeURLsCleanStem preprocessor sees them (before stemming):
+        URLs removed, featureTransform'ed, lower cased, tokens that start w/
+        a letter or _ and are 2 or more chars.
+    start, end are the coords of the token in text.
+    Transforming and tokenizing are done in one pass through each URL-free
+        piece of text.
+    """
+    tokens = []
+    pos = 0				# start of the current URL-free piece
+    for m in urls_re.finditer(text):
+        tokens += pieceTokens(text[pos:m.start()], pos)
+        pos = m.end()
+    tokens += pieceTokens(text[pos:], pos)
+    return tokens
+#-----------------------------------
+
+def pieceTokens(piece, offset):
+    return [ (start + offset, end + offset, token) for start, end, token in \
+                        featureTransform.transformTokens(piece, token_re) ]
+#-----------------------------------
+
+def splitPreTokenized(doc):
+    """
+    Tokenizer for a vectorizer, e.g.,
+        CountVectorizer(tokenizer=splitPreTokenized, token_pattern=None)
+    for documents that are already tokenized by removeURLsCleanStem
+    (blank separated tokens). Gives the same tokens as CountVectorizer's
+    default token_pattern w/o rescanning the documents w/ a regex.
+    """
+    return [ t for t in doc.split() if len(t) > 1 ]
+#-----------------------------------
+
+# Text functions for RefSample field preprocessors (see
+#  RefSample.fieldPreprocessors below)
+
+def legendsText(text):
+    # just figure legends
+    return '\n\n'.join(figConverterLegends.text2FigText(text))
+
+def legParagraphsText(text):
+    # figure legends + paragraphs discussing figures
+    return '\n\n'.join(figConverterLegParagraphs.text2FigText(text))
+
+def legCloseWords50Text(text):
+    # figure legends + 50 words around "figure" references in paragraphs
+    return '\n\n'.join(figConverterLegCloseWords50.text2FigText(text))
+#-----------------------------------
+
+def runPreprocessorSteps(steps, sample):
+    """
+    Apply compiled preprocessor steps to sample, return the (modified) sample.
+    steps: list of
+        preprocessor name - call that preprocessor method
+        {field name: [(preprocessor name, text function)]} - fused field
+                    preprocessors: get each field once, run it through the
+                    functions, set it once.
+    """
+    for step in steps:
+        if isinstance(step, str):
+            sample = getattr(sample, step)()
+        elif profiler:
+            values = sample.values
+            for fieldName, funcs in step.items():
+                text = values[fieldName]
+                for name, func in funcs:
+                    startTime = time.perf_counter()
+                    newText = func(text)
+                    profiler.record(name, fieldName,
+                                        time.perf_counter() - startTime,
+                                        len(text), len(newText))
+                    text = newText
+                values[fieldName] = text
+            profiler.endSample(sample.getID())
+        else:
+            values = sample.values
+            for fieldName, funcs in step.items():
+                text = values[fieldName]
+                for name, func in funcs:
+                    text = func(text)
+                values[fieldName] = text
+    return sample
+#-----------------------------------
+
+# Preprocessor profiling.
+# If the PROFILE_ENV environment variable is set, or startProfiling() is
+#  called, the time each preprocessor takes and the size of the text fields
+#  it reads & writes are collected, and a report is written at exit.
+
+PROFILE_ENV = 'PREPROCESSOR_PROFILE'	# env var: file to write the
+                                        #  preprocessor profile report to,
+                                        #  '-' for stderr
+PROFILE_NUM_WORST = 5		# number of slowest samples to report per
+                                #  preprocessor
+
+profiler = None		# PreprocessorProfiler, if profiling
+
+class PreprocessorProfiler (object):
+    """
+    IS:     a collector of preprocessor run times & text sizes
+    HAS:    for each (preprocessor, field): number of calls, seconds,
+                characters in, characters out
+            for each preprocessor: the samples it took the longest on
+    DOES:   record(...) a preprocessor run on a field, endSample(ID),
+            merge(other profiler), popProfile(), getReport()
+    Field preprocessors (see RefSample.fieldPreprocessors) are recorded per
+        field. Other preprocessors are recorded for the field '*' w/ the
+        total size of the sample's text fields.
+    A profiler can be pickled, e.g., to send from a worker process to be
+        merged into the profiler of the main process.
+    """
+    def __init__(self, numWorst=PROFILE_NUM_WORST):
+        self.numWorst = numWorst
+        self.running  = False	# True while a preprocessor method is running
+        self.reset()
+
+    def reset(self):
+        self.fieldStats = {}	# {(preprocessor, field): [calls, seconds,
+                                #                       chars in, chars out]}
+        self.worst      = {}	# {preprocessor: heap of (seconds, ID, chars
+                                #   in)} the slowest samples
+        self.numSamples = {}	# {preprocessor: number of samples}
+        self.current    = {}	# {preprocessor: [seconds, chars in]} for the
+                                #   sample being preprocessed
+    def record(self, preprocessor, fieldName, seconds, charsIn, charsOut):
+        stats = self.fieldStats.get((preprocessor, fieldName))
+        if stats is None:
+            stats = self.fieldStats[(preprocessor, fieldName)] = [0, 0.0, 0, 0]
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] += charsIn
+        stats[3] += charsOut
+        current = self.current.setdefault(preprocessor, [0.0, 0])
+        current[0] += seconds
+        current[1] += charsIn
+
+    def endSample(self, ID):
+        """ Done recording preprocessor runs on the sample w/ this ID """
+        for preprocessor, (seconds, charsIn) in self.current.items():
+            self.numSamples[preprocessor] = \
+                                    self.numSamples.get(preprocessor, 0) + 1
+            self.addWorst(preprocessor, (seconds, ID, charsIn))
+        self.current = {}
+
+    def addWorst(self, preprocessor, entry):
+        worst = self.worst.setdefault(preprocessor, [])
+        if len(worst) < self.numWorst:
+            heapq.heappush(worst, entry)
+        elif entry > worst[0]:
+            heapq.heapreplace(worst, entry)
+
+    def merge(self, other):
+        """ Add the profile collected by other to this one """
+        for key, (calls, seconds, charsIn, charsOut) in \
+                                                    other.fieldStats.items():
+            stats = self.fieldStats.setdefault(key, [0, 0.0, 0, 0])
+            stats[0] += calls
+            stats[1] += seconds
+            stats[2] += charsIn
+            stats[3] += charsOut
+        for preprocessor, n in other.numSamples.items():
+            self.numSamples[preprocessor] = \
+                                    self.numSamples.get(preprocessor, 0) + n
+        for preprocessor, worst in other.worst.items():
+            for entry in worst:
+                self.addWorst(preprocessor, entry)
+        return self
+
+    def popProfile(self):
+        """ Return a profiler w/ what has been collected so far & reset """
+        popped = PreprocessorProfiler(self.numWorst)
+        popped.merge(self)
+        self.reset()
+        return popped
+
+    def getReport(self):
+        """ Return the profile report text """
+        totalSeconds = sum([ s[1] for s in self.fieldStats.values() ])
+        lines = ["Preprocessor profile: %.3f seconds in preprocessors" % \
+                                                                totalSeconds,
+                "(sizes in millions of characters)",
+                "%-28s %-14s %8s %10s %6s %9s %9s %8s" % ('preprocessor',
+                'field', 'calls', 'seconds', '%time', 'M in', 'M out', 'M/sec'),
+                ]
+        for (preprocessor, fieldName), (calls, seconds, charsIn, charsOut) \
+                in sorted(self.fieldStats.items(), key=lambda x: -x[1][1]):
+            lines.append("%-28s %-14s %8d %10.3f %6.1f %9.3f %9.3f %8.3f" % \
+                (preprocessor, fieldName, calls, seconds,
+                100.0 * seconds / totalSeconds if totalSeconds else 0.0,
+                charsIn/1000000.0, charsOut/1000000.0,
+                charsIn/1000000.0/seconds if seconds else 0.0))
+
+        lines.append("Slowest samples per preprocessor:")
+        for preprocessor, worst in sorted(self.worst.items()):
+            lines.append("%s (%d samples)" % (preprocessor,
+                                        self.numSamples.get(preprocessor, 0)))
+            for seconds, ID, charsIn in sorted(worst, reverse=True):
+                lines.append("    %-24s %10.3f sec %9.3f M in" % \
+                                        (ID, seconds, charsIn/1000000.0))
+        return '\n'.join(lines) + '\n'
+
+    def writeReport(self, fileName):	# fileName '-' for stderr
+        if fileName == '-':
+            sys.stderr.write(self.getReport())
+        else:
+            with open(fileName, 'w') as fp:
+                fp.write(self.getReport())
+# end class PreprocessorProfiler ------------------------
+
+def startProfiling(reportFile=None,	# file to write report to at exit,
+                                        #  '-' for stderr, None for no report
+    ):
+    """ Start collecting a (new) preprocessor profile, return the profiler
+    """
+    global profiler
+    profiler = PreprocessorProfiler()
+    if reportFile:
+        atexit.register(profiler.writeReport, reportFile)
+    return profiler
+#-----------------------------------
+
+def stopProfiling():
+    global profiler
+    profiler = None
+#-----------------------------------
+
+def profiledPreprocessor(method):
+    """
+    Decorator for preprocessor methods: when profiling, record the method's
+        run. Field preprocessors are run via their preprocessor chain, which
+        records each field separately (see runPreprocessorSteps()).
+    Preprocessors called by a preprocessor are not recorded separately.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def profiledMethod(self):
+        if not profiler or profiler.running:
+            return method(self)
+
+        profiler.running = True
+        try:
+            if self.isFieldPreprocessor(name):
+                return self.getPreprocessorChain([name])(self)
+
+            fieldNames = self.textFieldNames
+            charsIn = sum([ len(self.getField(f)) for f in fieldNames ])
+            startTime = time.perf_counter()
+            sample = method(self)
+            seconds = time.perf_counter() - startTime
+            charsOut = sum([ len(sample.getField(f)) for f in fieldNames ])
+            profiler.record(name, '*', seconds, charsIn, charsOut)
+            profiler.endSample(sample.getID())
+            return sample
+        finally:
+            profiler.running = False
+    return profiledMethod
+#-----------------------------------
+
+if os.environ.get(PROFILE_ENV):
+    startProfiling(os.environ[PROFILE_ENV])
+
+class FieldLayout (object):
+    """
+    IS:     the layout of a FieldValues mapping: the position of each field
+                name in its value list, and which fields' values to intern.
+                Shared by all the FieldValues for a python class & field list.
+    """
+    __slots__ = ('fieldNames', 'fieldIndex', 'internFields', )
+    layouts = {}	# {(fieldNames, internFields): FieldLayout}
+
+    def __init__(self, fieldNames, internFields):
+        self.fieldNames   = fieldNames
+        self.fieldIndex   = { f: i for i, f in enumerate(fieldNames) }
+        self.internFields = internFields
+
+    @classmethod
+    def getLayout(cls, fieldNames, internFields=()):
+        key = (tuple(fieldNames), frozenset(internFields))
+        layout = cls.layouts.get(key)
+        if layout is None:
+            layout = cls(*key)
+            cls.layouts[key] = layout
+        return layout
 #-----------------------------------
 
+class FieldValues (collections.abc.MutableMapping):
+    """
+    IS:     a compact {field name: value} mapping used for sample values
+                and extraInfo instead of a dict.
+    HAS:    a FieldLayout, list of values by field position,
+            optional dict for other keys (not in the layout's field names)
+    Values of the layout's internFields (e.g., journal names, statuses) are
+        interned, so all samples share one copy of each distinct value.
+    """
+    __slots__ = ('layout', 'valueList', 'other', )
+    MISSING = object()		# valueList entry for a field w/ no value
+
+    def __init__(self, layout, values={}):
+        self.layout    = layout
+        self.valueList = [FieldValues.MISSING] * len(layout.fieldNames)
+        self.other     = None
+        self.update(values)
+
+    def __getitem__(self, key):
+        i = self.layout.fieldIndex.get(key)
+        if i is None:
+            if self.other is None:
+                raise KeyError(key)
+            return self.other[key]
+        value = self.valueList[i]
+        if value is FieldValues.MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        i = self.layout.fieldIndex.get(key)
+        if i is None:
+            if self.other is None:
+                self.other = {}
+            self.other[key] = value
+        else:
+            if key in self.layout.internFields and type(value) == str:
+                value = sys.intern(value)
+            self.valueList[i] = value
+
+    def __delitem__(self, key):
+        i = self.layout.fieldIndex.get(key)
+        if i is None:
+            if self.other is None:
+                raise KeyError(key)
+            del self.other[key]
+        else:
+            if self.valueList[i] is FieldValues.MISSING:
+                raise KeyError(key)
+            self.valueList[i] = FieldValues.MISSING
+
+    def __iter__(self):
+        for f, value in zip(self.layout.fieldNames, self.valueList):
+            if value is not FieldValues.MISSING:
+                yield f
+        if self.other:
+            yield from self.other
+
+    def __len__(self):
+        n = len(self.valueList) - self.valueList.count(FieldValues.MISSING)
+        return n + (len(self.other) if self.other else 0)
+
+    def __copy__(self):
+        return FieldValues(self.layout, self)
+
+    def copy(self):		return self.__copy__()	# like dict.copy()
+
+    def __reduce__(self):		# for pickling
+        return (FieldValues, (self.layout, dict(self)))
+
+    def __repr__(self):		return repr(dict(self))
+# end class FieldValues ------------------------
+
 class RefSample (BaseSample):
     """
     Represents a reference sample (article) that may be classified or not.
@@ -147,12 +652,48 @@ class RefSample (BaseSample):
             ]
     fieldSep  = FIELDSEP
     recordEnd = RECORDEND
+
+    # fields w/ few distinct values, stored as categorical columns in
+    #  columnar sample files and interned in memory
+    categoricalFieldNames = []
+
+    # Store values (and extraInfo) in a compact FieldValues mapping instead
+    #  of a dict. values[f] & the getters/setters work the same either way.
+    compactFields = True
+
+    # Field preprocessors: preprocessors that just apply a text function to
+    #  some text fields.   {preprocessor name: (text function, [field names])}
+    # Consecutive field preprocessors in a preprocessor chain are fused into
+    #  one pass per field, see getPreprocessorChain()
+    textFieldNames = ['title', 'abstract', 'extractedText']
+    fieldPreprocessors = {
+        'figureTextLegends'        : (legendsText, ['extractedText']),
+        'figureTextLegParagraphs'  : (legParagraphsText, ['extractedText']),
+        'figureTextLegCloseWords50': (legCloseWords50Text, ['extractedText']),
+        'removeReferences'   : (figureText.removeReferences, ['extractedText']),
+        'tagReferences'      : (figureText.tagReferences, ['extractedText']),
+        'featureTransform'   : (featureTransform.transformText, textFieldNames),
+        'removeURLsCleanStem': (cleanStemText, textFieldNames),
+        'removeURLs'         : (utilsLib.removeURLsLower, textFieldNames),
+        'tokenPerLine'       : (utilsLib.tokenPerLine, textFieldNames),
+        }
+    preprocessorChains = {}	# {(python class, (names...)): chain function}
     #----------------------
 
     def constructDoc(self):
         return '\n'.join([self.getTitle(), self.getAbstract(),
                                                     self.getExtractedText()])
 
+    @property
+    def values(self):		return self._values
+
+    @values.setter
+    def values(self, values):
+        if self.compactFields:
+            values = FieldValues(FieldLayout.getLayout(self.fieldNames,
+                                            self.categoricalFieldNames), values)
+        self._values = values
+
     def setExtractedText(self, t): self.values['extractedText'] = t
     def getExtractedText(self,  ): return self.values['extractedText']
 
@@ -162,32 +703,107 @@ class RefSample (BaseSample):
     def setTitle(self, t): self.values['title'] = t
     def getTitle(self,  ): return self.values['title']
 
+    #----------------------
+    # Preprocessor chains
+    #----------------------
+    @classmethod
+    def getPreprocessorChain(cls, preprocessors,	# [preprocessor names]
+        ):
+        """
+        Return a function f(sample) that applies the preprocessors, in order,
+            to a sample of this class and returns the sample.
+        The output is the same as calling the preprocessor methods one by one,
+            but runs of consecutive field preprocessors are fused so each
+            field is fetched & stored once and run through all their text
+            functions. Other preprocessors are called as methods.
+        """
+        key = (cls, tuple(preprocessors))
+        chain = cls.preprocessorChains.get(key)
+        if chain is None:
+            steps = []
+            for name in preprocessors:
+                if not hasattr(cls, name):
+                    raise AttributeError("Invalid preprocessor: '%s'" % name)
+                if cls.isFieldPreprocessor(name):
+                    func, fieldNames = cls.fieldPreprocessors[name]
+                    if not steps or isinstance(steps[-1], str):
+                        steps.append({})
+                    for fieldName in fieldNames:
+                        steps[-1].setdefault(fieldName, []).append( \
+                                                                (name, func))
+                else:
+                    steps.append(name)
+            chain = lambda sample: runPreprocessorSteps(steps, sample)
+            cls.preprocessorChains[key] = chain
+        return chain
+
+    @classmethod
+    def isFieldPreprocessor(cls, name):
+        # only if a subclass hasn't overridden the preprocessor method
+        return name in cls.fieldPreprocessors and \
+                            getattr(cls, name) is getattr(RefSample, name)
+
+    def __getattr__(self, name):
+        """
+        A preprocessor chain can be used as a single preprocessor named
+            "pp1+pp2+...", e.g., preprocessSamples.py -p pp1+pp2
+        """
+        if PREPROCESSOR_CHAIN_SEP in name:
+            chain = self.getPreprocessorChain( \
+                                        name.split(PREPROCESSOR_CHAIN_SEP))
+            return lambda: chain(self)
+        raise AttributeError("'%s' object has no attribute '%s'" % \
+                                                (type(self).__name__, name))
+
     #----------------------
     # "preprocessor" functions.
     #  Each preprocessor should modify this sample and return itself
+    #  If you add a preprocessor that just applies a text function to some
+    #   fields, add it to fieldPreprocessors too.
     #----------------------
 
+    @profiledPreprocessor
     def figureTextLegends(self):	# preprocessor
-        # just figure legends
-        self.setExtractedText('\n\n'.join( \
-                figConverterLegends.text2FigText(self.getExtractedText())))
+        self.setExtractedText( legendsText(self.getExtractedText()) )
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def figureTextLegParagraphs(self):	# preprocessor
-        # figure legends + paragraphs discussing figures
-        self.setExtractedText('\n\n'.join( \
-            figConverterLegParagraphs.text2FigText(self.getExtractedText())))
+        self.setExtractedText( legParagraphsText(self.getExtractedText()) )
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def figureTextLegCloseWords50(self):	# preprocessor
-        # figure legends + 50 words around "figure" references in paragraphs
-        self.setExtractedText('\n\n'.join( \
-            figConverterLegCloseWords50.text2FigText(self.getExtractedText())))
+        self.setExtractedText( legCloseWords50Text(self.getExtractedText()) )
         return self
     # ---------------------------
 
+    @profiledPreprocessor
+    def removeReferences(self):		# preprocessor
+        """
+        Remove the references/bibliography section from the extracted text.
+        Figure/table legends after it are kept, see
+        figureText.findReferencesSpan()
+        """
+        self.setExtractedText( figureText.removeReferences( \
+                                                self.getExtractedText()) )
+        return self
+    # ---------------------------
+
+    @profiledPreprocessor
+    def tagReferences(self):		# preprocessor
+        """
+        Insert a figureText.REFERENCES_TAG paragraph at the start of the
+        references/bibliography section of the extracted text.
+        """
+        self.setExtractedText( figureText.tagReferences( \
+                                                self.getExtractedText()) )
+        return self
+    # ---------------------------
+
+    @profiledPreprocessor
     def featureTransform(self):		# preprocessor
         self.setTitle( featureTransform.transformText(self.getTitle()) )
         self.setAbstract( featureTransform.transformText(self.getAbstract()) )
@@ -196,6 +812,7 @@ class RefSample (BaseSample):
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def removeURLsCleanStem(self):	# preprocessor
         '''
         Remove URLs and punct, lower case everything,
@@ -204,32 +821,13 @@ class RefSample (BaseSample):
         Stem,
         Replace \n with spaces
         '''
-        # This is currently the only preprocessor that uses a stemmer.
-        # Would be clearer to import and instantiate one stemmer above,
-        # BUT that requires nltk (via anaconda) to be installed on each
-        # server we use. This is currently not installed on our linux servers
-        # By importing here, we can use RefSample in situations where we don't
-        # call this preprocessor, and it will work on our current server setup.
-        global stemmer
-        if not stemmer:
-            import nltk.stem.snowball as nltk
-            stemmer = nltk.EnglishStemmer()
-        #------
-        def _removeURLsCleanStem(text):
-            output = ''
-            for s in urls_re.split(text): # split and remove URLs
-                s = featureTransform.transformText(s).lower()
-                for m in token_re.finditer(s):
-                    output += " " + stemmer.stem(m.group())
-            return  output
-        #------
-
-        self.setTitle( _removeURLsCleanStem( self.getTitle()) )
-        self.setAbstract( _removeURLsCleanStem( self.getAbstract()) )
-        self.setExtractedText( _removeURLsCleanStem( self.getExtractedText()) )
+        self.setTitle( cleanStemText( self.getTitle()) )
+        self.setAbstract( cleanStemText( self.getAbstract()) )
+        self.setExtractedText( cleanStemText( self.getExtractedText()) )
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def removeURLs(self):		# preprocessor
         '''
         Remove URLs, lower case everything,
@@ -240,6 +838,7 @@ class RefSample (BaseSample):
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def tokenPerLine(self):		# preprocessor
         """
         Convert text to have one alphanumeric token per line,
@@ -252,6 +851,7 @@ class RefSample (BaseSample):
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def truncateText(self):		# preprocessor
         """ for debugging, so you can see a sample record easily"""
         
@@ -262,6 +862,7 @@ class RefSample (BaseSample):
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def removeText(self):		# preprocessor
         """ for debugging, so you can see a sample record easily"""
         
@@ -271,6 +872,7 @@ class RefSample (BaseSample):
         return self
     # ---------------------------
 
+    @profiledPreprocessor
     def replaceText(self):		# preprocessor
         """ for debugging, replace the extracted text with text from a file
             Filename is <ID>.new.txt
@@ -295,6 +897,7 @@ class ClassifiedRefSample (RefSample, ClassifiedSample):
             'abstract'      ,
             'extractedText' ,
             ]
+    categoricalFieldNames = ['knownClassName', 'journal']
     extraInfoFieldNames = [  ] # should be [] if no extraInfoFields
     #----------------------
 
@@ -308,6 +911,18 @@ class ClassifiedRefSample (RefSample, ClassifiedSample):
         
     def getJournal(self):  return self.values['journal']
 
+    @property
+    def extraInfo(self):	return self._extraInfo
+
+    @extraInfo.setter
+    def extraInfo(self, extraInfo):
+        if self.compactFields:
+            extraInfo = FieldValues(FieldLayout.getLayout( \
+                                            self.extraInfoFieldNames,
+                                            self.categoricalFieldNames),
+                                    extraInfo)
+        self._extraInfo = extraInfo
+
     def setComputedExtraInfoFields(self):
         self.extraInfo['abstractLen'] = str( len(self.getAbstract()) )
         self.extraInfo['textLen']     = str( len(self.getExtractedText()) )
@@ -342,6 +957,9 @@ class PrimTriageClassifiedSample(ClassifiedRefSample):
             'abstract'      ,
             'extractedText' ,
             ]
+    categoricalFieldNames = ['knownClassName', 'year', 'isReview', 'refType',
+                            'suppStatus', 'apStatus', 'gxdStatus', 'goStatus',
+                            'tumorStatus', 'qtlStatus', 'journal', ]
     extraInfoFieldNames = [ \
             'creationDate'  ,
             'year'          ,
@@ -394,6 +1012,56 @@ class ClassifiedRefSampleSet (ClassifiedSampleSet):
     #-------------------------
 
     def getJournals(self):	return self.journals	# set of names
+    #-------------------------
+
+    def write(self, outFile,	# file name or open file pointer
+                buildIndex=False,	# build ID index sidecar if outFile is
+                                        #  a file name
+                **kwargs,		# passed to SampleSet.write()
+        ):
+        """ Write the samples, see SampleSet.write().
+            outFile is compressed if its name has a compression extension
+        """
+        if isinstance(outFile, str) and getCompressionOpener(outFile, 'w'):
+            with openSampleFile(outFile, 'w') as fp:
+                return super().write(fp, **kwargs)
+
+        result = super().write(outFile, **kwargs)
+        if buildIndex and isinstance(outFile, str):
+            buildSampleIndex(outFile)
+        return result
+    #-------------------------
+
+    def read(self, inFile,	# file name or open file pointer
+        ):
+        """ Read samples from a sample file (possibly compressed)
+            or a columnar sample file
+        """
+        if isColumnarSampleFile(inFile):
+            return self.readColumnar(inFile)
+        if isinstance(inFile, str) and (inFile == '-' or \
+                                            isCompressedSampleFile(inFile)):
+            fp = openSampleFile(inFile, 'r')
+            result = super().read(fp)
+            if fp is not sys.stdin:
+                fp.close()
+            return result
+        return super().read(inFile)
+    #-------------------------
+
+    def readColumnar(self, fileName):
+        """ Read samples from a columnar sample file.
+            Like read() of a text sample file, this SampleSet takes its
+            sampleObjType from the file.
+        """
+        colFile = ColumnarSampleFile(fileName)
+        if self.getNumSamples() == 0:
+            self.__init__(sampleObjType=colFile.getSampleObjType())
+        for name, value in colFile.getMetaItems().items():
+            self.setMetaItem(name, value)
+        for sample in colFile.sampleIterator():
+            self.addSample(sample)
+        return self
 # end class ClassifiedRefSampleSet -----------------------------------
 
 
@@ -427,6 +1095,10 @@ class CurGroupClassifiedSample(ClassifiedRefSample):
             'abstract'      ,
             'extractedText' ,
             ]
+    categoricalFieldNames = ['knownClassName', 'year', 'discardKeep',
+                            'isReview', 'refType', 'suppStatus', 'apStatus',
+                            'gxdStatus', 'goStatus', 'tumorStatus',
+                            'qtlStatus', 'journal', ]
     extraInfoFieldNames = [ \
             'creationDate'  ,
             'year'          ,
@@ -462,5 +1134,890 @@ class CurGroupUnClassifiedSample(RefSample):
             ]
 # end class CurGroupUnClassifiedSample ------------------------
 
+#-----------------------------------
+# Lazy views of sample sets
+#-----------------------------------
+class SampleSetView (collections.abc.Sequence):
+    """
+    IS:     a lazy sequence of one value per sample in a SampleSet, e.g., each
+                sample's document, computed when it is accessed.
+    HAS:    the SampleSet, the function to get the value from a sample
+    Use instead of the lists from getDocuments() etc. so the documents are
+        not all in memory at once (alongside the samples' text). E.g.,
+            CountVectorizer.fit_transform(getDocumentView(sampleSet))
+        constructs one document at a time.
+    A view can be iterated any number of times, and indexed, so it can be
+        used as y (via numpy.asarray()) too.
+    The set of samples is fixed when the view is created.
+    """
+    def __init__(self, sampleSet,
+                    func,		# func(sample) -> value
+                    omitRejects=False,
+        ):
+        self.samples = sampleSet.getSamples(omitRejects=omitRejects)
+        self.func    = func
+
+    def __iter__(self):
+        func = self.func
+        for sample in self.samples:
+            yield func(sample)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [ self.func(s) for s in self.samples[i] ]
+        return self.func(self.samples[i])
+
+    def __len__(self):		return len(self.samples)
+# end class SampleSetView ------------------------
+
+def getDocumentView(sampleSet, omitRejects=False):
+    """ Lazy version of sampleSet.getDocuments() """
+    return SampleSetView(sampleSet, lambda s: s.getDocument(), omitRejects)
+
+def getSampleIDView(sampleSet, omitRejects=False):
+    """ Lazy version of sampleSet.getSampleIDs() """
+    return SampleSetView(sampleSet, lambda s: s.getID(), omitRejects)
+
+def getKnownYvalueView(sampleSet, omitRejects=False):
+    """ Lazy version of sampleSet.getKnownYvalues() (ClassifiedSampleSets) """
+    return SampleSetView(sampleSet, lambda s: s.getKnownYvalue(), omitRejects)
+#-----------------------------------
+
+#-----------------------------------
+# Compressed sample files
+#-----------------------------------
+# (extension, magic bytes, open function) for the compression formats
+#  supported by the python standard library
+COMPRESSION_TYPES = [
+    ('.gz',   b'\x1f\x8b',          gzip.open),
+    ('.bz2',  b'BZh',               bz2.open),
+    ('.xz',   b'\xfd7zXZ\x00',      lzma.open),
+    ('.lzma', b'\x5d\x00\x00',      lzma.open),
+    ]
+COMPRESSION_MAGIC_LEN = max([ len(m) for e, m, o in COMPRESSION_TYPES ])
+
+def getCompressionOpener(fileName,
+                        mode='r',	# 'r' - detect by magic bytes,
+                                        # 'w' - detect by file name extension
+    ):
+    """
+    Return the open function for fileName's compression format,
+        or None if it is not compressed.
+    """
+    if 'r' in mode:
+        if not os.path.isfile(fileName):
+            return None
+        with open(fileName, 'rb') as fp:
+            magic = fp.read(COMPRESSION_MAGIC_LEN)
+        for ext, m, opener in COMPRESSION_TYPES:
+            if magic.startswith(m):
+                return opener
+    else:
+        for ext, m, opener in COMPRESSION_TYPES:
+            if fileName.endswith(ext):
+                return opener
+    return None
+#-----------------------------------
+
+def isCompressedSampleFile(fileName):
+    return isinstance(fileName, str) and fileName != '-' and \
+                                getCompressionOpener(fileName) is not None
+#-----------------------------------
+
+def openSampleFile(fileName,	# file name or '-' for stdin/stdout
+                    mode='r',	# 'r' or 'w'
+    ):
+    """
+    Return text file pointer for reading or writing a sample file,
+        transparently (de)compressing it as it is read/written (no temp files)
+    When reading, compression is detected by the magic bytes at the start of
+        the file (or stdin). When writing, by the file name extension.
+    """
+    if fileName == '-':
+        if 'w' in mode:
+            return sys.stdout
+        magic = sys.stdin.buffer.peek(COMPRESSION_MAGIC_LEN)
+        for ext, m, opener in COMPRESSION_TYPES:
+            if magic.startswith(m):
+                return opener(sys.stdin.buffer, 'rt')
+        return sys.stdin
+
+    opener = getCompressionOpener(fileName, mode)
+    if opener:
+        return opener(fileName, mode + 't')
+    return open(fileName, mode)
+#-----------------------------------
+
+#-----------------------------------
+# Streaming sample file reader/writer
+#-----------------------------------
+READ_CHUNK_SIZE = 1024*1024	# chars to read at a time when streaming
+
+def splitRecords(chunks,	# iterable of str (or bytes) chunks of a file
+                recordEnd,	# RECORDEND (or RECORDEND.encode())
+    ):
+    """
+    Yield the record texts (w/o recordEnd) in the concatenated chunks, then
+        the (maybe empty) text after the last recordEnd.
+    Chunks are collected until one ends a record, so a record that spans
+        many chunks is only joined & split once.
+    """
+    n = len(recordEnd) - 1	# recordEnd may straddle 2 chunks
+    parts = []
+    for chunk in chunks:
+        ended = recordEnd in chunk or \
+                        (parts and recordEnd in parts[-1][-n:] + chunk[:n])
+        parts.append(chunk)
+        if ended:
+            records = recordEnd[:0].join(parts).split(recordEnd)
+            parts = [records.pop()]	# partial record at end of chunk
+            yield from records
+    yield recordEnd[:0].join(parts)
+#-----------------------------------
+
+class SampleFileReader (object):
+    """
+    IS:     an iterator over the samples in a sample file (or stdin), reading
+                one record at a time, so memory use does not depend on the
+                size of the file. The file may be compressed.
+    HAS:    the sample file, its sampleObjType and meta data
+    DOES:   sampleIterator(), getSampleObjType(), getHeaderSampleSet()
+    The #meta record and header record are read by a SampleSet, so they are
+        handled exactly as SampleSet.read() handles them, and the meta data is
+        available via getHeaderSampleSet().
+    """
+    def __init__(self, inFile,		# file name, '-' or open file pointer
+                    sampleObjType=None,	# used if file doesn't specify it
+                    chunkSize=READ_CHUNK_SIZE,
+        ):
+        if isinstance(inFile, str):
+            self.fp = openSampleFile(inFile, 'r')
+        else:
+            self.fp = inFile
+        self.chunkSize = chunkSize
+        self.records = self._recordIterator()
+
+        # read the meta & header records (header is the 1st non-meta record)
+        headerRecords = []
+        for record in self.records:
+            headerRecords.append(record)
+            if not record.startswith('#meta'):
+                break
+        headerText = ''.join([ r + RECORDEND for r in headerRecords ])
+        self.headerSampleSet = SampleSet(sampleObjType=sampleObjType).read( \
+                                                    io.StringIO(headerText))
+        self.sampleObjType = self.headerSampleSet.getSampleObjType()
+
+    def _recordIterator(self):
+        """ Yield the records (w/o RECORDEND) in the file, skipping blank ones
+        """
+        chunks = iter(functools.partial(self.fp.read, self.chunkSize), '')
+        for record in splitRecords(chunks, RECORDEND):
+            record = record.lstrip()
+            if record.strip():
+                yield record
+
+    def sampleIterator(self):
+        sampleObjType = self.sampleObjType
+        for record in self.records:
+            yield sampleObjType().parseSampleRecordText(record)
+
+    def recordIterator(self):
+        """ Iterate through the sample record texts (w/o RECORDEND),
+            e.g., to send them to other processes w/o parsing them here.
+        """
+        return self.records
+
+    def __iter__(self):			return self.sampleIterator()
+    def getSampleObjType(self):		return self.sampleObjType
+    def getHeaderSampleSet(self):	return self.headerSampleSet
+    def close(self):
+        if self.fp is not sys.stdin:
+            self.fp.close()
+# end class SampleFileReader ------------------------
+
+class SampleFileWriter (object):
+    """
+    IS:     a writer of sample files that writes the #meta & header records
+                first, then samples one at a time as they are added, so
+                samples don't need to be accumulated in a SampleSet.
+    HAS:    the output file, sampleObjType, number of samples written
+    DOES:   write(sample), close()
+    The output is the same format SampleSet.write() writes.
+    The output file is compressed if its name has a compression extension
+        (e.g., .gz), see openSampleFile().
+    If buildIndex and writing to a named, uncompressed file, its ID index
+        sidecar is written at close() from the offsets of the records written,
+        see IndexedSampleFile.
+    """
+    def __init__(self, outFile,		# file name, '-' or open file pointer
+                    sampleObjType,
+                    metaItems={},	# {name: value} to add to the meta data
+                    writeHeader=True,
+                    writeMeta=True,
+                    buildIndex=False,	# write ID index sidecar at close()
+                                        #  (only if outFile is a file name)
+        ):
+        self.indexFileName = None	# sample file to index at close()
+        self.index = None		# {ID: (byte offset, byte length)}
+        if isinstance(outFile, str):
+            self.fp = openSampleFile(outFile, 'w')
+            if buildIndex and self.fp is not sys.stdout and \
+                                not getCompressionOpener(outFile, 'w'):
+                self.indexFileName = outFile
+                self.index = {}
+        else:
+            self.fp = outFile
+        self.sampleObjType = sampleObjType
+        self.recordEnd = sampleObjType.getRecordEnd() + '\n'
+        self.numSamples = 0
+
+        # write meta & header via an empty SampleSet
+        headerSampleSet = SampleSet(sampleObjType=sampleObjType)
+        for name, value in metaItems.items():
+            headerSampleSet.setMetaItem(name, value)
+        headerSampleSet.write(self.fp, writeHeader=writeHeader,
+                                                        writeMeta=writeMeta)
+        if self.index is not None:
+            self.fp.flush()
+            self.offset = self.fp.tell()	# byte offset of the next record
+            self.encoding = self.fp.encoding
+            self.fieldSep = sampleObjType.getFieldSep()
+            self.idIndex  = sampleObjType.fieldNames.index('ID')
+            self.recordEndLen = len(self.recordEnd.encode(self.encoding))
+
+    def write(self, sample):
+        return self.writeRecordText(sample.getSampleAsText())
+
+    def writeRecordText(self, recordText):
+        """ Write a sample record text (from sample.getSampleAsText()) """
+        self.fp.write(recordText + self.recordEnd)
+        self.numSamples += 1
+        if self.index is not None:
+            self._indexRecord(recordText)
+        return self
+
+    def _indexRecord(self, recordText):
+        """ Add the record just written to the index, as buildSampleIndex()
+            would find it
+        """
+        b = recordText.encode(self.encoding)
+        record = b.lstrip()
+        if record.strip():
+            ID = recordText.split(self.fieldSep, self.idIndex + 1)[self.idIndex]
+            self.index[ID] = (self.offset + len(b) - len(record), len(record))
+        self.offset += len(b) + self.recordEndLen
+
+    def getNumSamples(self):	return self.numSamples
+    def close(self):
+        if self.fp not in (sys.stdout, sys.stderr):
+            self.fp.close()
+        if self.indexFileName:
+            writeSampleIndex(self.indexFileName, self.index)
+# end class SampleFileWriter ------------------------
+
+#-----------------------------------
+# Sample file ID index sidecars
+#-----------------------------------
+INDEX_SUFFIX = '.idx'		# sample file index is <sample file>.idx
+
+def getIndexFileName(fileName):	return fileName + INDEX_SUFFIX
+
+def buildSampleIndex(fileName,
+                    chunkSize=READ_CHUNK_SIZE,
+    ):
+    """
+    Scan the sample file and write its ID index sidecar file.
+    Return the index {ID: (byte offset, byte length)} of each sample record.
+    Index file format:
+        #sampleIndex<tab>sample file size<tab>sample file mtime (ns)
+        ID<tab>offset<tab>length    lines for each sample, in file order
+    """
+    if isCompressedSampleFile(fileName):
+        raise ValueError("cannot index compressed sample file '%s'" % fileName)
+    index = {}
+    stat = os.stat(fileName)
+    recordEnd = RECORDEND.encode()
+    fieldSep  = FIELDSEP.encode()
+    idIndex = None		# index of the ID field, from the header record
+    with open(fileName, 'rb') as fp:
+        recordStart = 0		# file offset of the record
+        chunks = iter(functools.partial(fp.read, chunkSize), b'')
+        for record in splitRecords(chunks, recordEnd):
+            offset = recordStart + len(record) - len(record.lstrip())
+            recordStart += len(record) + len(recordEnd)
+            record = record.lstrip()	# same as SampleFileReader
+            if not record.strip() or record.startswith(b'#meta'):
+                continue
+            fields = record.split(fieldSep)
+            if idIndex is None:		# header record
+                idIndex = fields.index(b'ID')
+                continue
+            ID = fields[idIndex].decode('utf-8')
+            index[ID] = (offset, len(record))
+    writeSampleIndex(fileName, index, stat)
+    return index
+#-----------------------------------
+
+def writeSampleIndex(fileName,
+                    index,	# {ID: (byte offset, byte length)} of its samples
+                    stat=None,	# os.stat() of the sample file when indexed
+    ):
+    """ Write the ID index sidecar file for the sample file
+        (format: see buildSampleIndex())
+    """
+    if stat is None:
+        stat = os.stat(fileName)
+    indexFileName = getIndexFileName(fileName)
+    tmpFileName = "%s.%d.tmp" % (indexFileName, os.getpid())
+    with open(tmpFileName, 'w') as fp:
+        fp.write("#sampleIndex\t%d\t%d\n" % (stat.st_size, stat.st_mtime_ns))
+        for ID, (offset, length) in index.items():
+            fp.write("%s\t%d\t%d\n" % (ID, offset, length))
+    os.replace(tmpFileName, indexFileName)
+#-----------------------------------
+
+def readSampleIndex(fileName):
+    """
+    Return the index {ID: (byte offset, byte length)} from the sample file's
+        index sidecar file, or None if there is none or it is out of date.
+    """
+    indexFileName = getIndexFileName(fileName)
+    if not os.path.isfile(indexFileName):
+        return None
+    stat = os.stat(fileName)
+    with open(indexFileName, 'r') as fp:
+        tag, size, mtime = fp.readline().rstrip('\n').split('\t')
+        if tag != '#sampleIndex' or int(size) != stat.st_size or \
+                                            int(mtime) != stat.st_mtime_ns:
+            return None
+        index = {}
+        for line in fp:
+            ID, offset, length = line.rstrip('\n').split('\t')
+            index[ID] = (int(offset), int(length))
+    return index
+#-----------------------------------
+
+class IndexedSampleFile (object):
+    """
+    IS:     a sample file opened for random access to samples by ID
+    HAS:    the sample file, its ID index, sampleObjType
+    DOES:   getSample(ID), getSamples(IDs), getIDs()
+    Uses the file's index sidecar, building it if it is missing or out of
+        date (the sample file has changed since the index was built).
+    If useMmap, the sample file is memory mapped instead of read via seeks.
+    """
+    def __init__(self, fileName,
+                    sampleObjType=None,	# used if file doesn't specify it
+                    useMmap=False,
+        ):
+        self.fileName = fileName
+        self.index = readSampleIndex(fileName)
+        if self.index is None:
+            self.index = buildSampleIndex(fileName)
+
+        reader = SampleFileReader(fileName, sampleObjType=sampleObjType,
+                                                chunkSize=64*1024)
+        self.headerSampleSet = reader.getHeaderSampleSet()
+        self.sampleObjType = reader.getSampleObjType()
+        reader.close()
+
+        self.fp = open(fileName, 'rb')
+        self.mmap = None
+        if useMmap and os.path.getsize(fileName) > 0:
+            self.mmap = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def getRecordText(self, ID):
+        """ Return the record text for the sample w/ ID, KeyError if none """
+        offset, length = self.index[ID]
+        if self.mmap is not None:
+            b = self.mmap[offset:offset+length]
+        else:
+            self.fp.seek(offset)
+            b = self.fp.read(length)
+        return b.decode('utf-8')
+
+    def getSample(self, ID):
+        return self.sampleObjType().parseSampleRecordText( \
+                                                    self.getRecordText(ID))
+
+    def getSamples(self, IDs,
+                    skipMissing=False,	# skip IDs not in the file, else
+                                        #   KeyError
+        ):
+        """ Return list of samples for IDs, in file order (minimizes seeks)
+        """
+        if skipMissing:
+            IDs = [ ID for ID in IDs if ID in self.index ]
+        IDs = sorted(set(IDs), key=lambda ID: self.index[ID][0])
+        return [ self.getSample(ID) for ID in IDs ]
+
+    def hasID(self, ID):		return ID in self.index
+    def getIDs(self):			return list(self.index.keys())
+    def getSampleObjType(self):		return self.sampleObjType
+    def getHeaderSampleSet(self):	return self.headerSampleSet
+    def close(self):
+        if self.mmap is not None:
+            self.mmap.close()
+        self.fp.close()
+# end class IndexedSampleFile ------------------------
+
+#-----------------------------------
+# Columnar sample files
+#-----------------------------------
+COLUMNAR_MAGIC = b'SDCOL\x00\x01\n'	# 1st bytes of a columnar sample file
+COLUMNAR_LENGTH_TYPE = 'I'	# array type code for text value byte lengths
+COLUMNAR_CODE_TYPE   = 'I'	# array type code for categorical value codes
+
+def isColumnarSampleFile(fileName):
+    """ Return True if fileName is a columnar sample file """
+    if not isinstance(fileName, str) or not os.path.isfile(fileName):
+        return False
+    with open(fileName, 'rb') as fp:
+        return fp.read(len(COLUMNAR_MAGIC)) == COLUMNAR_MAGIC
+#-----------------------------------
+
+class ColumnarSampleFileWriter (object):
+    """
+    IS:     a writer of columnar sample files
+    HAS:    the output file name, sampleObjType, the columns written so far
+    DOES:   write(sample), close()
+
+    A columnar sample file is:
+        COLUMNAR_MAGIC
+        8 byte (little endian) length of the header
+        header: json {sampleObjType, module, numSamples, metaItems,
+                        columns: [{name, type, offset, ...}, ...]}
+        the columns, one after another, at their offsets (from the end of
+            the header):
+        text column:  the byte length of each value (array of
+                        COLUMNAR_LENGTH_TYPE) followed by the utf-8 values
+        categorical column:  a code for each value (array of
+                        COLUMNAR_CODE_TYPE), the values are the "categories"
+                        list in the column's header entry
+    So any column can be read w/o reading the others, and the text could
+        contain the field/record delimiters.
+    The sampleObjType's categoricalFieldNames are categorical columns, the
+        other fields are text columns.
+    Text columns are spooled to temporary files until close(), so writing
+        does not hold the samples in memory.
+    """
+    def __init__(self, fileName,
+                    sampleObjType,
+                    metaItems={},	# {name: value} to store in the header
+        ):
+        self.fileName      = fileName
+        self.sampleObjType = sampleObjType
+        self.metaItems     = dict(metaItems)
+        self.numSamples    = 0
+        self.fieldNames    = sampleObjType.fieldNames
+        categorical = set(sampleObjType.categoricalFieldNames)
+
+        self.lengths    = {}	# {text field name: array of byte lengths}
+        self.data       = {}	# {text field name: temp file of utf-8 values}
+        self.codes      = {}	# {categorical field name: array of codes}
+        self.categories = {}	# {categorical field name: {value: code}}
+        for fieldName in self.fieldNames:
+            if fieldName in categorical:
+                self.codes[fieldName] = array.array(COLUMNAR_CODE_TYPE)
+                self.categories[fieldName] = {}
+            else:
+                self.lengths[fieldName] = array.array(COLUMNAR_LENGTH_TYPE)
+                self.data[fieldName] = tempfile.TemporaryFile()
+
+    def write(self, sample):
+        for fieldName in self.fieldNames:
+            value = str(sample.getField(fieldName))
+            if fieldName in self.codes:
+                categories = self.categories[fieldName]
+                code = categories.get(value)
+                if code is None:
+                    code = len(categories)
+                    categories[value] = code
+                self.codes[fieldName].append(code)
+            else:
+                b = value.encode('utf-8')
+                self.lengths[fieldName].append(len(b))
+                self.data[fieldName].write(b)
+        self.numSamples += 1
+        return self
+
+    def getNumSamples(self):	return self.numSamples
+
+    def close(self):
+        """ Write the file """
+        columns = []
+        offset = 0
+        for fieldName in self.fieldNames:
+            if fieldName in self.codes:
+                codes = self.codes[fieldName]
+                categories = sorted(self.categories[fieldName].items(),
+                                                        key=lambda x: x[1])
+                columns.append({'name': fieldName, 'type': 'categorical',
+                            'offset': offset,
+                            'categories': [ v for v, code in categories ], })
+                offset += len(codes) * codes.itemsize
+            else:
+                lengths = self.lengths[fieldName]
+                lengthsSize = len(lengths) * lengths.itemsize
+                columns.append({'name': fieldName, 'type': 'text',
+                            'offset': offset, 'dataOffset': offset+lengthsSize,
+                            'dataSize': sum(lengths), })
+                offset += lengthsSize + sum(lengths)
+
+        header = json.dumps({
+                    'sampleObjType': self.sampleObjType.__name__,
+                    'module'       : self.sampleObjType.__module__,
+                    'byteorder'    : sys.byteorder,
+                    'numSamples'   : self.numSamples,
+                    'metaItems'    : self.metaItems,
+                    'columns'      : columns,
+                    }).encode('utf-8')
+
+        with open(self.fileName, 'wb') as fp:
+            fp.write(COLUMNAR_MAGIC)
+            fp.write(struct.pack('<Q', len(header)))
+            fp.write(header)
+            for fieldName in self.fieldNames:
+                if fieldName in self.codes:
+                    self.codes[fieldName].tofile(fp)
+                else:
+                    self.lengths[fieldName].tofile(fp)
+                    data = self.data[fieldName]
+                    data.seek(0)
+                    shutil.copyfileobj(data, fp)
+                    data.close()
+# end class ColumnarSampleFileWriter ------------------------
+
+class ColumnarSampleFile (object):
+    """
+    IS:     a columnar sample file opened for reading
+                (see ColumnarSampleFileWriter for the format)
+    HAS:    the header info: sampleObjType, numSamples, metaItems, columns
+    DOES:   getColumn(fieldName) - the values of one field for all samples,
+                only reading that column's bytes.
+            sampleIterator() - the samples, one at a time.
+    """
+    def __init__(self, fileName):
+        self.fileName = fileName
+        with open(fileName, 'rb') as fp:
+            if fp.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+                raise ValueError("'%s' is not a columnar sample file" % \
+                                                                    fileName)
+            headerLen = struct.unpack('<Q', fp.read(8))[0]
+            self.header = json.loads(fp.read(headerLen).decode('utf-8'))
+        self.dataStart = len(COLUMNAR_MAGIC) + 8 + headerLen
+        self.columns = { c['name']: c for c in self.header['columns'] }
+
+        module = importlib.import_module(self.header['module'])
+        self.sampleObjType = getattr(module, self.header['sampleObjType'])
+
+    def getSampleObjType(self):	return self.sampleObjType
+    def getNumSamples(self):	return self.header['numSamples']
+    def getMetaItems(self):	return self.header['metaItems']
+    def getFieldNames(self):	return [ c['name'] for c in \
+                                                    self.header['columns'] ]
+
+    def _readArray(self, fp, typeCode, offset):
+        a = array.array(typeCode)
+        fp.seek(self.dataStart + offset)
+        a.fromfile(fp, self.getNumSamples())
+        if self.header['byteorder'] != sys.byteorder:
+            a.byteswap()
+        return a
+
+    def getColumn(self, fieldName):
+        """ Return list of the values of fieldName for all the samples """
+        return list(self.columnIterator(fieldName))
+
+    def columnIterator(self, fieldName):
+        """ Iterate through the values of fieldName for all the samples """
+        column = self.columns[fieldName]
+        with open(self.fileName, 'rb') as fp:
+            if column['type'] == 'categorical':
+                categories = column['categories']
+                codes = self._readArray(fp, COLUMNAR_CODE_TYPE,
+                                                            column['offset'])
+                for code in codes:
+                    yield categories[code]
+            else:
+                lengths = self._readArray(fp, COLUMNAR_LENGTH_TYPE,
+                                                            column['offset'])
+                fp.seek(self.dataStart + column['dataOffset'])
+                for length in lengths:
+                    yield fp.read(length).decode('utf-8')
+
+    def sampleIterator(self):
+        """ Iterate through the samples, reading all the columns in parallel
+        """
+        fieldNames = self.getFieldNames()
+        columns = [ self.columnIterator(name) for name in fieldNames ]
+        for values in zip(*columns):
+            sample = self.sampleObjType()
+            sample.setFields(dict(zip(fieldNames, values)))
+            yield sample
+# end class ColumnarSampleFile ------------------------
+
+#-----------------------------------
+# Duplicate detection
+#-----------------------------------
+dupWord_re = re.compile(r'\w+')	# words compared for duplicate detection
+
+def getDupWords(sample):
+    """
+    Return the list of normalized words (lower case, punctuation and
+        whitespace removed) of the sample's text fields for duplicate
+        detection.
+    """
+    words = []
+    for fieldName in sample.textFieldNames:
+        words += dupWord_re.findall(sample.getField(fieldName).lower())
+    return words
+#-----------------------------------
+
+def getExactDupKey(words):
+    """ Return a key that is the same for samples w/ the same dup words """
+    return hashlib.sha1(' '.join(words).encode()).digest()
+#-----------------------------------
+
+class MinHasher (object):
+    """
+    IS:     a MinHash signature generator for word lists (documents)
+    HAS:    number of signature positions (numPerm), shingle size
+    DOES:   getSignature(words) - array of numPerm hash values
+            MinHasher.similarity(sig1, sig2) - estimated Jaccard similarity
+                of the two documents' sets of shingles (k word sequences)
+    Uses one permutation hashing (each shingle is hashed once and goes to
+        one of numPerm bins, the signature is the min hash in each bin) w/
+        rotation densification for empty bins. So the time is linear in
+        the number of words, not (words x numPerm).
+    Shingles are hashed by a rolling polynomial hash of the words' crc32's,
+        so signatures are the same across runs & processes.
+    """
+    PRIME  = (1 << 61) - 1	# hash values are mod PRIME
+    BASE   = 1000003		# rolling hash base
+    ROTATE = 0x9E3779B97F4A7C15	# added per bin when densifying empty bins
+
+    def __init__(self, numPerm=128, shingleSize=5):
+        self.numPerm = numPerm
+        self.shingleSize = shingleSize
+        self.basePower = pow(self.BASE, shingleSize - 1, self.PRIME)
+
+    def getShingleHashes(self, words):
+        """ Return the set of hashes of the shingles of words """
+        P, B, k = self.PRIME, self.BASE, self.shingleSize
+        ids = [ zlib.crc32(w.encode()) for w in words ]
+        if len(ids) < k:		# short doc is one (short) shingle
+            k = len(ids)
+        h = 0
+        for i in ids[:k]:
+            h = (h * B + i) % P
+        hashes = {h} if ids else set()
+
+        basePower = self.basePower if k == self.shingleSize else \
+                                                            pow(B, k-1, P)
+        for out, i in zip(ids, ids[k:]):
+            h = ((h - out * basePower) * B + i) % P
+            hashes.add(h)
+        return hashes
+
+    def getSignature(self, words):
+        n, P = self.numPerm, self.PRIME
+        mins = [P] * n			# P means the bin is empty
+        for h in self.getShingleHashes(words):
+            b = h % n
+            if h < mins[b]:
+                mins[b] = h
+
+        # densify: an empty bin gets the value of the next nonempty bin,
+        #  rotated by the distance to it
+        if P in mins and len(set(mins)) > 1:
+            dense = list(mins)
+            for b in range(n):
+                if mins[b] == P:
+                    dist = 1
+                    while mins[(b + dist) % n] == P:
+                        dist += 1
+                    dense[b] = (mins[(b + dist) % n] + dist * self.ROTATE) % P
+            mins = dense
+        return array.array('Q', mins)
+
+    @staticmethod
+    def similarity(sig1, sig2):
+        return sum([ a == b for a, b in zip(sig1, sig2) ]) / float(len(sig1))
+# end class MinHasher ------------------------
+
+class NearDupIndex (object):
+    """
+    IS:     a locality sensitive hashing (LSH) index of MinHash signatures
+    HAS:    for each of numBands bands (slices) of the signatures, buckets of
+                the keys whose signatures have the same values in the band.
+            the signature of each key
+    DOES:   add(key, signature), query(signature) - the keys w/ estimated
+                similarity >= threshold.
+    Documents are candidates if they share any band bucket, so a query only
+        compares the signature to a few candidates (not all the documents).
+        With r rows per band, the chance that documents w/ similarity s are
+        candidates is 1 - (1 - s^r)^numBands.
+    """
+    def __init__(self, numPerm=128,
+                        numBands=16,	# must divide numPerm
+                        threshold=0.8,	# min similarity of near duplicates
+        ):
+        if numPerm % numBands:
+            raise ValueError("numBands (%d) must divide numPerm (%d)" % \
+                                                        (numBands, numPerm))
+        self.numBands = numBands
+        self.rows = numPerm // numBands
+        self.threshold = threshold
+        self.buckets = [ {} for b in range(numBands) ]	# [{band: [keys]}]
+        self.signatures = {}				# {key: signature}
+
+    def getBands(self, signature):
+        r = self.rows
+        return [ signature[b*r:(b+1)*r].tobytes() for b in range(self.numBands) ]
+
+    def add(self, key, signature):
+        self.signatures[key] = signature
+        for buckets, band in zip(self.buckets, self.getBands(signature)):
+            buckets.setdefault(band, []).append(key)
+
+    def query(self, signature):
+        """ Return [(similarity, key)] of the near duplicates, most similar 1st
+        """
+        candidates = set()
+        for buckets, band in zip(self.buckets, self.getBands(signature)):
+            candidates.update(buckets.get(band, []))
+        dups = []
+        for key in candidates:
+            s = MinHasher.similarity(signature, self.signatures[key])
+            if s >= self.threshold:
+                dups.append((s, key))
+        return sorted(dups, reverse=True)
+
+    def __len__(self):		return len(self.signatures)
+# end class NearDupIndex ------------------------
+
+#-----------------------------------
+# Preprocessing cache
+#-----------------------------------
+PREPROCESSOR_VERSION = '1'	# bump to invalidate all PreprocessCache entries
+                                #  if preprocessor output changes in a way
+                                #  not caught by the source file hashes below
+PREPROCESSOR_SOURCES = ['sampleDataLib.py', 'figureText.py',
+                        'featureTransform.py',
+                        featureTransform.CELL_LINE_PREFIX_FILE,
+                        featureTransform.CELL_LINE_NAME_FILE,
+                        ]
+PREPROCESSOR_MODULES = [utilsLib]	# preprocessor code outside this dir
+#-----------------------------------
+
+def getPreprocessorCodeVersion():
+    """
+    Return a hash of PREPROCESSOR_VERSION, the preprocessor source files
+        and the nltk version (the stemmer),
+        so cached preprocessor output is not reused after the code changes.
+    """
+    h = hashlib.sha1(PREPROCESSOR_VERSION.encode())
+    modDir = os.path.dirname(os.path.abspath(__file__))
+    fileNames = [ os.path.join(modDir, fn) for fn in PREPROCESSOR_SOURCES ] + \
+                [ os.path.abspath(m.__file__) for m in PREPROCESSOR_MODULES ]
+    for fileName in fileNames:
+        with open(fileName, 'rb') as fp:
+            h.update(fp.read())
+    try:
+        import nltk
+        h.update(nltk.__version__.encode())
+    except ImportError:
+        h.update(b'no nltk')
+    return h.hexdigest()
+#-----------------------------------
+
+class PreprocessCache (object):
+    """
+    IS:     an on disk, content addressed cache of preprocessed samples
+    HAS:    cache directory, preprocessor chain, preprocessor code version
+    DOES:   preprocess(sample) - return the preprocessed sample from the cache
+                if it is there, else preprocess it & save it in the cache.
+    The cache key is a hash of
+        the preprocessor code version, python class and preprocessor names,
+        and the sample record text (ID & all raw fields).
+    So samples that have not changed since the last build are not
+        preprocessed again, and changing the raw text, the preprocessors or
+        their code gives new keys.
+    Each cached sample is the preprocessed sample record text in
+        cacheDir/<key[:2]>/<key>
+    Nothing is ever removed from the cache by preprocess(), so entries for
+        old code versions or samples pile up. prune(days) removes the entries
+        not used in that many days (a cache hit touches the entry's mtime),
+        or just rm -r the cache dir to start over.
+    """
+    def __init__(self, cacheDir,
+                        sampleObjType,		# python class of the samples
+                        preprocessors,		# [preprocessor names]
+        ):
+        self.cacheDir      = cacheDir
+        self.sampleObjType = sampleObjType
+        self.preprocessors = preprocessors
+        self.chain = sampleObjType.getPreprocessorChain(preprocessors)
+        self.keyPrefix = '|'.join([ getPreprocessorCodeVersion(),
+                                    sampleObjType.__name__,
+                                    PREPROCESSOR_CHAIN_SEP.join(preprocessors),
+                                    '' ])
+        self.hits   = 0
+        self.misses = 0
+
+    def preprocess(self, sample):
+        """ Return the preprocessed sample (may be a new sample object) """
+        fileName = self.getCacheFileName(sample)
+        if os.path.isfile(fileName):
+            with open(fileName, 'r') as fp:
+                text = fp.read()
+            os.utime(fileName)		# last used, for prune()
+            self.hits += 1
+            return self.sampleObjType().parseSampleRecordText(text)
+
+        self.misses += 1
+        sample = self.chain(sample)
+        if not sample.isReject():	# reject state is not in the record text
+            self.save(fileName, sample.getSampleAsText())
+        return sample
+
+    def getCacheFileName(self, sample):
+        key = self.keyPrefix + sample.getSampleAsText()
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cacheDir, digest[:2], digest)
+
+    def save(self, fileName, text):
+        """ Write text to fileName, all at once so readers never see a
+            partial file (other preprocessing jobs may share the cache dir)
+        """
+        os.makedirs(os.path.dirname(fileName), exist_ok=True)
+        tmpFileName = "%s.%d.tmp" % (fileName, os.getpid())
+        with open(tmpFileName, 'w') as fp:
+            fp.write(text)
+        os.replace(tmpFileName, fileName)
+
+    def prune(self, days):
+        """ Remove the cache entries (& any leftover tmp files) not used in
+            the last 'days' days. Return the number of files removed.
+        """
+        cutoff = time.time() - days*24*60*60
+        n = 0
+        for dirPath, dirNames, fileNames in os.walk(self.cacheDir):
+            for fn in fileNames:
+                fileName = os.path.join(dirPath, fn)
+                try:
+                    if os.path.getmtime(fileName) < cutoff:
+                        os.remove(fileName)
+                        n += 1
+                except FileNotFoundError:	# another job removed it
+                    pass
+        return n
+
+    def getHits(self):		return self.hits
+    def getMisses(self):	return self.misses
+# end class PreprocessCache ------------------------
+
 if __name__ == "__main__":
     pass
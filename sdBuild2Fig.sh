@@ -9,7 +9,7 @@ function Usage() {
 #######################################
     cat - <<ENDTEXT
 
-$0 {--discard|--group} --datadir dir --subdir subdir
+$0 {--discard|--group} --datadir dir --subdir subdir [--cachedir dir]
 
     Apply -p figureText extraction to sample files.
     --group	sample files are from curation group
@@ -17,6 +17,8 @@ $0 {--discard|--group} --datadir dir --subdir subdir
 
     Files to preprocess are in dir
     Processed output files go into subdir
+    --cachedir	cache preprocessed samples in this dir so later builds
+		only extract figure text from new/changed samples.
 ENDTEXT
     exit 5
 }
@@ -26,6 +28,7 @@ ENDTEXT
 
 dataDir=""
 subDir=""
+cacheDir=""		# default is no preprocessing cache
 curationGroup="n"	# default is not by curation group, discard/keep instead
 
 while [ $# -gt 0 ]; do
@@ -33,6 +36,7 @@ while [ $# -gt 0 ]; do
     -h|--help) Usage ;;
     --datadir) dataDir="$2"; shift; shift; ;;
     --subdir)  subDir="$2"; shift; shift; ;;
+    --cachedir) cacheDir="$2"; shift; shift; ;;
     --group)   curationGroup="y"; shift; ;;
     --discard) curationGroup="n"; shift; ;;
     -*|--*) echo "invalid option $1"; Usage ;;
@@ -55,9 +59,14 @@ fi
 # extract figure text
 #######################################
 figTextOpt="-p figureTextLegCloseWords50"
+if [ "$cacheDir" == "" ]; then
+    preprocessCmd="preprocessSamples.py"
+else
+    preprocessCmd="sdPreprocess.py --cachedir $cacheDir"
+fi
 
 for f in $files; do
     set -x
-    preprocessSamples.py $figTextOpt $dataDir/$f  >  $dataDir/$subDir/$f
+    $preprocessCmd $figTextOpt $dataDir/$f  >  $dataDir/$subDir/$f
     set +x
 done
@@ -2,6 +2,8 @@
 
 dataDir=""              # default - must specify
 subDir=""               # default - must specify
+cacheDir=""             # default is no preprocessing cache
+workers=""              # default is sdPreprocess.py default (1)
 curationGroup="n"	# default is not by curation group, discard/keep instead
 preProcessors="-p removeURLsCleanStem"   # default preprocessors
 
@@ -10,7 +12,7 @@ function Usage() {
 #######################################
     cat - <<ENDTEXT
 
-$0 {--discard|--group} --datadir dir --subdir subdir [-- preprocess_options...]
+$0 {--discard|--group} --datadir dir --subdir subdir [--cachedir dir] [--workers n] [-- preprocess_options...]
 
     Apply preprocessing steps to sample files:
     --group     input files are from curation group
@@ -18,6 +20,11 @@ $0 {--discard|--group} --datadir dir --subdir subdir [-- preprocess_options...]
 
     Files to preprocess are in dir
     Store resulting files in dir/subdir
+    --cachedir  cache preprocessed samples in this dir so later builds
+                only preprocess new/changed samples.
+    --workers   number of sdPreprocess.py worker processes for each file.
+                The files are preprocessed in parallel too, so this runs
+                about n * (number of files) processes.
     Specify multiple preprocessors each with its own -p: "-p pp1 -p pp2 ..."
     Default preprocessors:  ${preProcessors}
     If no preprocessing options, will just copy the files to dir/subdir
@@ -33,6 +40,8 @@ while [ $# -gt 0 ]; do
     -h|--help) Usage ;;
     --datadir) dataDir="$2"; shift; shift; ;;
     --subdir)  subDir="$2"; shift; shift; ;;
+    --cachedir) cacheDir="$2"; shift; shift; ;;
+    --workers) workers="$2"; shift; shift; ;;
     --group)   curationGroup="y"; shift; ;;
     --discard) curationGroup="n"; shift; ;;
     --)        shift; preProcessors=$*; break ;;
@@ -56,12 +65,24 @@ fi
 # preprocess the files
 #######################################
 
+if [ "$cacheDir" == "" -a "$workers" == "" ]; then
+    preprocessCmd="preprocessSamples.py"
+else
+    preprocessCmd="sdPreprocess.py"
+    if [ "$cacheDir" != "" ]; then
+        preprocessCmd="$preprocessCmd --cachedir $cacheDir"
+    fi
+    if [ "$workers" != "" ]; then
+        preprocessCmd="$preprocessCmd --workers $workers"
+    fi
+fi
+
 echo "Preprocessors: ${preProcessors}"
 echo Running in parallel
 date
 for f in $files; do
     set -x
-    preprocessSamples.py $preProcessors $dataDir/$f  >  $dataDir/$subDir/$f 2> $dataDir/$subDir/$f.log &
+    $preprocessCmd $preProcessors $dataDir/$f  >  $dataDir/$subDir/$f 2> $dataDir/$subDir/$f.log &
     set +x
 done
 wait
@@ -0,0 +1,86 @@
+#
+# sdConvertSamples.py
+# Convert a sample file to a columnar sample file, or a columnar sample file
+#  back to a (text) sample file.
+#  The direction is determined by the input file's format.
+#
+# See ColumnarSampleFileWriter in sampleDataLib.py for the columnar format.
+#
+import sys
+import time
+import argparse
+import sampleDataLib
+
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+#-----------------------------------
+
+def parseCmdLine():
+    parser = argparse.ArgumentParser( \
+    description='Convert sample files to/from columnar sample files.')
+
+    parser.add_argument('inputFile',
+        help='sample file or columnar sample file, "-" for stdin (text only)')
+
+    parser.add_argument('outputFile',
+        help='output file, "-" for stdout (text only)')
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="Sample class name to use if not specified in sample file. " +
+                                        "Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    return parser.parse_args()
+#-----------------------------------
+
+args = parseCmdLine()
+
+def main():
+    startTime = time.time()
+    if sampleDataLib.isColumnarSampleFile(args.inputFile):
+        n = columnar2Text()
+    else:
+        n = text2Columnar()
+    verbose("%d samples converted\n" % n)
+    verbose("%8.3f seconds\n" %  (time.time()-startTime))
+#-----------------------------------
+
+def text2Columnar():
+    verbose("Converting %s to columnar file %s\n" % \
+                                            (args.inputFile, args.outputFile))
+    sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
+    reader = sampleDataLib.SampleFileReader(args.inputFile,
+                                                    sampleObjType=sampleObjType)
+    metaItems = {'sourceFile': args.inputFile,
+                                'time': time.strftime("%Y/%m/%d-%H:%M:%S")}
+    writer = sampleDataLib.ColumnarSampleFileWriter(args.outputFile,
+                                reader.getSampleObjType(), metaItems=metaItems)
+    for sample in reader.sampleIterator():
+        writer.write(sample)
+    reader.close()
+    writer.close()
+    return writer.getNumSamples()
+#-----------------------------------
+
+def columnar2Text():
+    verbose("Converting columnar file %s to %s\n" % \
+                                            (args.inputFile, args.outputFile))
+    colFile = sampleDataLib.ColumnarSampleFile(args.inputFile)
+    writer = sampleDataLib.SampleFileWriter(args.outputFile,
+                colFile.getSampleObjType(), metaItems=colFile.getMetaItems())
+    for sample in colFile.sampleIterator():
+        writer.write(sample)
+    writer.close()
+    return writer.getNumSamples()
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#
+# sdDedupSamples.py
+# Remove duplicate samples across (raw) sample files.
+#
+# The same article can be in more than one raw subset or be re-extracted
+#  under a new ID. This wastes preprocessing & training time and skews
+#  train/test splits.
+#
+# Samples are read in order from all the input files. A sample is dropped if
+#  it is a duplicate of an earlier (kept) sample:
+#   sameID - it has the same ID
+#   exact  - its normalized title/abstract/extractedText are the same
+#               (lower case, punctuation & whitespace removed)
+#   near   - the estimated similarity of its text is >= --threshold
+#               (MinHash/LSH on word shingles, see MinHasher and NearDupIndex
+#               in sampleDataLib.py)
+# Samples w/ no words in their text are only dropped as sameID duplicates.
+# The kept samples are written (with meta data) to stdout or an output file.
+# Each dropped sample is reported (tab delimited) to the --report file:
+#   dup type, similarity, kept ID, kept file, kept class,
+#   dropped ID, dropped file, dropped class
+#
+# Time is roughly linear in the total text size: each sample is hashed once
+#  and only compared to the few kept samples that share an LSH bucket.
+#
+# Assumes all input files have the same sample type.
+#
+import sys
+import time
+import argparse
+import sampleDataLib
+
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+#-----------------------------------
+
+def parseCmdLine():
+    parser = argparse.ArgumentParser( \
+    description='Remove duplicate samples across sample files.')
+
+    parser.add_argument('inputFiles', nargs=argparse.REMAINDER,
+        help='files of samples (may be compressed), "-" for stdin')
+
+    parser.add_argument('-o', '--output', dest='outputFile', default='-',
+        help='output file for the kept samples. Default: "-" for stdout')
+
+    parser.add_argument('--report', dest='reportFile', default=None,
+        help='file to report the dropped samples to. Default: no report')
+
+    parser.add_argument('--threshold', dest='threshold', type=float,
+        default=0.8, help="min estimated similarity of near duplicates. " +
+        "Default: 0.8")
+
+    parser.add_argument('--exactonly', dest='exactOnly', action='store_true',
+        required=False, help="only remove sameID & exact duplicates")
+
+    parser.add_argument('--numperm', dest='numPerm', type=int, default=128,
+        help="MinHash signature size. Default: 128")
+
+    parser.add_argument('--bands', dest='numBands', type=int, default=16,
+        help="number of LSH bands, must divide --numperm. Default: 16")
+
+    parser.add_argument('--shingle', dest='shingleSize', type=int, default=5,
+        help="number of words per shingle. Default: 5")
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="Sample class name to use if not specified in sample file. " +
+                                        "Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    return parser.parse_args()
+#-----------------------------------
+
+args = parseCmdLine()
+
+REPORT_FIELDS = ['dupType', 'similarity', 'keptID', 'keptFile', 'keptClass',
+                    'droppedID', 'droppedFile', 'droppedClass', ]
+
+def main():
+    startTime = time.time()
+    sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
+    dedup = Deduplicator()
+    writer = None
+    report = None
+    if args.reportFile:
+        report = open(args.reportFile, 'w')
+        report.write('\t'.join(REPORT_FIELDS) + '\n')
+
+    for fn in args.inputFiles:
+        verbose("Reading %s\n" % str(fn))
+        reader = sampleDataLib.SampleFileReader(fn, sampleObjType=sampleObjType)
+        if not writer:		# processing 1st input file
+            sampleObjType = reader.getSampleObjType()
+            writer = sampleDataLib.SampleFileWriter(args.outputFile,
+                                                                sampleObjType)
+        elif sampleObjType != reader.getSampleObjType():
+            sys.stderr.write( \
+                "Input files have inconsistent sample types: %s & %s\n" % \
+                (sampleObjType.__name__,
+                reader.getSampleObjType().__name__) )
+            exit(5)
+
+        for sample in reader.sampleIterator():
+            dup = dedup.checkSample(sample, fn)
+            if dup:
+                if report:
+                    report.write('\t'.join(map(str, dup)) + '\n')
+            else:
+                writer.write(sample)
+        reader.close()
+
+    if report:
+        report.close()
+    if writer:
+        writer.close()
+        verbose("kept %d samples\n" % writer.getNumSamples())
+    for dupType in Deduplicator.DUP_TYPES:
+        verbose("dropped %d %s duplicates\n" % \
+                                        (dedup.numDups[dupType], dupType))
+    verbose("%8.3f seconds\n\n" %  (time.time()-startTime))
+#-----------------------------------
+
+class Deduplicator (object):
+    """
+    IS:     a record of the samples kept so far
+    HAS:    kept sample IDs, exact dup keys, NearDupIndex of their signatures
+    DOES:   checkSample(sample, fileName) - is it a dup of a kept sample?
+                If not, it is kept.
+    """
+    DUP_TYPES = ['sameID', 'exact', 'near']
+
+    def __init__(self):
+        self.kept      = []	# [(ID, fileName, class name)] of kept samples
+        self.ids       = {}	# {ID: index in self.kept}
+        self.exactKeys = {}	# {exact dup key: index in self.kept}
+        self.numDups   = { t: 0 for t in self.DUP_TYPES }
+        self.minHasher = sampleDataLib.MinHasher(numPerm=args.numPerm,
+                                                shingleSize=args.shingleSize)
+        self.nearDups  = sampleDataLib.NearDupIndex(numPerm=args.numPerm,
+                            numBands=args.numBands, threshold=args.threshold)
+
+    def checkSample(self, sample, fileName):
+        """
+        Return None if the sample is not a duplicate (and keep it),
+            else the report fields for the dropped sample.
+        """
+        ID = sample.getID()
+        info = (ID, fileName, getClassName(sample))
+        dup = None
+        if ID in self.ids:
+            dup = ('sameID', 1.0, self.ids[ID])
+        else:
+            words = sampleDataLib.getDupWords(sample)
+            if words:		# samples w/ no words are never text dups
+                exactKey = sampleDataLib.getExactDupKey(words)
+                if exactKey in self.exactKeys:
+                    dup = ('exact', 1.0, self.exactKeys[exactKey])
+                elif not args.exactOnly:
+                    signature = self.minHasher.getSignature(words)
+                    nearDups = self.nearDups.query(signature)
+                    if nearDups:
+                        similarity, index = nearDups[0]
+                        dup = ('near', round(similarity, 3), index)
+
+        if dup:
+            dupType, similarity, index = dup
+            self.numDups[dupType] += 1
+            return (dupType, similarity) + self.kept[index] + info
+
+        index = len(self.kept)
+        self.kept.append(info)
+        self.ids[ID] = index
+        if words:
+            self.exactKeys[exactKey] = index
+            if not args.exactOnly:
+                self.nearDups.add(index, signature)
+        return None
+# end class Deduplicator ------------------------
+
+def getClassName(sample):
+    """ Return the known class name of a classified sample, else '' """
+    if isinstance(sample, sampleDataLib.ClassifiedSample):
+        return sample.getKnownClassName()
+    return ''
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
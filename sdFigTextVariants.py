@@ -0,0 +1,95 @@
+#
+# sdFigTextVariants.py
+# Extract several flavors of figure text from (raw) sample files in one pass,
+#  e.g., to compare figure text options in tuning experiments.
+#
+# For each input file and each conversion (see MultiFigConverter in
+#  figureText.py), write a sample file whose extractedText is the figure text
+#  for that conversion:  <outdir>/<conversion name>/<input file basename>
+# (the same as applying the figureTextLegends, figureTextLegParagraphs, or
+#  figureTextLegCloseWords<n> preprocessors to the input files.)
+#
+# Each sample's text is split into paragraphs and searched for figure/table
+#  words once for all the conversions.
+#
+import sys
+import os
+import os.path
+import time
+import argparse
+import sampleDataLib
+import figureText
+
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+DEFAULT_CONVERSIONS = ['legends', 'legParagraphs', 'legCloseWords25',
+                        'legCloseWords50', 'legCloseWords75', 'legCloseWords100']
+#-----------------------------------
+
+def parseCmdLine():
+    parser = argparse.ArgumentParser( \
+    description='Extract several flavors of figure text from sample files.')
+
+    parser.add_argument('inputFiles', nargs=argparse.REMAINDER,
+        help='files of samples (may be compressed)')
+
+    parser.add_argument('-c', '--conversion', dest='conversions',
+        action='append', default=[],
+        help="conversion name: legends, legParagraphs, legCloseWords<n>. " +
+        "Repeat for multiple. Default: %s" % ' '.join(DEFAULT_CONVERSIONS))
+
+    parser.add_argument('--outdir', dest='outDir', default='.',
+        help="directory for the output subdirectories. Default: .")
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="Sample class name to use if not specified in sample file. " +
+                                        "Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    args = parser.parse_args()
+    if not args.conversions: args.conversions = DEFAULT_CONVERSIONS
+    return args
+#-----------------------------------
+
+args = parseCmdLine()
+
+def main():
+    startTime = time.time()
+    sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
+    converter = figureText.MultiFigConverter(args.conversions)
+    for name in args.conversions:
+        os.makedirs(os.path.join(args.outDir, name), exist_ok=True)
+
+    for fn in args.inputFiles:
+        verbose("Reading %s\n" % str(fn))
+        reader = sampleDataLib.SampleFileReader(fn, sampleObjType=sampleObjType)
+        writers = {}			# {conversion name: SampleFileWriter}
+        for name in args.conversions:
+            outFile = os.path.join(args.outDir, name, os.path.basename(fn))
+            writers[name] = sampleDataLib.SampleFileWriter(outFile,
+                                                reader.getSampleObjType(),
+                                                metaItems={'figText': name})
+        for sample in reader.sampleIterator():
+            figTexts = converter.text2FigTexts(sample.getExtractedText())
+            for name, blurbs in figTexts.items():
+                sample.setExtractedText('\n\n'.join(blurbs))
+                writers[name].write(sample)
+
+        reader.close()
+        for writer in writers.values():
+            writer.close()
+        verbose("wrote %d samples to each conversion\n" % \
+                                                    writer.getNumSamples())
+    verbose("%8.3f seconds\n\n" %  (time.time()-startTime))
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -24,7 +24,6 @@ from ExtractedTextSet import ExtractedTextSet
 sampleObjType = sampleDataLib.PrimTriageClassifiedSample
 
 # for the Sample output file
-outputSampleSet = sampleDataLib.ClassifiedSampleSet(sampleObjType=sampleObjType)
 RECORDEND    = sampleObjType.getRecordEnd()
 FIELDSEP     = sampleObjType.getFieldSep()
 
@@ -319,21 +318,19 @@ def doSamples(args):
     '''
     Run SQL to get samples from DB and output them to stdout
     '''
-    global outputSampleSet
     db.sql( BUILD_TMP_TABLES, 'auto')
+    writer = getSampleWriter()
 
     for i, (baseQ, textQ) in enumerate(buildGetSamplesSQL(args)):
         refRecords = getQueryResults(i, baseQ, textQ)
 
+        startTime = time.time()
         for r in refRecords:
-            sample = sqlRecord2ClassifiedSample( r)
-            outputSampleSet.addSample( sample)
+            writer.write( sqlRecord2ClassifiedSample( r))
+        verbose("Query %d:  wrote %d samples\n" % (i, len(refRecords)))
+        verbose( "%8.3f seconds\n\n" %  (time.time()-startTime))
 
-    startTime = time.time()
-    verbose("writing %d samples:\n" % outputSampleSet.getNumSamples())
-
-    nResults = writeSamples(outputSampleSet)
-    verbose( "%8.3f seconds\n\n" %  (time.time()-startTime))
+    verbose("wrote %d samples\n" % writer.getNumSamples())
     return
 #-----------------------------------
 
@@ -372,11 +369,13 @@ def getQueryResults(i, baseQ, textQ):
     return refRcds
 #-----------------------------------
 
-def writeSamples(sampleSet):
-    sampleSet.setMetaItem('host', args.host)
-    sampleSet.setMetaItem('db', args.db)
-    sampleSet.setMetaItem('time', time.strftime("%Y/%m/%d-%H:%M:%S"))
-    sampleSet.write(sys.stdout)
+def getSampleWriter():
+    """ Return a SampleFileWriter that writes samples to stdout, one at a time
+    """
+    metaItems = {'host': args.host, 'db': args.db,
+                                'time': time.strftime("%Y/%m/%d-%H:%M:%S")}
+    return sampleDataLib.SampleFileWriter(sys.stdout, sampleObjType,
+                                                        metaItems=metaItems)
 #-----------------------------------
 
 def sqlRecord2ClassifiedSample( r,		# sql Result record
@@ -23,7 +23,6 @@ from ExtractedTextSet import ExtractedTextSet
 #-----------------------------------
 
 SAMPLE_OBJ_TYPE = sampleDataLib.CurGroupClassifiedSample
-sampleSet = sampleDataLib.ClassifiedSampleSet(sampleObjType=SAMPLE_OBJ_TYPE)
 # for the output delimited file
 FIELDSEP     = SAMPLE_OBJ_TYPE.getFieldSep()
 RECORDEND    = SAMPLE_OBJ_TYPE.getRecordEnd()
@@ -560,16 +559,13 @@ def writeSamples(results	# list of records from SQL query (dicts)
     Write records to stdout
     Return count of records written
     """
-    global sampleSet
-
+    metaItems = {'host': args.host, 'db': args.db,
+                                'time': time.strftime("%Y/%m/%d-%H:%M:%S")}
+    writer = sampleDataLib.SampleFileWriter(sys.stdout, SAMPLE_OBJ_TYPE,
+                        metaItems=metaItems, writeHeader=True, writeMeta=True)
     for r in results:
-        sampleSet.addSample( sqlRecord2ClassifiedSample(r) )
-
-    sampleSet.setMetaItem('host', args.host)
-    sampleSet.setMetaItem('db', args.db)
-    sampleSet.setMetaItem('time', time.strftime("%Y/%m/%d-%H:%M:%S"))
-    sampleSet.write(sys.stdout, writeHeader=True, writeMeta=True)
-    return len(results)
+        writer.write( sqlRecord2ClassifiedSample(r) )
+    return writer.getNumSamples()
 #-----------------------------------
 
 def sqlRecord2ClassifiedSample( r,		# sql Result record
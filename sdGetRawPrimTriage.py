@@ -24,7 +24,6 @@ import ExtractedTextSet
 sampleObjType = sampleDataLib.PrimTriageClassifiedSample
 
 # for the Sample output file
-outputSampleSet = sampleDataLib.ClassifiedSampleSet(sampleObjType=sampleObjType)
 RECORDEND    = sampleObjType.getRecordEnd()
 FIELDSEP     = sampleObjType.getFieldSep()
 #-----------------------------------
@@ -407,25 +406,24 @@ def doSamples():
     extTextSet.joinRefs2ExtText(refRcds, allowNoText=True)
     verbose("%8.3f seconds\n\n" % (time.time()-startTime))
 
-    # build Sample objects and write SampleSet
-    global outputSampleSet
+    # build Sample objects and write them as we go
     startTime = time.time()
     verbose("constructing and writing samples:\n")
+    writer = getSampleWriter()
     for r in refRcds:
-        sample = sqlRecord2ClassifiedSample(r)
-        outputSampleSet.addSample(sample)
-
-    writeSamples(outputSampleSet)
-    verbose("wrote %d samples:\n" % outputSampleSet.getNumSamples())
+        writer.write(sqlRecord2ClassifiedSample(r))
+    verbose("wrote %d samples:\n" % writer.getNumSamples())
     verbose("%8.3f seconds\n\n" %  (time.time()-startTime))
     return
 #-----------------------------------
 
-def writeSamples(sampleSet):
-    sampleSet.setMetaItem('host', args.host)
-    sampleSet.setMetaItem('db', args.db)
-    sampleSet.setMetaItem('time', time.strftime("%Y/%m/%d-%H:%M:%S"))
-    sampleSet.write(sys.stdout)
+def getSampleWriter():
+    """ Return a SampleFileWriter that writes samples to stdout, one at a time
+    """
+    metaItems = {'host': args.host, 'db': args.db,
+                                'time': time.strftime("%Y/%m/%d-%H:%M:%S")}
+    return sampleDataLib.SampleFileWriter(sys.stdout, sampleObjType,
+                                                        metaItems=metaItems)
 #-----------------------------------
 
 def sqlRecord2ClassifiedSample(r,		# sql Result record
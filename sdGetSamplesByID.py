@@ -0,0 +1,94 @@
+#
+# sdGetSamplesByID.py
+# Get the samples with specified IDs from a sample file, write them (with
+#  meta data) to stdout.
+#
+# Uses the sample file's ID index sidecar (<sample file>.idx) to seek directly
+#  to the samples, building the index if it is missing or out of date.
+#  See IndexedSampleFile in sampleDataLib.py
+#
+# IDs can be given on the command line and/or in a file (1st column of each
+#  line, so a prediction file works, lines starting with '#' are skipped).
+#
+import sys
+import time
+import argparse
+import sampleDataLib
+
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+#-----------------------------------
+
+def parseCmdLine():
+    parser = argparse.ArgumentParser( \
+    description='Get samples by ID from a sample file. Write to stdout.')
+
+    parser.add_argument('sampleFile', help='file of samples')
+
+    parser.add_argument('IDs', nargs=argparse.REMAINDER,
+        help='sample IDs to get')
+
+    parser.add_argument('--idfile', dest='idFile', default=None,
+        help='file of IDs to get: 1st column of each line. "-" for stdin')
+
+    parser.add_argument('--mmap', dest='useMmap', action='store_true',
+        required=False, help="memory map the sample file")
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="Sample class name to use if not specified in sample file. " +
+                                        "Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    return parser.parse_args()
+#-----------------------------------
+
+args = parseCmdLine()
+
+def main():
+    startTime = time.time()
+    IDs = list(args.IDs)
+    if args.idFile:
+        IDs += readIDs(args.idFile)
+
+    sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
+    sampleFile = sampleDataLib.IndexedSampleFile(args.sampleFile,
+                            sampleObjType=sampleObjType, useMmap=args.useMmap)
+
+    missing = [ ID for ID in IDs if not sampleFile.hasID(ID) ]
+    for ID in missing:
+        verbose("ID not found: %s\n" % ID)
+
+    writer = sampleDataLib.SampleFileWriter(sys.stdout,
+                                            sampleFile.getSampleObjType())
+    for sample in sampleFile.getSamples(IDs, skipMissing=True):
+        writer.write(sample)
+    sampleFile.close()
+
+    verbose("%d samples written, %d IDs not found\n" % \
+                                        (writer.getNumSamples(), len(missing)))
+    verbose("%8.3f seconds\n" %  (time.time()-startTime))
+#-----------------------------------
+
+def readIDs(fileName):
+    """ Return list of IDs from the 1st column of the lines in fileName """
+    fp = sys.stdin if fileName == '-' else open(fileName, 'r')
+    IDs = []
+    for line in fp:
+        if line.startswith('#') or not line.strip():
+            continue
+        IDs.append(line.split()[0])
+    if fp is not sys.stdin:
+        fp.close()
+    return IDs
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+#
+# sdPreprocess.py
+# Apply preprocessors to files of samples, like MLtextTools
+#  preprocessSamples.py, but with an optional on disk cache of preprocessed
+#  samples so rebuilding sample files only preprocesses new/changed samples.
+#
+# Concatenates the preprocessed samples from all the input files and writes
+#  them (with meta data) to stdout or an output file.
+# Samples are streamed one at a time, so memory use does not depend on the
+#  size of the input files. Input & output files may be compressed.
+#
+# The preprocessors are applied as one fused preprocessor chain, see
+#  RefSample.getPreprocessorChain() in sampleDataLib.py.
+# See PreprocessCache in sampleDataLib.py for how the cache works.
+# The cache only grows: use --prunecache DAYS to remove entries not used in
+#  that many days, or remove the cache dir to start over.
+#
+# With --workers N, the samples are preprocessed in N worker processes. Each
+#  file is split into chunks of sample records that are sent to the workers,
+#  and the results are written in the same order as the input.
+#  If $STEMCACHE is set (see getStemmer() in sampleDataLib.py), each worker
+#  loads it and saves its own stem cache when it exits, so the last worker
+#  to exit determines what is saved.
+#
+# With --profile, a report of the time each preprocessor takes (and on which
+#  samples) is written at the end, see PreprocessorProfiler in sampleDataLib.py
+#
+# Assumes all input files have the same sample type.
+#
+import sys
+import time
+import argparse
+import collections
+import multiprocessing
+import multiprocessing.util
+import sampleDataLib
+import featureTransform
+
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+#-----------------------------------
+
+def parseCmdLine():
+    parser = argparse.ArgumentParser( \
+    description='Apply preprocessors to sample files.')
+
+    parser.add_argument('inputFiles', nargs=argparse.REMAINDER,
+        help='files of samples (may be compressed), "-" for stdin')
+
+    parser.add_argument('-p', '--preprocessor', dest='preprocessors',
+        action='append', required=False, default=[],
+        help='preprocessor name. Repeat for multiple, applied in order.')
+
+    parser.add_argument('-o', '--output', dest='outputFile', default='-',
+        help='output file, compressed if it ends in .gz, .bz2, .xz. ' +
+                                                    'Default: "-" for stdout')
+
+    parser.add_argument('--cachedir', dest='cacheDir', default=None,
+        help="directory for the preprocessed sample cache. " +
+                                        "Default: don't use a cache")
+
+    parser.add_argument('--prunecache', dest='pruneDays', type=float,
+        default=None, help="after preprocessing, remove cache entries not " +
+        "used in this many days. Default: don't remove any")
+
+    parser.add_argument('-w', '--workers', dest='workers', type=int,
+        default=1, help="number of worker processes. Default: 1")
+
+    parser.add_argument('--chunksize', dest='chunkSize', type=int,
+        default=20, help="number of samples to send to a worker at once. " +
+        "Default: 20")
+
+    parser.add_argument('--profile', dest='profileFile', default=None,
+        help="write a preprocessor profile report to this file, " +
+        '"-" for stderr. Default: no report (unless $%s is set)' % \
+                                                    sampleDataLib.PROFILE_ENV)
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="Sample class name to use if not specified in sample file. " +
+                                        "Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
+        required=False, help="skip helpful messages to stderr")
+
+    return parser.parse_args()
+#-----------------------------------
+
+args = parseCmdLine()
+
+def main():
+    startTime = time.time()
+    sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
+    writer = None
+    pool = None
+    hits = misses = 0		# preprocess cache counts
+    if args.profileFile:
+        sampleDataLib.startProfiling(args.profileFile)
+    profiling = sampleDataLib.profiler is not None
+
+    for fn in args.inputFiles:
+        verbose("Reading %s\n" % str(fn))
+        reader = sampleDataLib.SampleFileReader(fn, sampleObjType=sampleObjType)
+
+        if not writer:		# processing 1st input file
+            sampleObjType = reader.getSampleObjType()
+            writer = sampleDataLib.SampleFileWriter(args.outputFile,
+                                                                sampleObjType)
+            verbose("Sample type: %s\n" % sampleObjType.__name__)
+            verbose("Preprocessors: %s\n" % str(args.preprocessors))
+            initArgs = (sampleObjType, args.preprocessors, args.cacheDir)
+            if args.workers > 1:
+                initArgs += (profiling,)
+                verbose("Workers: %d\n" % args.workers)
+                pool = multiprocessing.Pool(args.workers,
+                                    initializer=initWorker, initargs=initArgs)
+            else:
+                initWorker(*initArgs)
+        elif sampleObjType != reader.getSampleObjType():
+            sys.stderr.write( \
+                "Input files have inconsistent sample types: %s & %s\n" % \
+                (sampleObjType.__name__,
+                reader.getSampleObjType().__name__) )
+            exit(5)
+
+        for records, chunkHits, chunkMisses, profile in \
+                                preprocessRecords(reader.recordIterator(), pool):
+            for record in records:
+                writer.writeRecordText(record)
+            hits   += chunkHits
+            misses += chunkMisses
+            if profile:
+                sampleDataLib.profiler.merge(profile)
+        reader.close()
+
+    if pool:
+        pool.close()
+        pool.join()
+    if writer:
+        writer.close()
+        verbose("wrote %d samples\n" % writer.getNumSamples())
+    if args.cacheDir:
+        verbose("cache %s: %d hits, %d misses\n" % \
+                                                (args.cacheDir, hits, misses))
+        if args.pruneDays is not None:
+            cache = sampleDataLib.PreprocessCache(args.cacheDir,
+                                        sampleObjType, args.preprocessors)
+            verbose("cache %s: pruned %d entries\n" % \
+                                (args.cacheDir, cache.prune(args.pruneDays)))
+    verbose("%8.3f seconds\n\n" %  (time.time()-startTime))
+#-----------------------------------
+
+def preprocessRecords(records,	# iterable of sample record texts
+                        pool,	# multiprocessing.Pool or None
+    ):
+    """
+    Yield (preprocessed record texts, cache hits, cache misses, worker
+        profile) for chunks of records, in the same order as records.
+    If pool, fan the chunks out to the workers. Only a few chunks per worker
+        are in flight at a time, so records can be a (long) stream.
+    """
+    chunks = featureTransform.chunkIterator(records, args.chunkSize)
+    if not pool:
+        for chunk in chunks:
+            yield preprocessChunk(chunk)
+        return
+
+    maxPending = 2 * args.workers	# chunks sent to the pool, not yielded
+    pending = collections.deque()	# AsyncResults for those chunks, in order
+    for chunk in chunks:
+        pending.append(pool.apply_async(preprocessChunk, (chunk,)))
+        if len(pending) >= maxPending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+#-----------------------------------
+
+# Preprocessing state of this (worker) process, see initWorker()
+workerSampleObjType = None
+workerCache = None		# PreprocessCache or None
+workerChain = None		# preprocessor chain function, if no cache
+workerProfiling = False		# True if a pool worker collecting a profile
+                                #  to return w/ each chunk
+
+def initWorker(sampleObjType, preprocessors, cacheDir, profiling=False):
+    global workerSampleObjType, workerCache, workerChain, workerProfiling
+    workerSampleObjType = sampleObjType
+    # pool workers exit w/o running atexit functions, so save $STEMCACHE here
+    multiprocessing.util.Finalize(None, sampleDataLib.saveStemCache,
+                                                                exitpriority=0)
+    if profiling:	# a new profiler w/o the main process's report at exit
+        sampleDataLib.startProfiling()
+        workerProfiling = True
+    if cacheDir:
+        workerCache = sampleDataLib.PreprocessCache(cacheDir, sampleObjType,
+                                                                preprocessors)
+    else:
+        workerChain = sampleObjType.getPreprocessorChain(preprocessors)
+#-----------------------------------
+
+def preprocessChunk(records):
+    """
+    Return (list of preprocessed record texts, cache hits, cache misses,
+        profile) for a list of sample record texts.
+    profile is the PreprocessorProfiler for the chunk if this is a pool
+        worker collecting a profile, else None.
+    """
+    results = []
+    if workerCache:
+        hits, misses = workerCache.getHits(), workerCache.getMisses()
+    for record in records:
+        sample = workerSampleObjType().parseSampleRecordText(record)
+        if workerCache:
+            sample = workerCache.preprocess(sample)
+        else:
+            sample = workerChain(sample)
+        results.append(sample.getSampleAsText())
+
+    profile = None
+    if workerProfiling:
+        profile = sampleDataLib.profiler.popProfile()
+    if workerCache:
+        return results, workerCache.getHits() - hits, \
+                                    workerCache.getMisses() - misses, profile
+    return results, 0, 0, profile
+#-----------------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#-----------------------------------
+
+if __name__ == "__main__":
+    main()
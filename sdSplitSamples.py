@@ -15,8 +15,9 @@
 #  file consistent with the inputs.
 #  (although, by random selection, the distributions will likely be maintained)
 #
-# ClassifiedRefSampleRecord Class in sampleDataLib.py is responsible for the
-#   sample handling
+# SampleFileReader/Writer in sampleDataLib.py are responsible for the
+#   sample handling. Samples are streamed from the inputs to the outputs one at
+#   a time, so memory use does not depend on the size of the inputs.
 #
 # Assumes all input files have the same column structure. see sampleDataLib.py.
 #
@@ -40,7 +41,7 @@ def parseCmdLine():
                 '"leftovers". Summary stats to stdout.')
 
     parser.add_argument('inputFiles', nargs=argparse.REMAINDER,
-    	help='files of samples')
+    	help='files of samples (may be compressed)')
 
     parser.add_argument('-f', '--fraction', dest='fraction', action='store',
         required=False, type=float, default=0.2,
@@ -48,11 +49,13 @@ def parseCmdLine():
 
     parser.add_argument('--retainedfile', dest='retainedFile', action='store',
         required=False, default=DEFAULT_OUTPUT_RETAINED,
-    	help='retained output file. Default: ' + DEFAULT_OUTPUT_RETAINED)
+    	help='retained output file, compressed if it ends in .gz, .bz2, .xz. '
+                                    + 'Default: ' + DEFAULT_OUTPUT_RETAINED)
 
     parser.add_argument('--leftoverfile', dest='leftoverFile', action='store',
         required=False, default=DEFAULT_OUTPUT_LEFTOVER,
-    	help='leftover output file. Default: ' + DEFAULT_OUTPUT_LEFTOVER)
+    	help='leftover output file, compressed if it ends in .gz, .bz2, .xz. '
+                                    + 'Default: ' + DEFAULT_OUTPUT_LEFTOVER)
 
     parser.add_argument('--mgijournalsfile', dest='mgiJournalsFile',
         action='store', required=False, default=DEFAULT_MGI_JOURNALS_FILE,
@@ -99,6 +102,21 @@ def cleanJournalName(s):
     return jn
 #----------------------
 
+class SplitCounter (object):
+    # counts of the samples written to one of the output files
+    def __init__(self):
+        self.numSamples  = 0
+        self.numPositive = 0
+        self.numNegative = 0
+        self.journals    = set()
+
+    def count(self, sample):
+        self.numSamples += 1
+        if sample.isPositive(): self.numPositive += 1
+        else:                   self.numNegative += 1
+        self.journals.add(sample.getJournal())
+#----------------------
+
 #----------------------
 def main():
 #----------------------
@@ -106,36 +124,33 @@ def main():
     random.seed(args.seed)
     mgiJournalsNames = getMgiJournals(args.mgiJournalsFile)
 
-    retainedSampleSet = None	# the final sample sets
-    leftoverSampleSet = None	#   ...
-
-    allJournals = set()		# all journal names seen in input
+    retainedWriter = None	# the output sample files, written as we go
+    leftoverWriter = None	#   ...
+    retainedCounts = SplitCounter()
+    leftoverCounts = SplitCounter()
 
     sampleObjType = getattr(sampleDataLib, args.sampleObjTypeName)
 
     for fn in args.inputFiles:
         verbose("Reading %s\n" % fn)
-        inputSampleSet = sampleDataLib.ClassifiedRefSampleSet( \
-                                        sampleObjType=sampleObjType).read(fn)
-
-        if not retainedSampleSet:	# processing 1st input file
-            sampleObjType     = inputSampleSet.getSampleObjType()
-            retainedSampleSet = sampleDataLib.ClassifiedRefSampleSet( \
-                                                sampleObjType=sampleObjType)
-            leftoverSampleSet = sampleDataLib.ClassifiedRefSampleSet( \
-                                                sampleObjType=sampleObjType)
+        reader = sampleDataLib.SampleFileReader(fn, sampleObjType=sampleObjType)
+
+        if not retainedWriter:		# processing 1st input file
+            sampleObjType  = reader.getSampleObjType()
+            retainedWriter = sampleDataLib.SampleFileWriter(args.retainedFile,
+                                                                sampleObjType)
+            leftoverWriter = sampleDataLib.SampleFileWriter(args.leftoverFile,
+                                                                sampleObjType)
             verbose("Sample type: %s\n" % sampleObjType.__name__)
         else:
-            if sampleObjType != inputSampleSet.getSampleObjType():
+            if sampleObjType != reader.getSampleObjType():
                 sys.stderr.write( \
                     "Input files have inconsistent sample types: %s & %s\n" % \
                     (sampleObjType.__name__,
-                    inputSampleSet.getSampleObjType().__name__) )
+                    reader.getSampleObjType().__name__) )
                 exit(5)
 
-        allJournals |= inputSampleSet.getJournals()
-
-        for sample in inputSampleSet.sampleIterator():
+        for sample in reader.sampleIterator():
             if args.onlyMgi and not cleanJournalName(sample.getJournal()) \
                                                         in mgiJournalsNames:
                 retain = False
@@ -143,12 +158,14 @@ def main():
                 retain = random.random() < float(args.fraction)
 
             if retain:
-                retainedSampleSet.addSample(sample)
+                retainedWriter.write(sample)
+                retainedCounts.count(sample)
             else:
-                leftoverSampleSet.addSample(sample)
-    ### Write output files
-    retainedSampleSet.write(args.retainedFile)
-    leftoverSampleSet.write(args.leftoverFile)
+                leftoverWriter.write(sample)
+                leftoverCounts.count(sample)
+        reader.close()
+    retainedWriter.close()
+    leftoverWriter.close()
 
     ### Write summary report
     summary = "\nSummary:  "
@@ -163,29 +180,27 @@ def main():
     summary += str(args.inputFiles) + '\n'
 
     summary += "Input Totals:\n"
-    totRefs = retainedSampleSet.getNumSamples() + \
-                                            leftoverSampleSet.getNumSamples()
-    totPos  = retainedSampleSet.getNumPositives() + \
-                                            leftoverSampleSet.getNumPositives()
-    totNeg  = retainedSampleSet.getNumNegatives() + \
-                                            leftoverSampleSet.getNumNegatives()
+    totRefs = retainedCounts.numSamples  + leftoverCounts.numSamples
+    totPos  = retainedCounts.numPositive + leftoverCounts.numPositive
+    totNeg  = retainedCounts.numNegative + leftoverCounts.numNegative
+    allJournals = retainedCounts.journals | leftoverCounts.journals
     summary += formatSummary(totRefs, totPos, totNeg, len(allJournals))
     summary += '\n'
 
     summary += "Retained Set Totals:\n"
-    summary += formatSummary(retainedSampleSet.getNumSamples(),
-                            retainedSampleSet.getNumPositives(),
-                            retainedSampleSet.getNumNegatives(),
-                            len(retainedSampleSet.getJournals()),
+    summary += formatSummary(retainedCounts.numSamples,
+                            retainedCounts.numPositive,
+                            retainedCounts.numNegative,
+                            len(retainedCounts.journals),
                             )
     summary += "(%5.3f%% of inputs)\n" %  \
-                            (100.0 * retainedSampleSet.getNumSamples()/totRefs)
+                            (100.0 * retainedCounts.numSamples/totRefs)
     summary += '\n'
     summary += "Leftover Set Totals:\n"
-    summary += formatSummary(leftoverSampleSet.getNumSamples(),
-                            leftoverSampleSet.getNumPositives(),
-                            leftoverSampleSet.getNumNegatives(),
-                            len(leftoverSampleSet.getJournals()),
+    summary += formatSummary(leftoverCounts.numSamples,
+                            leftoverCounts.numPositive,
+                            leftoverCounts.numNegative,
+                            len(leftoverCounts.journals),
                             )
     sys.stdout.write(summary + '\n')
     return
@@ -0,0 +1,136 @@
+import sys
+import unittest
+import os
+import os.path
+import re
+import featureTransform
+from featureTransform import *
+
+"""
+These are tests for featureTransform.py
+
+Usage:   python test_featureTransform.py [-v]
+"""
+######################################
+
+class TransformTexts_tests (unittest.TestCase):
+    def setUp(self):
+        self.texts = [ "A knock out mouse %d, fig a1 and -/- e12. %s" % \
+                                                        (i, 'x ' * (i % 7))
+                        for i in range(50) ] + ['', 'no mappings here']
+
+    def test_serial(self):
+        self.assertEqual([ transformText(t) for t in self.texts ],
+                                                transformTexts(self.texts))
+
+    def test_workers(self):
+        # pooled results are in the same order & the same as serial
+        serial = [ transformText(t) for t in self.texts ]
+        for chunksize in [1, 3, 100]:
+            self.assertEqual(serial, transformTexts(self.texts, workers=3,
+                                                        chunksize=chunksize))
+        # texts can be a stream
+        self.assertEqual(serial, list(iterTransformTexts(iter(self.texts),
+                                                    workers=2, chunksize=4)))
+
+    def test_chunkIterator(self):
+        self.assertEqual([[0, 1, 2], [3, 4, 5], [6]],
+                                        list(chunkIterator(range(7), 3)))
+        self.assertEqual([], list(chunkIterator([], 3)))
+
+# end class TransformTexts_tests
+######################################
+
+class TrieRegex_tests (unittest.TestCase):
+    def getSpans(self, regex, text):
+        regex = r'\b(?:' + regex + r')\b'
+        return [ m.span() for m in re.finditer(regex, text, re.IGNORECASE) ]
+
+    def test_trie(self):
+        self.assertEqual('t(?:umo(?:r|ur)|hymoma)',
+                            buildTrieRegex(['tumor', 'tumour', 'thymoma']))
+        # a word that is a prefix of another is tried first (lazy '??')
+        self.assertEqual('ab(?:c)??', buildTrieRegex(['abc', 'ab']))
+        self.assertEqual('ab', re.match(buildTrieRegex(['abc', 'ab']),
+                                                                'abcd').group())
+        # '.' matches any char, other chars are literal
+        r = buildTrieRegex(['r1.1', 'a+b'])
+        self.assertTrue(re.fullmatch(r, 'r1x1'))
+        self.assertTrue(re.fullmatch(r, 'a+b'))
+        self.assertFalse(re.fullmatch(r, 'aab'))
+
+    def test_sameAsAlternation(self):
+        # same matches as the old '|' of the words, w/ word boundaries
+        words = ['ab', 'abc', 'abcd', 'b.d', 'Tumor', 'tumour', 'tu']
+        text = 'ab abc abcd abcde bxd b.d TUMOR tumours tu x-ab tumor-tu'
+        self.assertEqual(self.getSpans('|'.join(words), text),
+                                self.getSpans(buildTrieRegex(words), text))
+
+        text = ' '.join(cellLineNames + [ n + 'x' for n in cellLineNames ] +
+                                        [ n.lower() for n in cellLineNames ])
+        self.assertEqual(self.getSpans('|'.join(cellLineNames), text),
+                            self.getSpans(buildTrieRegex(cellLineNames), text))
+
+# end class TrieRegex_tests
+######################################
+
+class CellLines_tests (unittest.TestCase):
+    def setUp(self):
+        self.fileName = os.path.abspath('temporaryCellLines.pre')
+        with open(self.fileName, 'w') as fp:
+            fp.write('# a comment\nB16* (a comment too)\n\n  DA*\n# F9*\n')
+
+    def tearDown(self):
+        os.remove(self.fileName)
+
+    def test_readFiles(self):
+        self.assertEqual(['B16', 'DA'], getCellLinePrefixes(self.fileName))
+        self.assertEqual(['B16* (a comment too)', 'DA*'],
+                                            getCellLineNames(self.fileName))
+        # the real files
+        self.assertIn('B16', cellLinePrefixes)
+        self.assertNotIn('F9', cellLinePrefixes)	# commented out
+        self.assertIn('BAL17.7.1', cellLineNames)
+        for name in cellLinePrefixes + cellLineNames:
+            self.assertFalse(name.startswith('#'))
+
+    def test_transform(self):
+        # F9* is commented out, so F9x is not a cell line
+        self.assertEqual('cell_line cells, F9x cells, cell_line',
+                            transformText('B16F10 cells, F9x cells, NIH-3T3'))
+
+    def test_getBigRe(self):
+        self.assertIs(getBigRe(), getBigRe())		# compiled once
+        self.assertEqual(bigRegex, getBigRe().pattern)
+
+# end class CellLines_tests
+######################################
+
+class MappingStats_tests (unittest.TestCase):
+    def setUp(self):
+        featureTransform.stats = MappingStats()
+
+    def tearDown(self):
+        featureTransform.stats = None
+
+    def test_counts(self):
+        text = 'a knock out mouse w/ a tumor and a mouse'
+        transformText(text)
+        stats = featureTransform.stats
+        self.assertEqual((1, len(text)), (stats.numTexts, stats.numBytes))
+        self.assertEqual((1, 9), (stats.matches['ko'], stats.bytes['ko']))
+        self.assertEqual((2, 10), (stats.matches['mice'], stats.bytes['mice']))
+        self.assertEqual((1, 5), (stats.matches['tt'], stats.bytes['tt']))
+        self.assertEqual(0, stats.matches['cl'])
+        self.assertEqual(4, sum(stats.matches.values()))
+
+        stats.merge(stats)
+        self.assertEqual((2, 2*len(text)), (stats.numTexts, stats.numBytes))
+        self.assertEqual((4, 20), (stats.matches['mice'], stats.bytes['mice']))
+        self.assertIn('2 texts, %d bytes' % (2*len(text)), stats.getReport())
+
+# end class MappingStats_tests
+######################################
+
+if __name__ == '__main__':
+    unittest.main()
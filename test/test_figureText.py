@@ -0,0 +1,130 @@
+import sys
+import unittest
+import os
+import os.path
+from figureText import *
+
+"""
+These are tests for figureText.py
+
+Usage:   python test_figureText.py [-v]
+"""
+######################################
+
+# paragraphs w/ legends, figure/table mentions close together & far apart
+TEXT = '\n\n'.join([
+    'Introduction with no figure words at all.',
+    'Figure 1. The legend of figure 1, see Table 2.',
+    'We saw this in mice (Fig 2) and in rats (fig 3), ' +
+        'then a few more words here before the next mention of Table 1 ' +
+        'and some words that follow it until the end of the paragraph.',
+    '  Table 2. A table legend with leading blanks.  ',
+    'Supplemental Figure S1 is a legend too.',
+    'Some words, then ' + ' '.join([ 'w%d' % i for i in range(120) ]) +
+        ' figure 4 ' + ' '.join([ 'v%d' % i for i in range(120) ]) +
+        ' and figure 5 right after.',
+    'The end.',
+    ])
+
+CONVERSIONS = ['legends', 'legParagraphs', 'legCloseWords1',
+                'legCloseWords5', 'legCloseWords50', 'legCloseWords100']
+
+class MultiFigConverter_tests (unittest.TestCase):
+    def test_text2FigTexts(self):
+        # same blurbs as a Text2FigConverter for each conversion
+        figTexts = MultiFigConverter(CONVERSIONS).text2FigTexts(TEXT)
+        self.assertEqual(CONVERSIONS, list(figTexts.keys()))
+        for name in CONVERSIONS:
+            conversionType, numWords = parseConversionName(name)
+            converter = Text2FigConverter(conversionType=conversionType,
+                                                            numWords=numWords)
+            self.assertEqual(converter.text2FigText(TEXT), figTexts[name])
+            self.assertEqual(name, converter.getConversionName())
+
+    def test_noFigures(self):
+        figTexts = MultiFigConverter(CONVERSIONS).text2FigTexts('nothing to see')
+        self.assertEqual({ name: [] for name in CONVERSIONS }, figTexts)
+        figTexts = MultiFigConverter(CONVERSIONS).text2FigTexts('')
+        self.assertEqual({ name: [] for name in CONVERSIONS }, figTexts)
+
+    def test_parseConversionName(self):
+        self.assertEqual(('legCloseWords', 50),
+                                    parseConversionName('legCloseWords50'))
+        self.assertEqual(('legends', None), parseConversionName('legends'))
+        self.assertRaises(AttributeError, parseConversionName, 'legWords')
+
+# end class MultiFigConverter_tests
+######################################
+
+class FigSpans_tests (unittest.TestCase):
+    def checkSpans(self, text, name, spans):
+        """ spans are in order, don't overlap or touch, and are stripped """
+        for (start, end), (nextStart, nextEnd) in zip(spans, spans[1:]):
+            self.assertTrue(start < end < nextStart, name)
+        for start, end in spans:
+            self.assertEqual(text[start:end].strip(), text[start:end], name)
+
+    def test_text2FigSpans(self):
+        # single blanks between words & fig words that start a word: the
+        #  joined spans are the same text as the joined blurbs
+        text = TEXT.replace('(', '').replace('  ', ' ')
+        figSpans = MultiFigConverter(CONVERSIONS).text2FigSpans(text)
+        self.assertEqual(CONVERSIONS, list(figSpans.keys()))
+        for name in CONVERSIONS:
+            conversionType, numWords = parseConversionName(name)
+            converter = Text2FigConverter(conversionType=conversionType,
+                                                            numWords=numWords)
+            self.checkSpans(text, name, figSpans[name])
+            self.assertEqual('\n\n'.join(converter.text2FigText(text)),
+                                        joinSpans(text, figSpans[name]), name)
+            self.assertEqual(figSpans[name], converter.text2FigSpans(text))
+
+    def test_text2FigSpans_whitespace(self):
+        # spans keep the text's own whitespace & words glued to fig words,
+        #  blurbs have words split at fig words & joined by single blanks
+        figSpans = MultiFigConverter(CONVERSIONS).text2FigSpans(TEXT)
+        for name in CONVERSIONS:
+            conversionType, numWords = parseConversionName(name)
+            converter = Text2FigConverter(conversionType=conversionType,
+                                                            numWords=numWords)
+            self.checkSpans(TEXT, name, figSpans[name])
+            self.assertEqual(
+                ''.join(''.join(converter.text2FigText(TEXT)).split()),
+                ''.join(joinSpans(TEXT, figSpans[name]).split()), name)
+        self.assertIn('(Fig 2)', joinSpans(TEXT, figSpans['legCloseWords5']))
+
+    def test_overlappingBlurbs(self):
+        # blurbs around close fig words overlap, so there is one blurb/span
+        text = 'a b c fig 1 d e fig 2 f g h'
+        converter = Text2FigConverter(conversionType='legCloseWords',
+                                                                numWords=2)
+        self.assertEqual(['b c fig 1 d e fig 2 f'],
+                                            converter.text2FigText(text))
+        spans = converter.text2FigSpans(text)
+        self.assertEqual(1, len(spans))
+        self.assertEqual('b c fig 1 d e fig 2 f', joinSpans(text, spans))
+
+        # far apart, two blurbs/spans
+        text = 'a b c fig 1 d e f g h fig 2 i j k'
+        spans = converter.text2FigSpans(text)
+        self.assertEqual(converter.text2FigText(text),
+                                    [ text[start:end] for start, end in spans ])
+        self.assertEqual(2, len(spans))
+
+    def test_mergeSpans(self):
+        self.assertEqual([], mergeSpans([]))
+        # overlapping, contained, touching, and separate spans
+        self.assertEqual([(0, 10), (12, 15), (16, 17)],
+            mergeSpans([(0, 5), (3, 8), (8, 10), (12, 15), (13, 14), (16, 17)]))
+
+    def test_joinSpans(self):
+        text = 'abcdefgh'
+        self.assertEqual('ab\n\nde', joinSpans(text, [(0, 2), (3, 5)]))
+        self.assertEqual('ab|de', joinSpans(text, [(0, 2), (3, 5)], sep='|'))
+        self.assertEqual('', joinSpans(text, []))
+
+# end class FigSpans_tests
+######################################
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,8 @@ import sys
 import unittest
 import os
 import os.path
+import shutil
+import time
 from sampleDataLib import *
 
 """
@@ -15,6 +17,20 @@ The pattern:
 """
 ######################################
 
+# PrimTriageClassifiedSample records shared by the sample file tests
+SAMPLE_RECORDS = [
+        '''discard|pmID1|10/3/2017|1901|1|peer reviewed|supp status1|apstat1|gxdStat1|goStat1|tumorStat1|qtlStat1|journal1|title1|abstract1|text1''',
+        '''keep|pmID2|01/01/1900|1900|0|non-peer reviewed|supp status2|apstat2|gxdstat2|goStat2|tumorstat2|qtlStat2|journal2|title2|abstract2|text2
+with a 2nd line''',
+        '''keep|pmID3|01/01/1900|1900|0|non-peer reviewed|supp status2|apstat2|gxdstat2|goStat2|tumorstat2|qtlStat2|journal2|title3|abstract3|text3 \u00e9\u4e2d''',
+        ]
+
+def getSampleFileSamples(num=2):
+    """ Return new samples from the 1st num SAMPLE_RECORDS """
+    return [ PrimTriageClassifiedSample().parseSampleRecordText(t)
+                                                for t in SAMPLE_RECORDS[:num] ]
+#---------------------------
+
 class PrimTriageClassifiedSample_tests(unittest.TestCase):
     def setUp(self):
         self.sample1Text = \
@@ -146,6 +162,26 @@ my titl figur text
         self.sample2.removeURLsCleanStem()
         self.assertEqual(expectedText, self.sample2.getDocument().strip())
 
+    def test_preprocessorChain(self):
+        preprocessors = ['figureTextLegCloseWords50', 'removeURLsCleanStem',
+                                                                'truncateText']
+        sample3 = PrimTriageClassifiedSample().parseSampleRecordText( \
+                                            self.sample2.getSampleAsText())
+        for pp in preprocessors:
+            getattr(self.sample2, pp)()
+        chain = PrimTriageClassifiedSample.getPreprocessorChain(preprocessors)
+        chain(sample3)
+        self.assertEqual(self.sample2.getDocument(), sample3.getDocument())
+
+        # a chain can be called as a preprocessor named "pp1+pp2..."
+        sample4 = PrimTriageClassifiedSample().parseSampleRecordText( \
+                                            self.sample1.getSampleAsText())
+        self.sample1.removeURLs().tokenPerLine()
+        getattr(sample4, 'removeURLs+tokenPerLine')()
+        self.assertEqual(self.sample1.getDocument(), sample4.getDocument())
+
+        self.assertRaises(AttributeError, getattr, sample4, 'removeURLs+foo')
+
 # end class PrimTriageClassifiedSample_tests
 ######################################
 
@@ -563,6 +599,546 @@ class ClassifiedRefSampleSet_tests (unittest.TestCase):
 # end class ClassifiedRefSampleSet_tests
 ######################################
 
+class Tokenizer_tests (unittest.TestCase):
+    # test the module level tokenizing functions
+    def test_tokenizeText(self):
+        text = "A knock out www.foo.org mouse, fig a1 and -/- e12."
+        tokens = tokenizeText(text)
+        self.assertEqual(['knock_out', 'mice', 'figure', 'and', 'mut_mut',
+                            'embryonic_day'], [ t[2] for t in tokens ])
+        # coords are in the original text
+        start, end, token = tokens[0]
+        self.assertEqual('knock out', text[start:end])
+        start, end, token = tokens[1]
+        self.assertEqual('mouse', text[start:end])
+
+    def test_tokenizeText_glued(self):
+        # 'ee' mapping matches ", cell" so its replacement is glued to "smaller"
+        text = "smaller, cell mouse"
+        tokens = tokenizeText(text)
+        self.assertEqual(['smallerearly_embryo', 'mice'],
+                                                    [ t[2] for t in tokens ])
+        start, end, token = tokens[0]
+        self.assertEqual('smaller, cell', text[start:end])
+
+    def test_tokenizeText_lowerFirst(self):
+        # same tokens as lower casing the whole (transformed) text 1st, even
+        #  for chars that lower case to 2 chars or depending on context
+        text = "\u0130stanbul 9\u0130ab \u0391\u03a3'\u0391 mouse"
+        old = [ m.group() for m in \
+            token_re.finditer(featureTransform.transformText(text).lower()) ]
+        tokens = tokenizeText(text)
+        self.assertEqual(old, [ t[2] for t in tokens ])
+        self.assertEqual(['stanbul', 'ab', 'mice'], [ t[2] for t in tokens
+                                                    if t[2].isascii() ])
+        start, end, token = tokens[0]
+        self.assertEqual('stanbul', text[start:end])
+
+    def test_splitPreTokenized(self):
+        doc = " my titl\n my abstract a\n my text mut_mut"
+        self.assertEqual(['my', 'titl', 'my', 'abstract', 'my', 'text',
+                            'mut_mut'], splitPreTokenized(doc))
+
+# end class Tokenizer_tests
+######################################
+
+class StemCache_tests (unittest.TestCase):
+    class FakeStemmer (object):		# stem = 1st 3 chars
+        def stem(self, token): return token[:3]
+
+    def test_stem(self):
+        sc = StemCache(self.FakeStemmer(), maxSize=2)
+        self.assertEqual('abc', sc.stem('abcd'))
+        self.assertEqual('abc', sc.stem('abcd'))
+        self.assertEqual(1, sc.getHits())
+        self.assertEqual(1, sc.getMisses())
+
+    def test_LRU(self):
+        sc = StemCache(self.FakeStemmer(), maxSize=2)
+        sc.stem('abcd')
+        sc.stem('bcde')
+        sc.stem('abcd')		# bcde is now least recently used
+        sc.stem('cdef')		# pushes out bcde
+        self.assertEqual(2, sc.getNumTokens())
+        self.assertEqual(['abcd', 'cdef'], list(sc.stems.keys()))
+
+    def test_save_load(self):
+        fileName = 'temporaryStemCacheFile.txt'
+        sc = StemCache(self.FakeStemmer())
+        sc.stem('abcd')
+        sc.stem('bcde')
+        sc.save(fileName)
+
+        sc2 = StemCache(self.FakeStemmer()).load(fileName)
+        self.assertEqual(sc.stems, sc2.stems)
+        sc2.stem('abcd')
+        self.assertEqual(1, sc2.getHits())
+        os.remove(fileName)
+
+# end class StemCache_tests
+######################################
+
+class PreprocessCache_tests (unittest.TestCase):
+    def setUp(self):
+        self.cacheDir = 'temporaryPreprocessCacheDir'
+        self.preprocessors = ['figureTextLegCloseWords50', 'removeURLsCleanStem']
+        self.sampleText = \
+        '''pmID1|My Title|My Abstract: knock out|My text.
+
+Figure 1: this is a figure legend'''
+
+    def tearDown(self):
+        shutil.rmtree(self.cacheDir, ignore_errors=True)
+
+    def test_preprocess(self):
+        expected = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                    self.sampleText).figureTextLegCloseWords50() \
+                    .removeURLsCleanStem().getSampleAsText()
+
+        cache = PreprocessCache(self.cacheDir, PrimTriageUnClassifiedSample,
+                                                        self.preprocessors)
+        s = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                                            self.sampleText)
+        self.assertEqual(expected, cache.preprocess(s).getSampleAsText())
+        self.assertEqual((0, 1), (cache.getHits(), cache.getMisses()))
+
+        # 2nd time, from the cache
+        s = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                                            self.sampleText)
+        self.assertEqual(expected, cache.preprocess(s).getSampleAsText())
+        self.assertEqual((1, 1), (cache.getHits(), cache.getMisses()))
+
+        # different preprocessors or raw text are not cache hits
+        cache2 = PreprocessCache(self.cacheDir, PrimTriageUnClassifiedSample,
+                                                    ['removeURLsCleanStem'])
+        s = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                                            self.sampleText)
+        cache2.preprocess(s)
+        s = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                                    self.sampleText + ' more')
+        cache2.preprocess(s)
+        self.assertEqual((0, 2), (cache2.getHits(), cache2.getMisses()))
+
+    def test_prune(self):
+        cache = PreprocessCache(self.cacheDir, PrimTriageUnClassifiedSample,
+                                                        self.preprocessors)
+        s = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                                            self.sampleText)
+        fileName = cache.getCacheFileName(s)
+        cache.preprocess(s)
+        self.assertEqual(0, cache.prune(1))		# just used
+        self.assertTrue(os.path.isfile(fileName))
+
+        old = time.time() - 2*24*60*60
+        os.utime(fileName, (old, old))
+        self.assertEqual(1, cache.prune(1))
+        self.assertFalse(os.path.isfile(fileName))
+
+# end class PreprocessCache_tests
+######################################
+
+class SampleFileReaderWriter_tests (unittest.TestCase):
+    def setUp(self):
+        self.fileName = 'temporarySampleOutputFile.txt'
+        self.samples = getSampleFileSamples()
+
+    def tearDown(self):
+        for fn in [self.fileName, getIndexFileName(self.fileName)]:
+            if os.path.exists(fn): os.remove(fn)
+
+    def test_write_read(self):
+        writer = SampleFileWriter(self.fileName, PrimTriageClassifiedSample,
+                                                    metaItems={'host': 'foo'})
+        for s in self.samples:
+            writer.write(s)
+        writer.close()
+        self.assertEqual(2, writer.getNumSamples())
+
+        # SampleSet can read what the writer wrote
+        ss = SampleSet().read(self.fileName)
+        self.assertEqual(PrimTriageClassifiedSample, ss.getSampleObjType())
+        self.assertEqual([ s.getDocument() for s in self.samples ],
+                                                            ss.getDocuments())
+
+        # reader gives the same samples, even w/ tiny read chunks
+        reader = SampleFileReader(self.fileName, chunkSize=7)
+        self.assertEqual(PrimTriageClassifiedSample, reader.getSampleObjType())
+        self.assertEqual([ s.getSampleAsText() for s in self.samples ],
+                    [ s.getSampleAsText() for s in reader.sampleIterator() ])
+        reader.close()
+
+    def test_recordText(self):
+        writer = SampleFileWriter(self.fileName, PrimTriageClassifiedSample)
+        for s in self.samples:
+            writer.writeRecordText(s.getSampleAsText())
+        writer.close()
+
+        reader = SampleFileReader(self.fileName, chunkSize=7)
+        records = list(reader.recordIterator())
+        reader.close()
+        self.assertEqual([ s.getSampleAsText() for s in self.samples ],
+            [ PrimTriageClassifiedSample().parseSampleRecordText(r)
+                                        .getSampleAsText() for r in records ])
+
+    def test_splitRecords(self):
+        text = 'a;;bb;b;;;;' + 'c'*50 + ';;d'
+        expected = ['a', 'bb;b', '', 'c'*50, 'd']
+        for size in [1, 2, 3, 7, 100]:		# record ends split across chunks
+            chunks = [ text[i:i+size] for i in range(0, len(text), size) ]
+            self.assertEqual(expected, list(splitRecords(chunks, ';;')))
+            chunks = [ c.encode() for c in chunks ]
+            self.assertEqual([ e.encode() for e in expected ],
+                                        list(splitRecords(chunks, b';;')))
+        self.assertEqual(['a', ''], list(splitRecords(['a;', ';'], ';;')))
+        self.assertEqual([''], list(splitRecords([], ';;')))
+
+    def test_cleanDelimiters(self):
+        # a document w/ field separators & record ends can be a field value
+        doc = 'Fig 1. a|b;;c\n\nmore;text|'
+        self.assertEqual('Fig 1. a b c\n\nmore;text ', cleanDelimiters(doc))
+
+        sample = self.samples[0]
+        sample.setExtractedText(cleanDelimiters(doc))
+        writer = SampleFileWriter(self.fileName, PrimTriageClassifiedSample)
+        writer.write(sample)
+        writer.write(self.samples[1])
+        writer.close()
+
+        reader = SampleFileReader(self.fileName)
+        samples = list(reader.sampleIterator())
+        reader.close()
+        self.assertEqual(['pmID1', 'pmID2'], [ s.getID() for s in samples ])
+        self.assertEqual(cleanDelimiters(doc), samples[0].getExtractedText())
+        self.assertEqual('text2\nwith a 2nd line',
+                                            samples[1].getExtractedText())
+
+# end class SampleFileReaderWriter_tests
+######################################
+
+class ColumnarSampleFile_tests (unittest.TestCase):
+    def setUp(self):
+        self.fileName = 'temporaryColumnarFile.col'
+        self.ss = ClassifiedRefSampleSet( \
+                                sampleObjType=PrimTriageClassifiedSample)
+        for s in getSampleFileSamples():
+            self.ss.addSample(s)
+
+    def tearDown(self):
+        if os.path.exists(self.fileName): os.remove(self.fileName)
+
+    def test_write_read(self):
+        writer = ColumnarSampleFileWriter(self.fileName,
+                                            PrimTriageClassifiedSample,
+                                            metaItems={'host': 'foo'})
+        for s in self.ss.sampleIterator():
+            writer.write(s)
+        writer.close()
+
+        self.assertTrue(isColumnarSampleFile(self.fileName))
+        colFile = ColumnarSampleFile(self.fileName)
+        self.assertEqual(PrimTriageClassifiedSample, colFile.getSampleObjType())
+        self.assertEqual(2, colFile.getNumSamples())
+        self.assertEqual({'host': 'foo'}, colFile.getMetaItems())
+        self.assertEqual(['journal1', 'journal2'], colFile.getColumn('journal'))
+        self.assertEqual(['pmID1', 'pmID2'], colFile.getColumn('ID'))
+
+        ss2 = ClassifiedRefSampleSet().read(self.fileName)
+        self.assertEqual(PrimTriageClassifiedSample, ss2.getSampleObjType())
+        self.assertEqual(self.ss.getDocuments(), ss2.getDocuments())
+        self.assertEqual([ s.getSampleAsText() for s in self.ss.getSamples() ],
+                        [ s.getSampleAsText() for s in ss2.getSamples() ])
+        self.assertEqual({'journal1', 'journal2'}, ss2.getJournals())
+
+# end class ColumnarSampleFile_tests
+######################################
+
+class IndexedSampleFile_tests (unittest.TestCase):
+    def setUp(self):
+        self.fileName = 'temporarySampleOutputFile.txt'
+        self.samples = getSampleFileSamples(3)
+        writer = SampleFileWriter(self.fileName, PrimTriageClassifiedSample,
+                                                            buildIndex=True)
+        for s in self.samples:
+            writer.write(s)
+        writer.close()		# writes the index
+
+    def tearDown(self):
+        for fn in [self.fileName, getIndexFileName(self.fileName)]:
+            if os.path.exists(fn): os.remove(fn)
+
+    def test_getSample(self):
+        self.assertTrue(os.path.exists(getIndexFileName(self.fileName)))
+        for useMmap in [False, True]:
+            sf = IndexedSampleFile(self.fileName, useMmap=useMmap)
+            self.assertEqual(PrimTriageClassifiedSample, sf.getSampleObjType())
+            self.assertEqual(['pmID1', 'pmID2', 'pmID3'], sf.getIDs())
+            self.assertEqual(self.samples[1].getSampleAsText(),
+                                        sf.getSample('pmID2').getSampleAsText())
+            self.assertRaises(KeyError, sf.getSample, 'foo')
+            self.assertEqual(['pmID1', 'pmID3'], [ s.getID() for s in \
+                sf.getSamples(['pmID3', 'foo', 'pmID1'], skipMissing=True) ])
+            sf.close()
+
+    def test_staleIndex(self):
+        # rewrite the sample file w/o the index, the old index is stale
+        writer = SampleFileWriter(self.fileName, PrimTriageClassifiedSample,
+                                                            buildIndex=False)
+        writer.write(self.samples[2])
+        writer.close()
+        self.assertEqual(None, readSampleIndex(self.fileName))
+
+        sf = IndexedSampleFile(self.fileName)	# rebuilds the index
+        self.assertEqual(['pmID3'], sf.getIDs())
+        sf.close()
+        self.assertEqual(['pmID3'], list(readSampleIndex(self.fileName).keys()))
+
+    def test_writerIndex(self):
+        # the writer's index is the same as scanning the file
+        index = readSampleIndex(self.fileName)
+        self.assertEqual(['pmID1', 'pmID2', 'pmID3'], list(index.keys()))
+        self.assertEqual(buildSampleIndex(self.fileName), index)
+
+        # no index unless asked for
+        os.remove(getIndexFileName(self.fileName))
+        writer = SampleFileWriter(self.fileName, PrimTriageClassifiedSample)
+        writer.write(self.samples[0])
+        writer.close()
+        self.assertFalse(os.path.exists(getIndexFileName(self.fileName)))
+
+# end class IndexedSampleFile_tests
+######################################
+
+class CompressedSampleFile_tests (unittest.TestCase):
+    def setUp(self):
+        self.samples = getSampleFileSamples()
+        self.fileNames = []
+
+    def tearDown(self):
+        for fn in self.fileNames:
+            if os.path.exists(fn): os.remove(fn)
+
+    def test_write_read(self):
+        for ext in ['.gz', '.bz2', '.xz']:
+            fileName = 'temporarySampleOutputFile.txt' + ext
+            self.fileNames.append(fileName)
+
+            writer = SampleFileWriter(fileName, PrimTriageClassifiedSample)
+            for s in self.samples:
+                writer.write(s)
+            writer.close()
+            self.assertTrue(isCompressedSampleFile(fileName))
+            self.assertFalse(os.path.exists(getIndexFileName(fileName)))
+
+            reader = SampleFileReader(fileName)
+            self.assertEqual([ s.getSampleAsText() for s in self.samples ],
+                    [ s.getSampleAsText() for s in reader.sampleIterator() ])
+            reader.close()
+
+            ss = ClassifiedRefSampleSet().read(fileName)
+            self.assertEqual([ s.getDocument() for s in self.samples ],
+                                                            ss.getDocuments())
+
+# end class CompressedSampleFile_tests
+######################################
+
+class FieldValues_tests (unittest.TestCase):
+    def setUp(self):
+        self.layout = FieldLayout.getLayout(['ID', 'journal', 'title'],
+                                                                ['journal'])
+    def test_mapping(self):
+        fv = FieldValues(self.layout, {'title': 'my title', 'ID': 'pmID1'})
+        self.assertEqual({'ID': 'pmID1', 'title': 'my title'}, dict(fv))
+        self.assertEqual(2, len(fv))
+        self.assertRaises(KeyError, fv.__getitem__, 'journal')
+
+        fv['journal'] = ''.join(['journal', '1'])
+        self.assertIs(sys.intern('journal1'), fv['journal'])
+        fv['foo'] = 'not a field'
+        self.assertEqual(['ID', 'journal', 'title', 'foo'], list(fv.keys()))
+        del fv['foo']
+        del fv['title']
+        self.assertEqual({'ID': 'pmID1', 'journal': 'journal1'}, dict(fv))
+
+        fv2 = fv.copy()
+        fv2['ID'] = 'pmID2'
+        self.assertEqual('pmID1', fv['ID'])
+
+    def test_sample(self):
+        s = getSampleFileSamples(1)[0]
+        self.assertIsInstance(s.values, FieldValues)
+        self.assertIsInstance(s.extraInfo, FieldValues)
+        self.assertEqual('journal1', s.getJournal())
+        s.setTitle('new title')
+        self.assertEqual('new title', s.getField('title'))
+
+# end class FieldValues_tests
+######################################
+
+class SampleSetView_tests (unittest.TestCase):
+    def setUp(self):
+        self.ss = ClassifiedRefSampleSet( \
+                                sampleObjType=PrimTriageClassifiedSample)
+        for s in getSampleFileSamples():
+            self.ss.addSample(s)
+
+    def test_views(self):
+        docs = getDocumentView(self.ss)
+        self.assertEqual(self.ss.getDocuments(), list(docs))
+        self.assertEqual(self.ss.getDocuments(), list(docs))  # again
+        self.assertEqual(2, len(docs))
+        self.assertEqual(self.ss.getDocuments()[1], docs[1])
+        self.assertEqual(self.ss.getSampleIDs(),
+                                            list(getSampleIDView(self.ss)))
+        self.assertEqual(self.ss.getKnownYvalues(),
+                                            list(getKnownYvalueView(self.ss)))
+
+        self.ss.getSamples()[0].setReject(True, reason='my rejection reason')
+        self.assertEqual(['pmID2'],
+                            list(getSampleIDView(self.ss, omitRejects=True)))
+
+# end class SampleSetView_tests
+######################################
+
+class PreprocessorProfiler_tests (unittest.TestCase):
+    def setUp(self):
+        self.sampleText = \
+        '''discard|pmID1|10/3/2017|1901|1|peer reviewed|supp status1|apstat1|gxdStat1|goStat1|tumorStat1|qtlStat1|journal1|title1|abstract1|Some text. Figure 1. A legend.'''
+
+    def tearDown(self):
+        stopProfiling()
+
+    def test_profile(self):
+        prof = startProfiling()
+        s = PrimTriageClassifiedSample().parseSampleRecordText(self.sampleText)
+        s.figureTextLegCloseWords50()		# field preprocessor
+        s.truncateText()			# other preprocessor
+        s = PrimTriageClassifiedSample().parseSampleRecordText(self.sampleText)
+        s.getPreprocessorChain(['figureTextLegCloseWords50',
+                                'featureTransform'])(s)
+
+        stats = prof.fieldStats
+        self.assertEqual(2, stats[('figureTextLegCloseWords50',
+                                                        'extractedText')][0])
+        self.assertEqual(len(self.sampleText.split('|')[-1]),
+            stats[('figureTextLegCloseWords50', 'extractedText')][2] // 2)
+        self.assertEqual(1, stats[('featureTransform', 'title')][0])
+        self.assertEqual(1, stats[('truncateText', '*')][0])
+        self.assertEqual(2, prof.numSamples['figureTextLegCloseWords50'])
+        self.assertEqual(['pmID1'],
+                    [ ID for sec, ID, n in prof.worst['truncateText'] ])
+
+        # popped profile can be merged back
+        popped = prof.popProfile()
+        self.assertEqual({}, prof.fieldStats)
+        prof.merge(popped).merge(popped)
+        self.assertEqual(4, prof.fieldStats[('figureTextLegCloseWords50',
+                                                        'extractedText')][0])
+        self.assertEqual(4, prof.numSamples['figureTextLegCloseWords50'])
+        self.assertIn('figureTextLegCloseWords50', prof.getReport())
+
+# end class PreprocessorProfiler_tests
+######################################
+
+class DuplicateDetection_tests (unittest.TestCase):
+    def setUp(self):
+        self.words = [ 'word%d' % (i % 97) for i in range(0, 2000, 7) ]
+
+    def test_dupWords(self):
+        s1 = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                        'pmID1|A Title|An abstract.|Some  text')
+        s2 = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                                        'pmID2|a title|an, abstract|some text!')
+        self.assertEqual(['a', 'title', 'an', 'abstract', 'some', 'text'],
+                                                            getDupWords(s1))
+        self.assertEqual(getExactDupKey(getDupWords(s1)),
+                                            getExactDupKey(getDupWords(s2)))
+
+    def test_minHash(self):
+        mh = MinHasher(numPerm=64)
+        sig = mh.getSignature(self.words)
+        self.assertEqual(64, len(sig))
+        self.assertEqual(sig, MinHasher(numPerm=64).getSignature(self.words))
+        self.assertEqual(1.0, mh.similarity(sig, sig))
+
+        changed = list(self.words)
+        changed[100] = 'different'
+        s = mh.similarity(sig, mh.getSignature(changed))
+        self.assertTrue(0.7 < s < 1.0)
+
+        other = [ 'other%d' % i for i in range(300) ]
+        self.assertTrue(mh.similarity(sig, mh.getSignature(other)) < 0.1)
+
+        # short docs
+        self.assertEqual(mh.getSignature(['a', 'b']),
+                                            mh.getSignature(['a', 'b']))
+
+    def test_nearDupIndex(self):
+        mh = MinHasher(numPerm=64)
+        index = NearDupIndex(numPerm=64, numBands=16, threshold=0.7)
+        index.add('doc1', mh.getSignature(self.words))
+        index.add('doc2', mh.getSignature([ 'x%d' % i for i in range(300) ]))
+        self.assertEqual(2, len(index))
+
+        changed = list(self.words)
+        changed[50] = 'different'
+        dups = index.query(mh.getSignature(changed))
+        self.assertEqual(['doc1'], [ key for s, key in dups ])
+        self.assertEqual([], index.query(mh.getSignature(['y', 'z'])))
+
+        self.assertRaises(ValueError, NearDupIndex, numPerm=64, numBands=10)
+
+# end class DuplicateDetection_tests
+######################################
+
+class References_tests (unittest.TestCase):
+    def setUp(self):
+        self.body = 'Introduction\n' + 'We studied mice. ' * 20 + \
+                                                        '\n\nResults\nMore.\n'
+        self.refs = 'References\n1. Smith J (2001) Mice. J Biol 1:2-3.\n'
+        self.sample = PrimTriageUnClassifiedSample().parseSampleRecordText( \
+                            'pmID1|title|abstract|%s' % (self.body + self.refs))
+
+    def test_removeReferences(self):
+        s = self.sample.removeReferences()
+        self.assertEqual(self.body, s.getExtractedText())
+        self.assertEqual('title', s.getTitle())
+
+        # a heading near the start (e.g., a table of contents) is skipped
+        text = 'References\n' + self.body
+        self.assertEqual(text, figureText.removeReferences(text))
+        # heading must be a line by itself
+        text = self.body + 'See the references below.\n'
+        self.assertEqual(-1, figureText.findReferencesStart(text))
+        for heading in ['4. REFERENCES:', 'Literature Cited', 'Bibliography',
+                                                        'R E F E R E N C E S']:
+            text = self.body + heading + '\nSmith J (2001)\n'
+            self.assertEqual(len(self.body),
+                                    figureText.findReferencesStart(text))
+
+    def test_legendsAfterReferences(self):
+        legends = 'Figure 1. Mutant mice.\n\nMore legend text.\n\n' + \
+                                                        ' Table 1. Genes.\n'
+        refs = self.refs + '\n2. Jones K (2002) Rats.'
+        text = self.body + refs + '\n\n' + legends
+        self.assertEqual((len(self.body), len(self.body + refs)),
+                                        figureText.findReferencesSpan(text))
+        self.assertEqual(self.body + '\n\n' + legends,
+                                            figureText.removeReferences(text))
+        self.assertEqual(['Figure 1. Mutant mice.', 'Table 1. Genes.'],
+                figureText.text2FigText_Legend(
+                                        figureText.removeReferences(text)))
+
+    def test_tagReferences(self):
+        s = self.sample.tagReferences()
+        self.assertEqual(self.body + '\n\n' + figureText.REFERENCES_TAG + \
+                                    '\n\n' + self.refs, s.getExtractedText())
+
+        text = 'no references here'
+        self.assertEqual(text, figureText.tagReferences(text))
+
+# end class References_tests
+######################################
+
 def makeSuites():           # experimenting with Suites, skip for now
     suites = [
                 ('PrimTriageUnClassifiedSample',
@@ -0,0 +1,53 @@
+import sys
+import unittest
+import os
+import os.path
+import subprocess
+
+"""
+These are tests for sdDedupSamples.py
+
+Usage:   python test_sdDedupSamples.py [-v]
+
+The script is run as a subprocess, since it parses its command line when
+it is imported.
+"""
+######################################
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                                        'sdDedupSamples.py')
+META = '#meta sampleObjType=PrimTriageUnClassifiedSample;;' + \
+                                        'ID|title|abstract|extractedText;;\n'
+
+def getKeptIDs(records, *options):
+    """ Return the IDs of the samples kept from the sample records """
+    request = META + ''.join([ r + ';;\n' for r in records ])
+    result = subprocess.run([sys.executable, SCRIPT, '-q'] + list(options) +
+                        ['-'], input=request.encode(), stdout=subprocess.PIPE,
+                        check=True)
+    lines = result.stdout.decode().split(';;\n')[1:]	# skip meta
+    return [ line.split('|')[0] for line in lines if line.strip() ]
+#---------------------------
+
+class Deduplicator_tests (unittest.TestCase):
+    def test_dups(self):
+        text = 'the mice were knocked out and the embryos were examined'
+        records = [ 'pm1|title 1|abstract|' + text,
+                    'pm1|other title|other|other text',		# sameID
+                    'pm2|Title 1|abstract.|' + text.upper(),	# exact
+                    'pm3|title 3|abstract|more text here',
+                    ]
+        self.assertEqual(['pm1', 'pm3'], getKeptIDs(records, '--exactonly'))
+
+    def test_noWords(self):
+        # samples w/ no words are not dups of each other
+        records = [ 'pm1|||', 'pm2|||', 'pm3| ..|-|', 'pm1|||', ]
+        self.assertEqual(['pm1', 'pm2', 'pm3'], getKeptIDs(records))
+        self.assertEqual(['pm1', 'pm2', 'pm3'],
+                                        getKeptIDs(records, '--exactonly'))
+
+# end class Deduplicator_tests
+######################################
+
+if __name__ == '__main__':
+    unittest.main()
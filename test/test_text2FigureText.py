@@ -0,0 +1,91 @@
+import sys
+import unittest
+import os
+import os.path
+import subprocess
+
+"""
+These are tests for text2FigureText.py
+
+Usage:   python test_text2FigureText.py [-v]
+
+The script is run as a subprocess, since it parses its command line when
+it is imported.
+"""
+######################################
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                                        'text2FigureText.py')
+
+def frame(text):
+    """ Return the length framed request bytes for text """
+    data = text.encode('utf-8')
+    return b'%d\n' % len(data) + data
+#---------------------------
+
+def readFrames(data):
+    """ Return the list of texts of the length framed responses in data """
+    texts = []
+    while data:
+        line, data = data.split(b'\n', 1)
+        length = int(line)
+        texts.append(data[:length].decode('utf-8'))
+        data = data[length:]
+    return texts
+#---------------------------
+
+class Server_tests (unittest.TestCase):
+    def runServer(self, request):
+        """ Return the responses from a --server run on the request bytes """
+        result = subprocess.run([sys.executable, SCRIPT, '--server', '-q'],
+                        input=request, stdout=subprocess.PIPE, check=True)
+        return readFrames(result.stdout)
+
+    def test_server(self):
+        doc = 'Some text.\n\nFigure 1. A legend.'
+        self.assertEqual(['---------------\nFigure 1. A legend.\n' +
+                        '-------------\n', '-------------\n'],
+                        self.runServer(frame(doc) + frame('nothing here')))
+
+    def test_badFrames(self):
+        # bad length lines & non utf-8 text get an error response and the
+        #  server keeps going
+        doc = 'Figure 1. A legend.'
+        request = b'oops\n' + frame(doc) + b'\n' + b'-3\n' + \
+                                b'2\n\xff\xfe' + frame(doc)
+        responses = self.runServer(request)
+        self.assertEqual(6, len(responses))
+        for i in [0, 2, 3, 4]:
+            self.assertTrue(responses[i].startswith('ERROR: '))
+        self.assertIn('oops', responses[0])
+        self.assertIn('utf-8', responses[4])
+        self.assertEqual(responses[1], responses[5])
+        self.assertIn('Figure 1. A legend.', responses[5])
+
+    def test_hugeLengths(self):
+        # too big & too long length lines get an error response w/o reading
+        #  the data
+        doc = 'Figure 1. A legend.'
+        request = b'999999999999\n' + frame(doc) + b'9'*100 + b'\n' + \
+                                                                frame(doc)
+        responses = self.runServer(request)
+        self.assertEqual(4, len(responses))
+        self.assertTrue(responses[0].startswith('ERROR: '))
+        self.assertTrue(responses[2].startswith('ERROR: '))
+        self.assertEqual(responses[1], responses[3])
+
+    def test_shortFrame(self):
+        # a frame cut short by EOF gets an error response, then the server
+        #  stops cleanly
+        request = frame('nothing here') + b'100\nFigure 1. A'
+        responses = self.runServer(request)
+        self.assertEqual(2, len(responses))
+        self.assertEqual('-------------\n', responses[0])
+        self.assertTrue(responses[1].startswith('ERROR: '))
+        self.assertIn('EOF', responses[1])
+
+# end class Server_tests
+######################################
+
+if __name__ == '__main__':
+    unittest.main()
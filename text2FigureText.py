@@ -1,10 +1,54 @@
 # Read a text file (extracted text) (from stdin) and run the
 #  figure text extraction, output the figure text to stdout.
 #
-
+# Server mode (--server or --socket):
+#  Instead of running this script once per document, run it once and send it
+#  many documents, so python startup and compiling the figure text regex's
+#  happen once.
+#  Each request is a document, each response is its figure text output (the
+#  same text this script writes to stdout for one document).
+#  Both are length framed:
+#       <number of bytes>\n<that many bytes of utf-8 text>
+#  --server:  read requests from stdin, write responses to stdout, until EOF
+#  --socket path:  listen on a Unix socket, each connection can send any
+#                   number of requests (until it closes its end).
+#  A request w/ a bad length line (or text that is not utf-8) gets an error
+#   response:  ERROR_PREFIX + a message.  The server keeps serving, taking
+#   the line after a bad length line as the next request's length line.
+#   A length > MAX_FRAME_BYTES is a bad length line.
+#   A request cut short by EOF also gets an error response.
+#
+# Batch mode (--dir, --manifest or --samplefile):
+#  Extract figure text from many documents in a pool of --workers processes:
+#   --dir dir:  each file in dir is an extracted text document
+#   --manifest file:  file has the path of an extracted text document per line
+#   --samplefile file:  the extractedText of each sample in a sample file
+#  Write the output to either or both:
+#   --outdir dir:  a figure text output file for each document
+#       (the same text this script writes to stdout for one document):
+#       <outdir>/<document file name>.fig   or   <outdir>/<sample ID>.fig
+#   -o file:  a sample file, one sample per document w/ extractedText = the
+#       figure text (like the figureText* preprocessors in sampleDataLib.py).
+#       For documents, the sample ID is the file name w/o its extension.
+#
 import sys
+import os
+import os.path
+import stat
+import time
+import signal
 import argparse
+import socketserver
+import multiprocessing
 import figureText
+sampleDataLib = None		# imported in batch mode, see runBatch(), initWorker()
+
+OUTPUT_SUFFIX = '.fig'		# suffix of --outdir output files
+ERROR_PREFIX = 'ERROR: '	# server mode error response text prefix
+MAX_FRAME_BYTES = 256*1024*1024	# max server mode request length
+MAX_LENGTH_LINE = 40		# max server mode length line length (bytes)
+DEFAULT_SAMPLE_TYPE = 'PrimTriageClassifiedSample'
+DOC_SAMPLE_TYPE = 'PrimTriageUnClassifiedSample'  # -o sample type for docs
 
 def parseCmdLine():
     parser = argparse.ArgumentParser( \
@@ -21,12 +65,62 @@ def parseCmdLine():
         help="number of words for legCloseWords figoption. See figureText.py." +
         " Default: 50 (used by littriageload)")
 
+    parser.add_argument('--server', dest='server', action='store_true',
+        required=False,
+        help="read length framed documents from stdin until EOF, " +
+        "write length framed figure text to stdout")
+
+    parser.add_argument('--socket', dest='socketPath', action='store',
+        default=None,
+        help="serve length framed requests on this Unix socket")
+
+    parser.add_argument('--dir', dest='inputDir', action='store',
+        default=None, help="batch: extract from each file in this directory")
+
+    parser.add_argument('--manifest', dest='manifest', action='store',
+        default=None,
+        help="batch: extract from each file listed (one per line) in this file")
+
+    parser.add_argument('--samplefile', dest='sampleFile', action='store',
+        default=None,
+        help="batch: extract from the extractedText of each sample in this " +
+        "sample file")
+
+    parser.add_argument('--sampletype', dest='sampleObjTypeName',
+        default=DEFAULT_SAMPLE_TYPE,
+        help="batch: sample class name to use if not specified in the " +
+                            "sample file. Default: %s" % DEFAULT_SAMPLE_TYPE)
+
+    parser.add_argument('--outdir', dest='outDir', action='store',
+        default=None,
+        help="batch: write figure text for each document to this directory")
+
+    parser.add_argument('-o', '--output', dest='outputFile', action='store',
+        default=None,
+        help="batch: write a sample file of the figure text to this file, " +
+        '"-" for stdout')
+
+    parser.add_argument('-w', '--workers', dest='workers', type=int,
+        default=1, help="batch: number of worker processes. Default: 1")
+
+    parser.add_argument('--chunksize', dest='chunkSize', type=int,
+        default=10, help="batch: number of documents to send to a worker " +
+        "at once. Default: 10")
+
     parser.add_argument('-q', '--quiet', dest='verbose', action='store_false',
         required=False, help="skip helpful messages to stderr")
 
     args = parser.parse_args()
     args.inputFile = sys.stdin	# set here in case we ever have input file opt
 
+    batchInputs = [ x for x in [args.inputDir, args.manifest, args.sampleFile]
+                                                            if x is not None ]
+    args.batch = len(batchInputs) > 0
+    if len(batchInputs) > 1:
+        parser.error("use only one of --dir, --manifest, --samplefile")
+    if args.batch and not (args.outDir or args.outputFile):
+        parser.error("batch mode needs --outdir and/or --output")
+
     return args
 #---------------------------
 
@@ -35,11 +129,233 @@ args = parseCmdLine()
 def main():
     converter = figureText.Text2FigConverter(conversionType=args.figOption,
                                                 numWords=args.numWords)
-    text = args.inputFile.read()
-    for ft in converter.text2FigText(text):
-        print('---------------')
-        print(ft)
-    print('-------------')
+    if args.batch:
+        runBatch()
+    elif args.socketPath:
+        serveSocket(converter, args.socketPath)
+    elif args.server:
+        n = serveStream(converter, sys.stdin.buffer, sys.stdout.buffer)
+        verbose("%d documents\n" % n)
+    else:
+        text = args.inputFile.read()
+        sys.stdout.write(getFigTextOutput(converter.text2FigText(text)))
+#---------------------------
+
+def getFigTextOutput(figTexts):
+    """ Return the figure text output for one document's figure texts """
+    output = []
+    for ft in figTexts:
+        output.append('---------------\n')
+        output.append(ft + '\n')
+    output.append('-------------\n')
+    return ''.join(output)
+#---------------------------
+
+def serveStream(converter,
+                inFp,		# binary file to read requests from
+                outFp,		# binary file to write responses to
+    ):
+    """
+    Read length framed documents from inFp until EOF, write length framed
+        figure text output for each to outFp. Return number of documents.
+    """
+    n = 0
+    while True:
+        try:
+            text = readFrame(inFp)
+        except FrameError as e:		# tell the client, keep serving
+            writeFrame(outFp, ERROR_PREFIX + str(e))
+            verbose(ERROR_PREFIX + str(e) + '\n')
+            continue
+        if text is None:
+            break
+        writeFrame(outFp, getFigTextOutput(converter.text2FigText(text)))
+        n += 1
+    return n
+#---------------------------
+
+class FrameError (ValueError):
+    """ A bad length framed request """
+    pass
+#---------------------------
+
+def readFrame(fp):
+    """ Return the text of the next length framed request, None at EOF.
+        Raise FrameError for a bad request.
+    """
+    line = fp.readline(MAX_LENGTH_LINE)
+    if not line:
+        return None
+    badLine = line
+    while not line.endswith(b'\n'):	# skip the rest of a long line
+        line = fp.readline(MAX_LENGTH_LINE)
+        if not line:
+            break
+    try:
+        length = int(badLine) if badLine.endswith(b'\n') else -1
+    except ValueError:
+        length = -1
+    if length < 0 or length > MAX_FRAME_BYTES:
+        raise FrameError("bad length line %s" % \
+                                repr(badLine.decode('utf-8', 'replace')))
+    data = fp.read(length)
+    if len(data) != length:
+        raise FrameError("expected %d bytes, got %d before EOF" % \
+                                                        (length, len(data)))
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise FrameError("text is not utf-8: %s" % str(e))
+#---------------------------
+
+def writeFrame(fp, text):
+    data = text.encode('utf-8')
+    fp.write(b'%d\n' % len(data))
+    fp.write(data)
+    fp.flush()
+#---------------------------
+
+def serveSocket(converter, socketPath):
+    """ Serve requests on a Unix socket (until killed) """
+    class Handler (socketserver.StreamRequestHandler):
+        def handle(self):
+            serveStream(converter, self.rfile, self.wfile)
+
+    if os.path.exists(socketPath):	# left from a previous server
+        if not stat.S_ISSOCK(os.stat(socketPath).st_mode):
+            raise ValueError("'%s' exists and is not a socket" % socketPath)
+        os.remove(socketPath)
+    # on kill, exit normally so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    with socketserver.ThreadingUnixStreamServer(socketPath, Handler) as server:
+        verbose("Serving on %s\n" % socketPath)
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socketPath)
+#---------------------------
+
+def runBatch():
+    """ Extract figure text from all the batch mode documents """
+    global sampleDataLib	# only needed in batch mode
+    import sampleDataLib
+
+    startTime = time.time()
+    if args.outDir:
+        os.makedirs(args.outDir, exist_ok=True)
+
+    if args.sampleFile:
+        verbose("Reading %s\n" % args.sampleFile)
+        reader = sampleDataLib.SampleFileReader(args.sampleFile,
+                sampleObjType=getattr(sampleDataLib, args.sampleObjTypeName))
+        sampleObjType = reader.getSampleObjType()
+        items = reader.recordIterator()
+        func = convertRecord
+    else:
+        sampleObjType = getattr(sampleDataLib, DOC_SAMPLE_TYPE)
+        items = getDocFiles()
+        func = convertDocFile
+
+    writer = None
+    if args.outputFile:
+        writer = sampleDataLib.SampleFileWriter(args.outputFile, sampleObjType,
+                metaItems={'figoption': args.figOption,
+                            'numwords': args.numWords})
+
+    initArgs = (sampleObjType,)
+    if args.workers > 1:
+        verbose("Workers: %d\n" % args.workers)
+        pool = multiprocessing.Pool(args.workers, initializer=initWorker,
+                                                            initargs=initArgs)
+        results = pool.imap(func, items, chunksize=args.chunkSize)
+    else:
+        pool = None
+        initWorker(*initArgs)
+        results = map(func, items)
+
+    n = 0
+    for recordText in results:		# in the same order as items
+        if writer:
+            writer.writeRecordText(recordText)
+        n += 1
+
+    if pool:
+        pool.close()
+        pool.join()
+    if args.sampleFile:
+        reader.close()
+    if writer:
+        writer.close()
+    verbose("%d documents\n" % n)
+    verbose("%8.3f seconds\n" %  (time.time()-startTime))
+#---------------------------
+
+def getDocFiles():
+    """ Return list of the document file paths for --dir or --manifest """
+    if args.inputDir:
+        return sorted([ e.path for e in os.scandir(args.inputDir) \
+                            if e.is_file() and not e.name.startswith('.') ])
+    with open(args.manifest, 'r') as fp:
+        return [ line.strip() for line in fp if line.strip() ]
+#---------------------------
+
+# State of this (worker) process, see initWorker()
+workerConverter = None
+workerSampleObjType = None	# sample class for the -o output samples
+
+def initWorker(sampleObjType):
+    global workerConverter, workerSampleObjType, sampleDataLib
+    import sampleDataLib
+    workerConverter = figureText.Text2FigConverter( \
+                        conversionType=args.figOption, numWords=args.numWords)
+    workerSampleObjType = sampleObjType
+#---------------------------
+
+def convertDocFile(path):
+    """
+    Extract figure text from an extracted text file.
+    Write its --outdir file, return its -o sample record text
+    """
+    with open(path, 'r') as fp:
+        text = fp.read()
+    fileName = os.path.basename(path)
+    ID = os.path.splitext(fileName)[0]
+
+    # extractedText is replaced by its (cleaned) figure text in convertSample()
+    sample = workerSampleObjType()
+    sample.setFields({ 'ID': sampleDataLib.cleanDelimiters(ID), 'title': '',
+                            'abstract': '', 'extractedText': text })
+    return convertSample(sample, fileName)
+#---------------------------
+
+def convertRecord(recordText):
+    """
+    Extract figure text from a sample record's extractedText.
+    Write its --outdir file, return its -o sample record text
+    """
+    sample = workerSampleObjType().parseSampleRecordText(recordText)
+    return convertSample(sample, sample.getID())
+#---------------------------
+
+def convertSample(sample, outName):
+    figTexts = workerConverter.text2FigText(sample.getExtractedText())
+    if args.outDir:
+        outPath = os.path.join(args.outDir, outName + OUTPUT_SUFFIX)
+        with open(outPath, 'w') as fp:
+            fp.write(getFigTextOutput(figTexts))
+    if args.outputFile:
+        sample.setExtractedText( \
+                        sampleDataLib.cleanDelimiters('\n\n'.join(figTexts)))
+        return sample.getSampleAsText()
+    return None
+#---------------------------
+
+def verbose(text):
+    if args.verbose:
+        sys.stderr.write(text)
+        sys.stderr.flush()
+#---------------------------
 
 if __name__ == "__main__":
     main()